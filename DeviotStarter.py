@@ -12,36 +12,69 @@ import glob
 import sublime
 import sublime_plugin
 import subprocess
-import threading
 from shutil import rmtree
 
-from .libs import Paths, Tools
-from .libs.Menu import Menu
-from .libs import PlatformioCLI
-from .libs.Preferences import Preferences
-from .libs.QuickPanel import quickPanel
-from .libs import Libraries
-from .libs.I18n import I18n
-from .libs import Serial
-from .libs import Messages
-from .libs.Install import PioInstall
-from .libs.Progress import ThreadProgress
-
-_ = I18n().translate
+from .libs import Startup
+
+# minimal core needed by the listeners, the rest of the modules are
+# imported the first time they're used
+Paths = Startup.importModule('Paths')
+Tools = Startup.importModule('Tools')
+Preferences = Startup.importModule('Preferences').Preferences
+flushPreferences = Startup.importModule('Preferences').flushPreferences
+Status = Startup.importModule('Status')
+Tasks = Startup.importModule('Tasks')
+
+PlatformioCLI = Startup.LazyModule('PlatformioCLI')
+Commands = Startup.LazyModule('Commands')
+Completions = Startup.LazyModule('Completions')
+Libraries = Startup.LazyModule('Libraries')
+Serial = Startup.LazyModule('Serial')
+Messages = Startup.LazyModule('Messages')
+LibraryCatalog = Startup.LazyModule('LibraryCatalog')
+Diagnostics = Startup.LazyModule('Diagnostics')
+Menu = Startup.LazyAttribute('Menu', 'Menu')
+quickPanel = Startup.LazyAttribute('QuickPanel', 'quickPanel')
+PioInstall = Startup.LazyAttribute('Install', 'PioInstall')
+
+_ = Startup.translate
 
 package_name = 'Deviot'
 
 
 def plugin_loaded():
-    window = sublime.active_window()
-    thread = threading.Thread(target=PioInstall(window).checkPio)
-    thread.start()
-    ThreadProgress(thread, _('processing'), _('done'))
-    Tools.setStatus()
-    Tools.userPreferencesStatus()
+    with Startup.Measure('plugin_loaded'):
+        window = sublime.active_window()
+
+        # the installer and the translations are loaded out of the UI thread
+        Tasks.submit(checkInstallation, window, priority=Tasks.BACKGROUND)
+
+        Status.status_bar.update()
+
+    Startup.writeLog()
+
+
+def checkInstallation(window):
+    """
+    Checks the PlatformIO installation showing the progress in the
+    status bar
+
+    Arguments: window {ST object} -- Sublime Text Object
+    """
+    PioInstall(window).checkPio()
 
 
 def plugin_unloaded():
+    flushPreferences()
+
+    Tasks.executor.cancelAll()
+
+    # stop only what was started
+    if(Startup.isLoaded('Serial')):
+        Serial.mdns_browser.stop()
+    if(Startup.isLoaded('Commands')):
+        Commands.pio_worker.stop()
+
     try:
         from package_control import events
 
@@ -68,9 +101,13 @@ class DeviotListener(sublime_plugin.EventListener):
 
         Arguments: view {ST object} -- Sublime Text Object
         """
-        PlatformioCLI.PlatformioCLI().checkIOT()
-        Tools.setStatus()
-        Tools.userPreferencesStatus()
+        if(Startup.isLoaded('PlatformioCLI')):
+            PlatformioCLI.PlatformioCLI().checkIOT()
+        Status.status_bar.schedule(view)
+
+        # the completions index is built before the first keystroke
+        if(Tools.isIOTFile(view.file_name())):
+            Completions.completion_index.schedule(view)
 
     def on_selection_modified(self, view):
         region = view.sel()[0]
@@ -78,23 +115,24 @@ class DeviotListener(sublime_plugin.EventListener):
         text = view.substr(region)
 
         if 'error:' in text:
-            text = text.split('error:')[0].strip()
-            infos = text.split(':')
+            error = Diagnostics.parseDiagnostic(text,
+                                                Diagnostics.diagnostics.cwd)
+            if(error is None):
+                return
 
-            if ':/' in text:
-                file_path = infos[0] + ':' + infos[1]
-                infos.pop(0)
-                infos.pop(0)
-            else:
-                file_path = infos[0]
-                infos.pop(0)
+            location = '%s:%d:%d' % error[:3]
+            view.window().open_file(location, sublime.ENCODED_POSITION)
 
-            line_no = int(infos[0])
-            column_no = int(infos[1])
+    def on_query_completions(self, view, prefix, locations):
+        """
+        Completions of the keywords of the libraries included in the sketch
+
+        Arguments: view {ST object} -- Sublime Text Object
+        """
+        if(not Tools.isIOTFile(view.file_name())):
+            return None
 
-            file_view = view.window().open_file(file_path)
-            point = file_view.text_point(line_no, column_no)
-            file_view.show(point)
+        return Completions.completion_index.query(view, prefix, locations[0])
 
     def on_close(self, view):
         """
@@ -102,9 +140,13 @@ class DeviotListener(sublime_plugin.EventListener):
 
         Arguments: view {ST object} -- Sublime Text Object
         """
+        Status.status_bar.forgetView(view)
+        if(Startup.isLoaded('Completions')):
+            Completions.completion_index.forgetView(view)
+
         # Serial Monitor
         monitor_module = Serial
-        if Messages.isMonitorView(view):
+        if Startup.isLoaded('Messages') and Messages.isMonitorView(view):
             name = view.name()
             serial_port = name.split('-')[1].strip()
             if serial_port in monitor_module.serials_in_use:
@@ -208,6 +250,52 @@ class SearchLibraryCommand(sublime_plugin.WindowCommand):
         Libraries.openInThread('download', self.window, result)
 
 
+class InstallProjectLibrariesCommand(sublime_plugin.WindowCommand):
+    """
+    Installs all the libraries of the lib_deps option of the current
+    project with their dependencies
+
+    Extends: sublime_plugin.WindowCommand
+    """
+
+    def run(self):
+        Libraries.openInThread('install_project', self.window)
+
+    def is_enabled(self):
+        view = self.window.active_view()
+        return bool(view) and Tools.isIOTFile(view.file_name())
+
+
+class UpdateLibraryRegistryCommand(sublime_plugin.WindowCommand):
+    """
+    Downloads the whole library registry, after that the searches are
+    answered without network
+
+    Extends: sublime_plugin.WindowCommand
+    """
+
+    def run(self):
+        Libraries.openInThread('update_registry', self.window)
+
+
+class ImportLibraryRegistryCommand(sublime_plugin.WindowCommand):
+    """
+    Imports the libraries of a JSON dump of the registry, to search
+    libraries in computers without network
+
+    Extends: sublime_plugin.WindowCommand
+    """
+
+    def run(self):
+        caption = _('registry_path')
+        self.window.show_input_panel(caption, '', self.on_done, None, None)
+
+    def on_done(self, path):
+        path = os.path.expanduser(path.strip())
+        if(path):
+            Libraries.openInThread('import_registry', self.window, path)
+
+
 class ShowResultsCommand(sublime_plugin.WindowCommand):
     """
     The results of the SearchLibraryCommand query in a quick_panel.
@@ -216,13 +304,26 @@ class ShowResultsCommand(sublime_plugin.WindowCommand):
     Extends: sublime_plugin.WindowCommand
     """
 
+    MENU_LIST = []
+    more_results = False
+
     def run(self):
-        MENU_LIST = Libraries.Libraries().getList()
-        quickPanel(MENU_LIST, self.on_done)
+        libraries = Libraries.Libraries()
+        self.MENU_LIST = libraries.getList()
+        self.more_results = libraries.more_results
+        quickPanel(self.MENU_LIST, self.on_done)
 
     def on_done(self, result):
-        if(result != -1):
-            Libraries.openInThread('install', self.window, result)
+        if(result == -1):
+            return
+
+        # show the list again with the pages downloaded after
+        if(self.more_results and result == len(self.MENU_LIST) - 1):
+            sublime.set_timeout(
+                lambda: self.window.run_command('show_results'), 0)
+            return
+
+        Libraries.openInThread('install', self.window, result)
 
 
 class RemoveLibraryCommand(sublime_plugin.WindowCommand):
@@ -283,6 +384,67 @@ class AddLibraryCommand(sublime_plugin.TextCommand):
         Tools.addLibraryToSketch(self.view, edit, path)
 
 
+class FindHeaderLibraryCommand(sublime_plugin.WindowCommand):
+    """
+    Shows the installed libraries that provide a header, by default the
+    header included in the line of the cursor. The header of the library
+    selected is opened
+
+    Extends: sublime_plugin.WindowCommand
+    """
+    MENU_LIST = []
+
+    def run(self):
+        header = ''
+        view = self.window.active_view()
+        if(view and view.sel()):
+            line = view.substr(view.line(view.sel()[0]))
+            found = Completions.INCLUDE.search(line)
+            if(found):
+                header = found.group(1)
+
+        caption = _('header_name')
+        self.window.show_input_panel(caption, header, self.on_header,
+                                     None, None)
+
+    def on_header(self, header):
+        header = os.path.basename(header.strip().strip('<>"'))
+        if(not header):
+            return
+
+        # the libraries folders are checked in a task to don't block the UI
+        Tasks.submit(self.findHeader, header, name='find header',
+                     priority=Tasks.INTERACTIVE)
+
+    def findHeader(self, header):
+        catalog = LibraryCatalog.getLibraryCatalog()
+        libraries = catalog.findHeader(header)
+        sublime.set_timeout(lambda: self.showLibraries(header, libraries), 0)
+
+    def showLibraries(self, header, libraries):
+        self.header = header
+        self.libraries = libraries
+
+        if(not self.libraries):
+            self.MENU_LIST = [[_('header_not_found_{0}', header)]]
+            quickPanel(self.MENU_LIST, self.on_done)
+            return
+
+        self.MENU_LIST = [[_('header_libraries_{0}', header).upper()]]
+        for library in self.libraries:
+            platform = library['platform'] or 'PlatformIO'
+            info = '%s | %s' % (platform, library['version'] or '-')
+            self.MENU_LIST.append([library['name'], library['path'], info])
+
+        quickPanel(self.MENU_LIST, self.on_done)
+
+    def on_done(self, selection):
+        if(selection > 0 and self.libraries):
+            library = self.libraries[selection - 1]
+            path = LibraryCatalog.getHeaderPath(library, self.header)
+            self.window.open_file(path)
+
+
 class ListLibraryExamplesCommand(sublime_plugin.WindowCommand):
     """
     Shows the list with examples of the availables libraries in
@@ -356,8 +518,7 @@ class BuildSketchCommand(sublime_plugin.TextCommand):
     """
 
     def run(self, edit):
-        if(Tools.ERRORS_LIST):
-            Tools.ERRORS_LIST = Tools.highlightRemove(Tools.ERRORS_LIST)
+        Diagnostics.diagnostics.clear()
 
         PlatformioCLI.PlatformioCLI().openInThread('build')
 
@@ -365,6 +526,23 @@ class BuildSketchCommand(sublime_plugin.TextCommand):
         return Preferences().get('enable_menu', False)
 
 
+class BuildAllSketchCommand(sublime_plugin.TextCommand):
+    """
+    Trigger a method to build the files in the current view for all
+    the environments of the project at the same time
+
+    Extends: sublime_plugin.TextCommand
+    """
+
+    def run(self, edit):
+        Diagnostics.diagnostics.clear()
+
+        PlatformioCLI.PlatformioCLI().openInThread('buildAll')
+
+    def is_enabled(self):
+        return Preferences().get('enable_menu', False)
+
+
 class UploadSketchCommand(sublime_plugin.TextCommand):
     """
     Trigger a method to upload the files in the current
@@ -375,8 +553,7 @@ class UploadSketchCommand(sublime_plugin.TextCommand):
     """
 
     def run(self, edit):
-        if(Tools.ERRORS_LIST):
-            Tools.ERRORS_LIST = Tools.highlightRemove(Tools.ERRORS_LIST)
+        Diagnostics.diagnostics.clear()
 
         PlatformioCLI.C['PORTSLIST'] = None
         PlatformioCLI.PlatformioCLI().openInThread('upload')
@@ -433,6 +610,56 @@ class HideConsoleCommand(sublime_plugin.WindowCommand):
         self.window.run_command("hide_panel", {"panel": "output.exec"})
 
 
+class CancelCommandCommand(sublime_plugin.WindowCommand):
+    """
+    Stops the PlatformIO commands running (build, upload...) and
+    cancels the tasks waiting to run
+
+    Extends: sublime_plugin.WindowCommand
+    """
+
+    def run(self):
+        Tasks.executor.cancelAll()
+        if(Startup.isLoaded('Commands')):
+            Commands.cancelCommands()
+
+    def is_enabled(self):
+        if(Tasks.executor.getTasks()):
+            return True
+        return (Startup.isLoaded('Commands') and
+                bool(Commands.running_commands))
+
+
+class ShowTasksCommand(sublime_plugin.WindowCommand):
+    """
+    Lists the running and queued tasks with their age, the task selected
+    is cancelled
+
+    Extends: sublime_plugin.WindowCommand
+    """
+    TASKS = []
+
+    def run(self):
+        self.TASKS = Tasks.executor.getTasks()
+
+        if(not self.TASKS):
+            quickPanel([[_('menu_not_tasks')]], self.on_done)
+            return
+
+        items = [[_('select_task_cancel').upper()]]
+        for task in self.TASKS:
+            priority = Tasks.PRIORITY_NAMES[task.priority]
+            info = _('task_info_{0}{1}{2}', _('task_' + task.state),
+                     priority, '%.1f' % task.getAge())
+            items.append([task.name, info])
+
+        quickPanel(items, self.on_done)
+
+    def on_done(self, selection):
+        if(selection > 0 and self.TASKS):
+            self.TASKS[selection - 1].cancel()
+
+
 class ShowConsoleCommand(sublime_plugin.WindowCommand):
     """
     Hide the deviot console
@@ -742,6 +969,9 @@ class ChooseDisplayModeItemCommand(sublime_plugin.WindowCommand):
     def run(self, display_mode_item):
         Preferences().set('display_mode', display_mode_item)
 
+        for serial_monitor in Serial.serial_monitor_dict.values():
+            serial_monitor.setDisplayMode(display_mode_item)
+
     def is_checked(self, display_mode_item):
         target_display_mode = Preferences().get('display_mode', 'Text')
         return display_mode_item == target_display_mode
@@ -751,17 +981,16 @@ class UpgradePioCommand(sublime_plugin.TextCommand):
 
     def run(self, edit):
         window = sublime.active_window()
-        thread = threading.Thread(target=PioInstall(window, True).checkPio)
-        thread.start()
+        PioInstall(window, True).checkPio()
 
 
 class DeveloperPioCommand(sublime_plugin.TextCommand):
 
     def run(self, edit):
         window = sublime.active_window()
-        thread = threading.Thread(target=PioInstall(window, True).developer)
-        thread.start()
-        ThreadProgress(thread, _('processing'), _('done'))
+        Tasks.submit(PioInstall(window, True).developer,
+                     name='developer platformio',
+                     message=_('processing'), success_message=_('done'))
 
     def is_checked(self):
         return Preferences().get('developer', False)
@@ -879,6 +1108,7 @@ class SelectLanguageCommand(sublime_plugin.WindowCommand):
         if(restart):
             Preferences().set('id_lang', id_lang)
             Preferences().set('updt_menu', True)
+            flushPreferences()
             self.window.run_command('sublime_restart')
 
     def is_checked(self, id_lang):
@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import os
+import re
+import json
+import glob
+import hashlib
+import threading
+
+from . import Paths
+from .JSONFile import JSONFile
+
+SOURCE_EXTS = ('.ino', '.pde', '.c', '.cpp', '.cc', '.cxx', '.S',
+               '.h', '.hh', '.hpp')
+LOCAL_INCLUDE = re.compile(r'^\s*#include\s*"(\S+)"', re.M)
+LIBRARY_MANIFESTS = ('library.json', 'library.properties', 'module.json')
+MANIFEST_LOCK = threading.Lock()
+
+
+class BuildManifest(JSONFile):
+    '''
+    Stores the content hashes of the inputs of the last successful build
+    of each environment (sketch sources, local headers included, the
+    sections of the platformio.ini file used by the environment and the
+    libraries installed). When none of them changed, the build can be
+    skipped.
+
+    The manifest of a project is stored in the Deviot cache folder.
+
+    Extends: JSONFile
+    '''
+
+    def __init__(self, working_path, source_path, ini_path, environment):
+        '''
+        Arguments:
+            working_path {str} -- folder of the PlatformIO project
+            source_path {str} -- folder with the sketch sources
+            ini_path {str} -- path of the platformio.ini file
+            environment {str} -- environment to build
+        '''
+        self.working_path = working_path
+        self.source_path = source_path
+        self.ini_path = ini_path
+        self.environment = environment
+
+        project_id = hashlib.sha1(working_path.encode('utf-8')).hexdigest()
+        cache_path = os.path.join(Paths.getCacheDir(), 'builds')
+        Paths.makeFolder(cache_path)
+        path = os.path.join(cache_path, project_id + '.json')
+
+        super(BuildManifest, self).__init__(path)
+
+    def getInputs(self):
+        '''
+        Calculates the hash of each input of the build
+
+        Returns:
+            dict -- {input name: hash}
+        '''
+        inputs = {}
+
+        for path in self.getSourceFiles():
+            name = os.path.relpath(path, self.working_path)
+            inputs[name] = hashFile(path)
+
+        inputs['platformio.ini'] = self.hashIniSections()
+        inputs['libraries'] = self.hashLibraries()
+
+        return inputs
+
+    def getSourceFiles(self):
+        '''
+        Gets the source files of the sketch and the local headers included
+        by them ("header.h") in the project folders
+
+        Returns:
+            list -- full paths of the files
+        '''
+        files = set()
+        for root, dirs, names in os.walk(self.source_path):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            for name in names:
+                if name.endswith(SOURCE_EXTS):
+                    files.add(os.path.join(root, name))
+
+        include_dirs = [self.source_path,
+                        os.path.join(self.working_path, 'include')]
+        lib_path = os.path.join(self.working_path, 'lib', '*')
+        for lib in glob.glob(lib_path):
+            include_dirs.append(lib)
+            include_dirs.append(os.path.join(lib, 'src'))
+
+        # follow the includes of each file found
+        pending = list(files)
+        while pending:
+            path = pending.pop()
+            for header in self.getLocalIncludes(path, include_dirs):
+                if header not in files:
+                    files.add(header)
+                    pending.append(header)
+
+        return sorted(files)
+
+    def getLocalIncludes(self, path, include_dirs):
+        '''
+        Gets the headers included with quotes in the given file
+
+        Arguments:
+            path {str} -- source file
+            include_dirs {list} -- folders where the headers are searched
+
+        Returns:
+            list -- full path of the headers found
+        '''
+        try:
+            with open(path, 'rb') as file:
+                text = file.read().decode('utf-8', 'replace')
+        except (IOError, OSError):
+            return []
+
+        headers = []
+        search_dirs = [os.path.dirname(path)] + include_dirs
+        for include in LOCAL_INCLUDE.findall(text):
+            for folder in search_dirs:
+                header = os.path.normpath(os.path.join(folder, include))
+                if os.path.isfile(header):
+                    headers.append(header)
+                    break
+        return headers
+
+    def hashIniSections(self):
+        '''
+        Hash of the [platformio] section, the common [env] section and
+        the section of the current environment (read from the shared
+        ProjectConfig, with the changes not written yet), the rest of the
+        file doesn't change the build
+
+        Returns:
+            str -- hash of the sections
+        '''
+        from .ProjectConfig import getProjectConfig
+
+        if not os.path.exists(self.ini_path):
+            return None
+
+        ini_file = getProjectConfig(self.ini_path).load()
+        environment = 'env:%s' % self.environment
+        sections = {'platformio': ini_file.get('platformio', {}),
+                    'env': ini_file.get('env', {}),
+                    environment: ini_file.get(environment, {})}
+        text = json.dumps(sections, sort_keys=True)
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def hashLibraries(self):
+        '''
+        Hash of the libraries that the build can use (global, lib_deps and
+        project libraries). The modification time of each library folder
+        and of its manifest are used, they change when a library is
+        installed, updated or removed
+
+        Returns:
+            str -- hash of the libraries
+        '''
+        from .LibraryCatalog import listFolders
+        from .LibraryCatalog import getMTime
+
+        containers = [Paths.getPioLibrary(),
+                      os.path.join(self.working_path, '.piolibdeps'),
+                      os.path.join(self.working_path, 'lib')]
+
+        digest = hashlib.sha1()
+        for container in containers:
+            for name in sorted(listFolders(container)):
+                path = os.path.join(container, name)
+                entry = [path, getMTime(path)]
+                entry.extend(getMTime(os.path.join(path, manifest))
+                             for manifest in LIBRARY_MANIFESTS)
+                digest.update(json.dumps(entry).encode('utf-8'))
+        return digest.hexdigest()
+
+    def hasFirmware(self):
+        '''
+        Checks if the firmware of the last build still exists
+        (it's removed when the project is cleaned)
+        '''
+        firmware = os.path.join(self.working_path, '.pioenvs',
+                                self.environment, 'firmware.*')
+        return bool(glob.glob(firmware))
+
+    def getChanges(self):
+        '''
+        Compares the current inputs with the last successful build
+
+        Returns:
+            list -- names of the inputs changed, empty when the
+                    build is up to date
+        '''
+        self.inputs = self.getInputs()
+        last_build = self.data.get(self.environment)
+
+        if not last_build or not self.hasFirmware():
+            return ['firmware']
+
+        last_inputs = last_build.get('inputs', {})
+        names = set(last_inputs) | set(self.inputs)
+        changes = [name for name in names
+                   if last_inputs.get(name) != self.inputs.get(name)]
+        return sorted(changes)
+
+    def getSizeReport(self):
+        '''
+        Returns:
+            list -- lines with the size of the firmware in the last build
+        '''
+        return self.data.get(self.environment, {}).get('size_report', [])
+
+    def save(self, size_report=None):
+        '''
+        Stores the inputs of the current build as the last successful build.
+        The inputs are calculated again because the build could change the
+        platformio.ini file
+
+        Keyword Arguments:
+            size_report {list} -- lines with the size of the firmware
+        '''
+        inputs = self.getInputs()
+
+        # other environments can be saved at the same time (build all)
+        with MANIFEST_LOCK:
+            self.loadData()
+            self.data[self.environment] = {'inputs': inputs,
+                                           'size_report': size_report or []}
+            self.saveData()
+
+    def remove(self):
+        '''
+        Removes the last build of the environment
+        '''
+        with MANIFEST_LOCK:
+            self.loadData()
+            if self.environment in self.data:
+                self.data.pop(self.environment)
+                self.saveData()
+
+
+def hashFile(path):
+    '''
+    Arguments:
+        path {str} -- file path
+
+    Returns:
+        str -- sha1 hash of the file content, None if can't be read
+    '''
+    digest = hashlib.sha1()
+    try:
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(65536), b''):
+                digest.update(chunk)
+    except (IOError, OSError):
+        return None
+    return digest.hexdigest()
@@ -7,15 +7,22 @@ from __future__ import division
 from __future__ import unicode_literals
 
 import subprocess
+import threading
+import shlex
+import json
 import os
 import re
 import time
+import signal
 import sublime
 
 from . import Messages
+from . import Tasks
+from .Diagnostics import diagnostics as diagnostic_index
 from .Preferences import Preferences
 from .I18n import I18n
 from .Paths import getEnvBinDir
+from .Paths import getPluginPath
 
 _ = I18n().translate
 
@@ -35,6 +42,10 @@ class CommandsPy(object):
         self.error_running = False
         self.console = console
         self.cwd = cwd
+        self.process = None
+        self.task = None
+        self.cancelled = False
+        self.cancel_key = None
 
         # not use env vars in osx
         if(sublime.platform() == 'osx'):
@@ -48,7 +59,7 @@ class CommandsPy(object):
         if(env_path):
             os.environ['PATH'] = env_path
 
-    def runCommand(self, commands, feedback=False, setReturn=False, extra_message=None, verbose=False):
+    def runCommand(self, commands, feedback=False, setReturn=False, extra_message=None, verbose=False, cancel_key=None, diagnostics=False):
         """Command
 
         Runs a CLI command to do/get the differents options from platformIO
@@ -61,16 +72,24 @@ class CommandsPy(object):
             setReturn {bool} -- if it's true return stdout (default: {False})
             extra_message {[str]} -- Push a text in the user console (default: {None})
             verbose {bool} -- When is true show full output in console (default: {False})
+            cancel_key {tuple} -- identifies the command (project and environment),
+                                  the running commands with the same key are
+                                  cancelled (default: {None})
+            diagnostics {bool} -- when it's true the errors and warnings of
+                                  the compiler are indexed and highlighted
+                                  while the command runs (default: {False})
 
         Returns:
             str -- return the stdout of the command execution
         """
         real_time = True
+        self.cancelled = False
         self.show_warning = False
         self.show_error = False
         self.previous = ''
         self.down_string = False
         self.verbose = verbose
+        self.size_report = []
 
         self.feedback = feedback
         if(feedback):
@@ -80,6 +99,9 @@ class CommandsPy(object):
         if(not commands):
             return False
 
+        if(diagnostics):
+            diagnostic_index.clear(self.cwd)
+
         # get verbose from preferences
         if(not self.verbose):
             self.verbose = self.Preferences.get('verbose_output', False)
@@ -87,6 +109,7 @@ class CommandsPy(object):
         # get command
         self.type_build = False
         command = self.createCommand(commands)
+        self.command_type = self.commandType(command)
 
         # time info
         current_time = time.strftime('%H:%M:%S')
@@ -96,29 +119,44 @@ class CommandsPy(object):
         if(feedback):
             self.message_queue.put(feedback, current_time, extra_message)
 
-        # run command
-        process = subprocess.Popen(command, stdin=subprocess.PIPE,
-                                   stdout=subprocess.PIPE, cwd=self.cwd,
-                                   universal_newlines=True, shell=True)
+        # run command in the worker if it's enabled and available
+        process = None
+        if(self.Preferences.get('pio_worker', False)):
+            args = shlex.split('-f -c sublimetext %s %s' %
+                               self.createOptions(commands))
+            process = pio_worker.runCommand(args, self.cwd)
 
-        if(setReturn):
-            output = process.communicate()
-            stdout = output[0]
-            stderr = output[1]
-            real_time = False
+        if(process is None):
+            process = self.startProcess(command)
+
+        self.startTracking(process, cancel_key)
+        try:
+            if(setReturn):
+                output = process.communicate()
+                stdout = output[0]
+                stderr = output[1]
+                real_time = False
+
+            if(real_time):
+                # realtime output
+                while True:
+                    output = process.stdout.readline()
+                    # exit when there is nothing to show
+                    if output == '' and process.poll() is not None:
+                        break
+
+                    self.outputFilter(output, command)
 
-        if(real_time):
-            # realtime output
-            while True:
-                output = process.stdout.readline()
-                # exit when there is nothing to show
-                if output == '' and process.poll() is not None:
-                    break
+                    if(diagnostics):
+                        diagnostic_index.feed(output)
 
-                self.outputFilter(output, command)
+                    if(SIZE_REPORT.match(output) is not None):
+                        self.size_report.append(output)
 
-                if(output.strip()):
-                    self.previous = output.lower()
+                    if(output.strip()):
+                        self.previous = output.lower()
+        finally:
+            self.stopTracking()
 
         # results
         return_code = process.returncode
@@ -129,12 +167,116 @@ class CommandsPy(object):
                 print(stderr)
             return stdout
 
-    def createCommand(self, commands):
+    def captureCommand(self, commands, cancel_key=None):
         """
-        Create the full CLI command based in the verbose mode
+        Runs a command without any feedback in the console
+
+        Arguments:
+            commands {list} -- command to run
+
+        Keyword Arguments:
+            cancel_key {tuple} -- identifies the command, the running
+                                  commands with the same key are cancelled
+                                  (default: {None})
+
+        Returns:
+            tuple -- return code and output of the command
+        """
+        self.verbose = False
+        self.cancelled = False
+        command = self.createCommand(commands)
+
+        process = self.startProcess(command)
+
+        self.startTracking(process, cancel_key)
+        try:
+            output = process.communicate()[0]
+        finally:
+            self.stopTracking()
+
+        return (process.returncode, output)
+
+    def startProcess(self, command):
+        """
+        Starts the command in a new process group (session in posix), that
+        way the shell, PlatformIO and the compilers or uploaders started by
+        it can be stopped together
+
+        Arguments:
+            command {str} -- full command
+
+        Returns:
+            subprocess.Popen -- process started
+        """
+        options = {}
+        if(os.name == 'posix'):
+            options['start_new_session'] = True
+        else:
+            options['creationflags'] = getattr(
+                subprocess, 'CREATE_NEW_PROCESS_GROUP', 0)
+
+        return subprocess.Popen(command, stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, cwd=self.cwd,
+                                universal_newlines=True, shell=True,
+                                **options)
+
+    def startTracking(self, process, cancel_key=None):
+        """
+        Registers the process as running, it can be stopped with the cancel
+        command, cancelling the task that runs it, or by a new command with
+        the same cancel key
+
+        Arguments:
+            process {Popen/WorkerCommand} -- process running the command
+
+        Keyword Arguments:
+            cancel_key {tuple} -- identifies the command (default: {None})
+        """
+        if(cancel_key is not None):
+            cancelCommands(cancel_key)
+
+        self.process = process
+        self.cancel_key = cancel_key
+        with RUNNING_LOCK:
+            running_commands.append(self)
+
+        self.task = Tasks.currentTask()
+        if(self.task is not None):
+            self.task.addCancelCallback(self.cancel)
+
+    def stopTracking(self):
+        with RUNNING_LOCK:
+            if(self in running_commands):
+                running_commands.remove(self)
+
+        if(self.task is not None):
+            self.task.removeCancelCallback(self.cancel)
+            self.task = None
+
+        self.process = None
+
+    def cancel(self):
+        """
+        Stops the running command with all the processes started by it,
+        the result is marked as cancelled
+        """
+        process = self.process
+        if(process is None or process.poll() is not None):
+            return
+
+        self.cancelled = True
+        killProcessTree(process)
+
+    def createOptions(self, commands):
+        """
+        Gets the command and the arguments to run in platformIO
+        based in the verbose mode
 
         Arguments:
             command {list} -- actions command to run in platformIO
+
+        Returns:
+            tuple -- command and arguments strings
         """
         options = commands[0]
 
@@ -147,6 +289,17 @@ class CommandsPy(object):
         if(self.verbose and 'run' in options and '-e' in args and 'upload' not in args):
             args += ' -vvv'
 
+        return (options, args)
+
+    def createCommand(self, commands):
+        """
+        Create the full CLI command based in the verbose mode
+
+        Arguments:
+            command {list} -- actions command to run in platformIO
+        """
+        options, args = self.createOptions(commands)
+
         if(sublime.platform() == 'osx'):
             command = '"%s" -m platformio -f -c sublimetext %s %s 2>&1' % (
                 self.python, options, args)
@@ -160,7 +313,8 @@ class CommandsPy(object):
         """Filter
 
         catch the output of Popen in real time and filter it
-        showing minimun information
+        showing minimun information. Each line is scanned only once
+        by the output classifier (see OutputClassifier)
 
         Arguments:
             output {[str]} -- text from Popen
@@ -172,65 +326,46 @@ class CommandsPy(object):
             return
 
         outputif = output.lower()
+        kinds = output_classifier.classify(outputif)
 
-        # warning and errors
-        if('warning:' in outputif and 'cygwin' not in outputif or
-                'in function' in outputif or
-                'reference' in outputif or 'in file' in outputif or
-                'error:' in outputif or '^' in outputif or
-                'ser_open' in outputif or 'permission' in outputif):
+        if(not kinds):
+            return
+
+        warning = 'warning' in kinds and 'cygwin' not in kinds
 
-            if('^' in outputif):
+        # warning and errors
+        if(warning or not kinds.isdisjoint(DIAGNOSTIC_KINDS)):
+            if('caret' in kinds):
                 output = self.previous + output
             self.message_queue.put(output)
 
-        if('warning:' in outputif and 'cygwin' not in outputif):
+        if(warning):
             self.show_warning = True
 
-        if('error:' in outputif):
+        if('error' in kinds):
             self.show_error = True
 
-        if(': programmer' in outputif):
+        if('programmer' in kinds):
             output = re.sub(r"[^\: ][\w\s+]+$",
                             "El programador no responde", output)
             self.message_queue.put('\n' + output)
 
-        if(' attempt ' in outputif or
-                re.search(r"\[ \d+% \]", outputif) is not None or
-                re.search(r"\] \d+%", outputif) is not None):
-
-            dic = {'attempt': _('attempt'),
-                   'of': _('of'),
-                   'not in sync': _('not_in_sync')}
-            output = multiwordReplace(output, dic)
+        if(not kinds.isdisjoint(PROGRESS_KINDS)):
+            output = progress_words.replace(output)
             # remove dots ands white spaces in load
-            if(re.search(r"\[ \d+% \]", outputif) is not None):
+            if('percentage' in kinds):
                 output = output.replace('.', '').strip().rstrip()
                 if("100%" in output):
                     output = output + '\n'
             self.message_queue.put('\n' + output)
 
-        if('[info]:' in outputif or '[error]:' in outputif):
-            dic = {'Starting on': _('starting_on'),
-                   'Upload size': _('upload_size'),
-                   'Sending invitation to': _('sending_invitation_to'),
-                   'Waiting for device': _('waiting_device'),
-                   'Waiting for result': _('waiting_result'),
-                   'Result': _('result'),
-                   'Authentication': _('authentication'),
-                   'Failed': _('failed')}
+        if('info' in kinds):
             if("Starting" in output):
                 output = '\n' + output
-            output = multiwordReplace(output, dic)
+            output = info_words.replace(output)
             self.message_queue.put(output)
 
-        # realtime output for build command
-        if('run' in command and '-e' in command and not 'upload'):
-            if('installing' in outputif):
-                package = re.match(r"\w+ (\w+\W?\w+?)\s", output).group(1)
-                self.message_queue.put('install_package_{0}', package)
-
-        if('already' in outputif):
+        if('already' in kinds):
             try:
                 package = re.match(r"\w+ (\w+\W?\w+?)\s",
                                    self.previous).group(1)
@@ -239,23 +374,40 @@ class CommandsPy(object):
 
             self.message_queue.put('already_installed{0}', package)
 
-        if('downloading' in outputif.strip() and outputif != self.previous):
-            message = 'downloading_package{0}' if 'lib' not in command else 'download_lib'
+        if('downloading' in kinds and outputif != self.previous):
+            lib = self.command_type['lib']
+            message = 'downloading_package{0}' if not lib else 'download_lib'
             try:
                 package = re.match(r"\w+ (\w+\W?\w+?)\s",
                                    self.previous).group(1)
             except:
                 package = ""
 
-            if(self.down_string and 'lib' in command and 'install' in command):
+            if(self.down_string and self.command_type['lib_install']):
                 message = 'download_dependece'
             self.message_queue.put(message, package)
             self.down_string = True
 
-        if('unpacking' in outputif and outputif.replace(" ", "") and
+        if('unpacking' in kinds and outputif.replace(" ", "") and
                 outputif.replace(" ", "") != self.previous):
             self.message_queue.put('unpacking')
 
+    def commandType(self, command):
+        """
+        Gets the type of the command, it's used to know what messages
+        must be shown in the output filter
+
+        Arguments:
+            command {str} -- full command to run
+
+        Returns:
+            dict -- lib and lib_install keys
+        """
+        command_type = {'lib': 'lib' in command,
+                        'lib_install': 'lib' in command and
+                                       'install' in command}
+        return command_type
+
     def resultsOutput(self, return_code):
         """Results
 
@@ -266,7 +418,7 @@ class CommandsPy(object):
             return_code {[int]} -- 0 if wasn't an error 1 if there was an error
         """
         # set error
-        if(return_code > 0):
+        if(return_code > 0 or self.cancelled):
             self.error_running = True
 
         current_time = time.strftime('%H:%M:%S')
@@ -290,8 +442,15 @@ class CommandsPy(object):
             message = 'success_warnings_took__{0}{1}'
             self.message_queue.put(message, current_time, diff_time)
 
+        # output cancelled
+        if(self.cancelled):
+            self.status_bar = _('cancelled')
+            if(self.feedback):
+                message = 'cancelled_took_{0}{1}'
+                self.message_queue.put(message, current_time, diff_time)
+
         # output error
-        if(self.show_error or self.error_running):
+        elif(self.show_error or self.error_running):
             self.status_bar = _('error')
             message = 'error_took_{0}{1}'
             self.message_queue.put(message, current_time, diff_time)
@@ -314,13 +473,340 @@ class CommandsPy(object):
                            'erase_time': self.status_erase_time})
 
 
-def multiwordReplace(text, wordDic):
+class PioWorker(object):
+    """
+    Long-lived process (libs/PioWorker.py) running in the PlatformIO
+    virtualenv. It imports PlatformIO only once and runs each command
+    in a forked process, avoiding the startup time of the interpreter
+    and PlatformIO in every command.
+
+    Only one command runs at the same time, when the worker is busy,
+    can't be started or the system can't fork (Windows) the command
+    runs in a new subprocess as usual.
+    """
+    READY = 'deviot-worker-ready'
+    END = '\x00deviot-end'
+    PID = '\x00deviot-pid'
+
+    def __init__(self):
+        self.process = None
+        self.failed = False
+        self.lock = threading.Lock()
+
+    def isRunning(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """
+        Starts the worker if it isn't running
+
+        Returns:
+            bool -- True if the worker is ready to receive commands
+        """
+        if(self.isRunning()):
+            return True
+
+        if(self.failed or sublime.platform() == 'windows'):
+            return False
+
+        python = os.path.join(getEnvBinDir(), 'python')
+        script = os.path.join(getPluginPath(), 'libs', 'PioWorker.py')
+
+        try:
+            self.process = subprocess.Popen([python, script],
+                                            stdin=subprocess.PIPE,
+                                            stdout=subprocess.PIPE,
+                                            stderr=subprocess.STDOUT,
+                                            universal_newlines=True)
+        except OSError:
+            self.process = None
+            self.failed = True
+            return False
+
+        # PlatformIO not installed or not importable
+        if(self.READY not in self.process.stdout.readline()):
+            self.stop()
+            self.failed = True
+            return False
+
+        return True
+
+    def stop(self):
+        if(self.isRunning()):
+            try:
+                self.process.stdin.close()
+                self.process.terminate()
+            except (OSError, IOError):
+                pass
+        self.process = None
+
+    def runCommand(self, args, cwd=None):
+        """
+        Sends a command to the worker
+
+        Arguments:
+            args {list} -- platformio arguments
+
+        Keyword Arguments:
+            cwd {str} -- working directory (default: {None})
+
+        Returns:
+            WorkerCommand -- object to read the output of the command,
+                             None if the worker isn't available
+        """
+        if(not self.lock.acquire(False)):
+            return None
+
+        if(not self.start()):
+            self.lock.release()
+            return None
+
+        request = {'args': args, 'cwd': cwd, 'path': os.environ.get('PATH')}
+
+        try:
+            self.process.stdin.write(json.dumps(request) + '\n')
+            self.process.stdin.flush()
+        except (OSError, IOError):
+            self.stop()
+            self.lock.release()
+            return None
+
+        return WorkerCommand(self)
+
+
+class WorkerCommand(object):
+    """
+    Gives to the output of a command running in the worker the same
+    interface of subprocess.Popen used in CommandsPy.runCommand
+    (stdout.readline, poll, returncode and communicate)
+    """
+
+    def __init__(self, worker):
+        self.worker = worker
+        self.stdout = self
+        self.returncode = None
+        self.pid = None
+
+    def readline(self):
+        if(self.returncode is not None):
+            return ''
+
+        line = self.worker.process.stdout.readline()
+
+        # process group of the command, sent before any output
+        if(line.startswith(PioWorker.PID)):
+            self.pid = int(line.split()[1])
+            return self.readline()
+
+        # worker closed
+        if(not line):
+            self.finish(1)
+            self.worker.stop()
+            return ''
+
+        if(PioWorker.END in line):
+            output, code = line.split(PioWorker.END)
+            self.finish(int(code))
+            return output
+
+        return line
+
+    def finish(self, returncode):
+        self.returncode = returncode
+        self.worker.lock.release()
+
+    def poll(self):
+        return self.returncode
+
+    def kill(self):
+        """
+        Stops the command running in the worker, the worker keeps running
+        """
+        if(self.pid is not None and self.returncode is None):
+            killProcessGroup(self.pid)
+
+    def communicate(self):
+        output = []
+        while(self.returncode is None):
+            output.append(self.readline())
+        return (''.join(output), None)
+
+
+pio_worker = PioWorker()
+
+# seconds to wait before kill the processes that ignored SIGTERM
+KILL_TIMEOUT = 2
+
+# commands running, used to cancel them
+RUNNING_LOCK = threading.Lock()
+running_commands = []
+
+
+def cancelCommands(cancel_key=None):
+    """
+    Cancels the running commands
+
+    Keyword Arguments:
+        cancel_key {tuple} -- only the commands with this key, by default
+                              all the commands (default: {None})
+
+    Returns:
+        bool -- True if any command was cancelled
+    """
+    with RUNNING_LOCK:
+        commands = list(running_commands)
+
+    cancelled = False
+    for command in commands:
+        if(cancel_key is None or command.cancel_key == cancel_key):
+            command.cancel()
+            cancelled = cancelled or command.cancelled
+    return cancelled
+
+
+def killProcessTree(process):
+    """
+    Stops a process and all the processes started by it
+
+    Arguments:
+        process {Popen/WorkerCommand} -- process to stop
+    """
+    if(isinstance(process, WorkerCommand)):
+        process.kill()
+        return
+
+    if(os.name == 'posix'):
+        # the process was started as leader of a new session
+        killProcessGroup(process.pid, process)
+        return
+
+    try:
+        subprocess.call(['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError:
+        process.kill()
+
+
+def killProcessGroup(pgid, process=None):
+    """
+    Sends SIGTERM to the process group and SIGKILL after KILL_TIMEOUT
+    if the leader is still alive
+
+    Arguments:
+        pgid {int} -- process group id
+
+    Keyword Arguments:
+        process {Popen} -- leader of the group (default: {None})
+    """
+    try:
+        os.killpg(pgid, signal.SIGTERM)
+    except OSError:
+        return
+
+    def kill():
+        if(process is not None and process.poll() is not None):
+            return
+        try:
+            os.killpg(pgid, signal.SIGKILL)
+        except OSError:
+            pass
+
+    timer = threading.Timer(KILL_TIMEOUT, kill)
+    timer.daemon = True
+    timer.start()
+
+
+class OutputClassifier(object):
+    """
+    Finds all the kinds of text (warning, error, progress, download...)
+    present in a line of the platformio output. Most of the rules are
+    plain substrings (a fast 'in' test), the rules that need a regular
+    expression are compiled only once.
+    """
+
+    def __init__(self, rules):
+        """
+        Arguments:
+            rules {list} -- list of tuples (kind, substring or compiled
+                            regex), a kind can have more than one rule
+        """
+        self.rules = rules
+
+    def classify(self, text):
+        """
+        Arguments:
+            text {str} -- line in lower case
+
+        Returns:
+            set -- kinds found in the text
+        """
+        kinds = set()
+        for kind, rule in self.rules:
+            if(kind in kinds):
+                continue
+            if(isinstance(rule, str)):
+                if(rule in text):
+                    kinds.add(kind)
+            elif(rule.search(text) is not None):
+                kinds.add(kind)
+        return kinds
+
+
+class WordReplacer(object):
     """
-    take a text and replace words that match a key in a dictionary with
-    the associated value, return the changed text
+    Replace the words that match a key in a dictionary with the associated
+    value, the regular expression is compiled only once
     """
-    rc = re.compile('|'.join(map(re.escape, wordDic)))
 
-    def translate(match):
-        return wordDic[match.group(0)]
-    return rc.sub(translate, text)
+    def __init__(self, wordDic):
+        self.wordDic = wordDic
+        self.regex = re.compile('|'.join(map(re.escape, wordDic)))
+
+    def translate(self, match):
+        return self.wordDic[match.group(0)]
+
+    def replace(self, text):
+        return self.regex.sub(self.translate, text)
+
+
+OUTPUT_RULES = [('warning', 'warning:'),
+                ('cygwin', 'cygwin'),
+                ('function', 'in function'),
+                ('reference', 'reference'),
+                ('file', 'in file'),
+                ('error', 'error:'),
+                ('caret', '^'),
+                ('ser_open', 'ser_open'),
+                ('permission', 'permission'),
+                ('programmer', ': programmer'),
+                ('attempt', ' attempt '),
+                ('percentage', re.compile(r'\[ \d+% \]')),
+                ('progress', re.compile(r'\] \d+%')),
+                ('info', '[info]:'),
+                ('info', '[error]:'),
+                ('already', 'already'),
+                ('downloading', 'downloading'),
+                ('unpacking', 'unpacking')]
+
+DIAGNOSTIC_KINDS = frozenset(['function', 'reference', 'file', 'error',
+                              'caret', 'ser_open', 'permission'])
+PROGRESS_KINDS = frozenset(['attempt', 'percentage', 'progress'])
+
+output_classifier = OutputClassifier(OUTPUT_RULES)
+
+# lines with the size of the firmware (PlatformIO summary and avr-size)
+SIZE_REPORT = re.compile(r"^(Program|Data|RAM|Flash):|^\s+text\s+data\s+bss|"
+                         r"^\s*\d+\s+\d+\s+\d+\s+\d+\s+[0-9a-f]+\s")
+
+progress_words = WordReplacer({'attempt': _('attempt'),
+                               'of': _('of'),
+                               'not in sync': _('not_in_sync')})
+
+info_words = WordReplacer({'Starting on': _('starting_on'),
+                           'Upload size': _('upload_size'),
+                           'Sending invitation to': _('sending_invitation_to'),
+                           'Waiting for device': _('waiting_device'),
+                           'Waiting for result': _('waiting_result'),
+                           'Result': _('result'),
+                           'Authentication': _('authentication'),
+                           'Failed': _('failed')})
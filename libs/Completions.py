@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import os
+import re
+import json
+import threading
+from bisect import bisect_left
+
+from . import Paths
+from .Keywords import keyword_store
+from .LibraryCatalog import getLibraryCatalog
+from .LibraryCatalog import matchPlatform
+from .Preferences import Preferences
+
+INCLUDE = re.compile(r'^\s*#include\s*[<"](\S+)[">]', re.M)
+# include directive being typed before the cursor
+INCLUDE_TYPED = re.compile(r'^\s*#\s*include\s*[<"]([^<>"]*)$')
+
+
+class CompletionIndex(object):
+    '''
+    Serves the completions of the libraries keywords from memory. Only
+    the libraries available for the platform of the current environment
+    and included in the sketch are used. The keywords of each library are
+    sorted to find the ones starting with the typed prefix by bisection.
+    Inside of an #include directive, the headers of the libraries are
+    completed instead.
+
+    The completions are asked in the UI thread on every keystroke, so
+    the index is built in a background task (see update) when a sketch
+    is activated or modified, and the queries only read it. Until it's
+    ready there are no completions.
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # only one update reads the platform and the catalog at a time
+        self.update_lock = threading.Lock()
+        self.headers = {}
+        self.header_names = ([], [])
+        self.headers_key = None
+        self.views = {}
+        self.pending = set()
+        self.platforms = {}
+
+    def query(self, view, prefix, location=None):
+        '''
+        Gets the completions of the prefix for the sketch in the view
+
+        Arguments:
+            view {st object} -- view of the sketch
+            prefix {str} -- text typed by the user
+
+        Keyword Arguments:
+            location {int} -- point where the text is typed, used to know
+                              if it's an #include directive (default: {None})
+
+        Returns:
+            list -- [trigger, content] pairs, ranked and capped by the
+                    'completions_max' preference
+        '''
+        with self.lock:
+            cached = self.views.get(view.id())
+
+        # the index of the view is updated for the next query
+        if(cached is None or cached[0] != view.change_count()):
+            self.schedule(view)
+
+        if(cached is None):
+            return []
+
+        if(location is not None):
+            import sublime
+            line = view.line(location)
+            typed = INCLUDE_TYPED.match(
+                view.substr(sublime.Region(line.a, location)))
+            if(typed is not None):
+                return self.queryHeaders(typed.group(1))
+
+        if(not prefix):
+            return []
+
+        limit = Preferences().get('completions_max', 100)
+        found = {}
+        for keywords_file, name in cached[2]:
+            self.search(keywords_file, prefix, name, found)
+
+        ranked = sorted(found.values(), key=lambda item: item[0])
+        return [item[1] for item in ranked[:limit]]
+
+    def queryHeaders(self, typed):
+        '''
+        Completions of the headers of the libraries available for the
+        platform of the current environment
+
+        Arguments:
+            typed {str} -- header name typed after '#include <'
+
+        Returns:
+            list -- [trigger, content] pairs
+        '''
+        with self.lock:
+            headers = self.headers
+            lower_names, names = self.header_names
+
+        limit = Preferences().get('completions_max', 100)
+        lower_typed = typed.lower()
+        index = bisect_left(lower_names, lower_typed)
+
+        completions = []
+        while(index < len(lower_names) and len(completions) < limit and
+              lower_names[index].startswith(lower_typed)):
+            header = names[index]
+            index += 1
+            trigger = '%s\t%s' % (header, headers[header][0]['name'])
+            completions.append([trigger, header])
+
+        return completions
+
+    def schedule(self, view):
+        '''
+        Updates the index of the view in a background task, only one
+        update of each view is queued at a time
+
+        Arguments:
+            view {st object} -- view of the sketch
+        '''
+        from . import Tasks
+
+        with self.lock:
+            if(view.id() in self.pending):
+                return
+            self.pending.add(view.id())
+
+        Tasks.submit(self.update, view, priority=Tasks.BACKGROUND)
+
+    def update(self, view):
+        '''
+        Reads the platform of the current environment, the headers of the
+        catalog, the headers included in the sketch and the keywords of
+        their libraries. It reads the disk, it must run out of the UI thread
+
+        Arguments:
+            view {st object} -- view of the sketch
+        '''
+        import sublime
+
+        try:
+            change_count = view.change_count()
+            text = view.substr(sublime.Region(0, view.size()))
+            includes = INCLUDE.findall(text)
+
+            with self.update_lock:
+                platform = self.getPlatform()
+                headers = self.getHeaders(platform)
+
+            libraries = {}
+            for include in includes:
+                for library in headers.get(os.path.basename(include), []):
+                    libraries[library['path']] = library
+
+            keywords_files = []
+            for path in sorted(libraries):
+                key_file = os.path.join(path, 'keywords.txt')
+                keywords_file = keyword_store.getFile(key_file)
+                if(keywords_file):
+                    keywords_file.get_index()
+                    keywords_files.append((keywords_file,
+                                           libraries[path]['name']))
+
+            with self.lock:
+                self.views[view.id()] = (change_count, includes,
+                                         keywords_files)
+        finally:
+            with self.lock:
+                self.pending.discard(view.id())
+
+    def search(self, keywords_file, prefix, name, found):
+        '''
+        Adds the keywords starting with the prefix (case insensitive)
+        to the found dictionary
+
+        Arguments:
+            keywords_file {KeywordsFile} -- file with the keywords
+            prefix {str} -- text typed by the user
+            name {str} -- library name, showed as hint
+            found {dict} -- {id: (rank, completion)}
+        '''
+        lower_prefix = prefix.lower()
+        ids, keywords = keywords_file.get_index()
+        index = bisect_left(ids, lower_prefix)
+
+        while(index < len(ids) and ids[index].startswith(lower_prefix)):
+            keyword = keywords[index]
+            index += 1
+
+            if(keyword.id in found):
+                continue
+
+            # same case first, then shorter words
+            rank = (not keyword.id.startswith(prefix), len(keyword.id),
+                    keyword.id)
+            trigger = '%s\t%s' % (keyword.id, name)
+            found[keyword.id] = (rank, [trigger, keyword.id])
+
+    def getPlatform(self):
+        '''
+        Platform of the board of the current environment, it's read from
+        platformio_boards.json only when the file or the environment changes
+
+        Returns:
+            str -- platform name, 'all' when it's unknown
+        '''
+        from . import Tools
+
+        environment = Tools.getEnvironment()
+        boards_path = Paths.getTemplateMenuPath('platformio_boards.json',
+                                                user_path=True)
+        try:
+            mtime = os.stat(boards_path).st_mtime
+        except OSError:
+            return 'all'
+
+        if(self.platforms.get('mtime') != mtime):
+            try:
+                with open(boards_path, 'rb') as file:
+                    boards = json.loads(file.read().decode('utf-8'))
+            except (IOError, OSError, ValueError):
+                boards = {}
+            self.platforms = {'mtime': mtime, 'boards': boards}
+
+        try:
+            board = self.platforms['boards'][environment]
+            return board['platform'].lower()
+        except (KeyError, TypeError, AttributeError):
+            return 'all'
+
+    def getHeaders(self, platform):
+        '''
+        Map of each header to the libraries of the platform providing it,
+        taken from the header index of the catalog. It's built again when
+        the library catalog changes
+
+        Arguments:
+            platform {str} -- platform of the current board
+
+        Returns:
+            dict -- {header name: [library]}
+        '''
+        catalog = getLibraryCatalog(refresh=False)
+        key = (platform, catalog.revision)
+
+        if(self.headers_key != key):
+            headers = {}
+            for header, libraries in catalog.getHeaderIndex().items():
+                libraries = [library for library in libraries
+                             if matchPlatform(library['platform'], platform)]
+                if(libraries):
+                    headers[header] = libraries
+
+            names = sorted(headers, key=lambda name: (name.lower(), name))
+            with self.lock:
+                self.headers = headers
+                self.header_names = ([name.lower() for name in names],
+                                     names)
+            self.headers_key = key
+
+        return self.headers
+
+    def getIncludes(self, view):
+        '''
+        Headers included in the sketch, taken from the index when it's
+        updated with the last changes of the view
+
+        Arguments:
+            view {st object} -- view of the sketch
+
+        Returns:
+            list -- headers included
+        '''
+        with self.lock:
+            cached = self.views.get(view.id())
+
+        if(cached and cached[0] == view.change_count()):
+            return cached[1]
+
+        import sublime
+        text = view.substr(sublime.Region(0, view.size()))
+        return INCLUDE.findall(text)
+
+    def forgetView(self, view):
+        with self.lock:
+            self.views.pop(view.id(), None)
+
+
+completion_index = CompletionIndex()
+
+
+def removeStaticCompletions():
+    '''
+    Removes the completions file generated by the previous versions,
+    the completions are served by the CompletionIndex now
+    '''
+    user_path = Paths.getDeviotUserPath()
+    completion_path = os.path.join(user_path, 'Deviot.sublime-completions')
+
+    if(os.path.isfile(completion_path)):
+        try:
+            os.remove(completion_path)
+        except OSError:
+            pass
@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import os
+import re
+import threading
+from collections import namedtuple
+
+import sublime
+
+# path:line:column: severity: message (the column is optional)
+DIAGNOSTIC = re.compile(r'^\s*(?P<file>(?:[A-Za-z]:)?[^:\n]+?):(?P<line>\d+):'
+                        r'(?:(?P<column>\d+):)?\s*'
+                        r'(?P<severity>fatal error|error|warning|note):\s*'
+                        r'(?P<message>.*?)\s*$')
+
+REGION_KEY = 'deviot_errors'
+ICON = 'Packages/Theme - Default/dot.png'
+# milliseconds to wait for more diagnostics before update the views
+FLUSH_DELAY = 200
+
+
+class Diagnostic(namedtuple('Diagnostic', ['file', 'line', 'column',
+                                           'severity', 'message'])):
+    '''
+    Error or warning reported by the compiler, the line and the column
+    start from 1 (the column is 0 when it's unknown)
+    '''
+    __slots__ = ()
+
+
+def parseDiagnostic(text, cwd=None):
+    '''
+    Parses a line of the compiler output
+
+    Arguments:
+        text {str} -- line of the output
+
+    Keyword Arguments:
+        cwd {str} -- folder used to resolve the relative paths
+                     (default: {None})
+
+    Returns:
+        Diagnostic -- None when the line isn't a diagnostic
+    '''
+    if(':' not in text):
+        return None
+
+    match = DIAGNOSTIC.match(text)
+    if(match is None):
+        return None
+
+    file_path = match.group('file').strip()
+    if(cwd and not os.path.isabs(file_path)):
+        file_path = os.path.join(cwd, file_path)
+    file_path = os.path.normpath(file_path)
+
+    severity = match.group('severity')
+    if(severity == 'fatal error'):
+        severity = 'error'
+
+    return Diagnostic(file_path, int(match.group('line')),
+                      int(match.group('column') or 0), severity,
+                      match.group('message'))
+
+
+class DiagnosticIndex(object):
+    '''
+    Diagnostics of the last build grouped by file. They're added while
+    the build output is read, and the errors are highlighted in the views
+    in batches: all the regions of a file are set at once, at most every
+    FLUSH_DELAY milliseconds, instead of one by one after the build.
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.files = {}
+        self.pending = set()
+        self.highlighted = set()
+        self.scheduled = False
+        self.shown = False
+        self.cwd = None
+
+    def clear(self, cwd=None):
+        '''
+        Forgets the diagnostics of the previous build and removes its
+        highlights
+
+        Keyword Arguments:
+            cwd {str} -- folder used to resolve the relative paths of
+                         the next build (default: {None})
+        '''
+        with self.lock:
+            self.files = {}
+            self.pending = set()
+            self.shown = False
+            self.cwd = cwd
+            highlighted = self.highlighted
+            self.highlighted = set()
+
+        if(highlighted):
+            sublime.set_timeout(lambda: self.eraseRegions(highlighted), 0)
+
+    def feed(self, text):
+        '''
+        Adds the diagnostic in a line of the build output, the highlights
+        of the file are updated after FLUSH_DELAY
+
+        Arguments:
+            text {str} -- line of the output
+
+        Returns:
+            Diagnostic -- None when the line isn't a diagnostic
+        '''
+        diagnostic = parseDiagnostic(text, self.cwd)
+        if(diagnostic is None):
+            return None
+
+        with self.lock:
+            self.files.setdefault(diagnostic.file, []).append(diagnostic)
+            if(diagnostic.severity != 'error'):
+                return diagnostic
+
+            self.pending.add(diagnostic.file)
+            if(self.scheduled):
+                return diagnostic
+            self.scheduled = True
+
+        sublime.set_timeout(self.flush, FLUSH_DELAY)
+        return diagnostic
+
+    def getDiagnostics(self, file_path=None, severity=None):
+        '''
+        Gets the diagnostics of the last build
+
+        Keyword Arguments:
+            file_path {str} -- only the diagnostics of this file
+            severity {str} -- only the diagnostics with this severity
+
+        Returns:
+            list -- Diagnostic tuples in the order they were reported
+        '''
+        with self.lock:
+            if(file_path is not None):
+                files = [self.files.get(os.path.normpath(file_path), [])]
+            else:
+                files = list(self.files.values())
+
+        return [diagnostic for diagnostics in files
+                for diagnostic in diagnostics
+                if severity is None or diagnostic.severity == severity]
+
+    def flush(self):
+        '''
+        Highlights the errors of the files changed since the last flush,
+        the files are opened if needed. It must run in the main thread
+        '''
+        with self.lock:
+            pending = self.pending
+            self.pending = set()
+            self.scheduled = False
+
+        window = sublime.active_window()
+        if(window is None):
+            return
+
+        loading = set()
+        for file_path in sorted(pending):
+            view = window.find_open_file(file_path)
+            if(view is None):
+                if(not os.path.isfile(file_path)):
+                    continue
+                view = window.open_file(file_path)
+
+            if(view.is_loading()):
+                loading.add(file_path)
+                continue
+
+            self.applyView(view, file_path)
+
+        # try again when the views opened are loaded
+        if(loading):
+            with self.lock:
+                self.pending.update(loading)
+                if(self.scheduled):
+                    return
+                self.scheduled = True
+            sublime.set_timeout(self.flush, FLUSH_DELAY)
+
+    def applyView(self, view, file_path):
+        '''
+        Sets all the error regions of a file in its view
+
+        Arguments:
+            view {st object} -- view of the file
+            file_path {str} -- path of the file
+        '''
+        errors = self.getDiagnostics(file_path, 'error')
+        regions = [errorRegion(view, error) for error in errors]
+
+        view.add_regions(REGION_KEY, regions, 'invalid', ICON,
+                         sublime.DRAW_NO_FILL)
+
+        with self.lock:
+            self.highlighted.add(file_path)
+            show = not self.shown and bool(regions)
+            self.shown = self.shown or show
+
+        if(show):
+            view.show(regions[0])
+
+    def eraseRegions(self, files):
+        '''
+        Removes the highlights of the given files
+
+        Arguments:
+            files {set} -- paths of the files
+        '''
+        for window in sublime.windows():
+            for file_path in files:
+                view = window.find_open_file(file_path)
+                if(view is not None):
+                    view.erase_regions(REGION_KEY)
+
+
+def errorRegion(view, error):
+    '''
+    Region of the line with the error. When the compiler reports an
+    error before a token at the beginning of a line (a missing semicolon)
+    the previous line with code is used
+
+    Arguments:
+        view {st object} -- view of the file
+        error {Diagnostic} -- error to highlight
+
+    Returns:
+        sublime.Region -- full line
+    '''
+    row = max(error.line - 1, 0)
+    line = view.line(view.text_point(row, 0))
+
+    if(' before ' not in error.message):
+        return line
+
+    column = max(error.column - 1, 0)
+    if(view.substr(line)[:column].strip()):
+        return line
+
+    while(row > 0):
+        row -= 1
+        previous = view.line(view.text_point(row, 0))
+        if(view.substr(previous).strip()):
+            return previous
+
+    return line
+
+
+diagnostics = DiagnosticIndex()
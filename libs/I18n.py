@@ -7,7 +7,10 @@ from __future__ import division
 from __future__ import unicode_literals
 
 import os
+import re
+import json
 import glob
+import codecs
 
 from . import Paths
 from . import Tools
@@ -15,6 +18,9 @@ from .Preferences import Preferences
 from .JSONFile import JSONFile
 
 
+PLACEHOLDER = re.compile(r'\{(\d+)\}')
+
+
 @Tools.singleton
 class I18n(object):
 
@@ -23,6 +29,7 @@ class I18n(object):
         self.ids_lang = []
         self.id_path_dict = {}
         self.trans_dict = {}
+        self.templates = {}
         self.listIds()
         self.Preferences = Preferences()
         self.id_lang = self.Preferences.get('id_lang', Tools.getSystemLang())
@@ -33,7 +40,7 @@ class I18n(object):
         self.lang_params = JSONFile(language_list_path).getData()
         language_path = Paths.getLanguagePath()
 
-        lang_file_paths = glob.glob(language_path + '/*.lang')
+        lang_file_paths = getCatalogCache().getLanguageFiles(language_path)
         lang_file_names = [os.path.basename(p) for p in lang_file_paths]
         self.ids_lang += [os.path.splitext(nam)[0] for nam in lang_file_names]
         self.id_path_dict.update(dict(zip(self.ids_lang, lang_file_paths)))
@@ -44,14 +51,27 @@ class I18n(object):
         lang_file_path = self.id_path_dict[self.id_lang]
         lang_file = LanguageFile(lang_file_path)
         self.trans_dict = lang_file.getTransDict()
+        self.templates = dict((key, compileTemplate(value))
+                              for key, value in self.trans_dict.items()
+                              if '{' in value)
         self.Preferences.set('id_lang', self.id_lang)
 
     def translate(self, text, *params):
-        trans_text = self.trans_dict.get(text, text)
-        for seq, param in enumerate(params):
-            seq_text = '{%d}' % seq
-            trans_text = trans_text.replace(seq_text, str(param))
-        return trans_text
+        if(not params):
+            return self.trans_dict.get(text, text)
+
+        if(text in self.trans_dict):
+            template = self.templates.get(text)
+            if(template is None):
+                return self.trans_dict[text]
+        else:
+            # text without translation (not cached, it can be any text)
+            template = compileTemplate(text)
+
+        template_text, count = template
+        if(count > len(params)):
+            return replaceParams(self.trans_dict.get(text, text), params)
+        return template_text.format(*params)
 
     def getLangId(self):
         return self.id_lang
@@ -63,17 +83,127 @@ class I18n(object):
         return self.lang_params.get(lang_id, ['Unknown', 'Unknown'])
 
 
-class LanguageFile(JSONFile):
+class LanguageFile(object):
 
     def __init__(self, path):
-        super(LanguageFile, self).__init__(path)
-        text = self.readFile()
-        self.trans_dict = loadTransDict(text)
+        self.path = path
+        self.trans_dict = getCatalogCache().getTransDict(path)
 
     def getTransDict(self):
         return self.trans_dict
 
 
+class CatalogCache(JSONFile):
+    '''
+    Stores the parsed language files in the Deviot cache folder, a file
+    is only parsed again when its modification time or size changes
+
+    Extends: JSONFile
+    '''
+
+    def __init__(self):
+        path = os.path.join(Paths.getCacheDir(), 'translations.json')
+        super(CatalogCache, self).__init__(path)
+
+        if(not isinstance(self.data.get('catalogs'), dict)):
+            self.data = {'languages': {}, 'catalogs': {}}
+
+    def getLanguageFiles(self, language_path):
+        '''
+        Paths of the .lang files, the folder is only listed again
+        when it's modified
+
+        Arguments:
+            language_path {str} -- folder with the language files
+
+        Returns:
+            list -- paths of the language files
+        '''
+        stamp = getStamp(language_path)
+        cached = self.data['languages']
+
+        if(cached.get('stamp') != stamp or cached.get('path') != language_path):
+            files = glob.glob(language_path + '/*.lang')
+            cached = {'stamp': stamp, 'path': language_path, 'files': files}
+            self.data['languages'] = cached
+            self.saveData()
+
+        return cached['files']
+
+    def getTransDict(self, path):
+        '''
+        Translations of a language file
+
+        Arguments:
+            path {str} -- language file path
+
+        Returns:
+            dict -- {msgid: msgstr}
+        '''
+        stamp = getStamp(path)
+        cached = self.data['catalogs'].get(path)
+
+        if(not cached or cached['stamp'] != stamp):
+            with codecs.open(path, 'r', 'utf-8') as file:
+                text = file.read()
+            cached = {'stamp': stamp, 'trans_dict': loadTransDict(text)}
+            self.data['catalogs'][path] = cached
+            self.saveData()
+
+        return cached['trans_dict']
+
+    def saveData(self):
+        text = json.dumps(self.data, separators=(',', ':'))
+        self.writeFile(text)
+
+
+CATALOG_CACHE = []
+
+
+def getCatalogCache():
+    if(not CATALOG_CACHE):
+        CATALOG_CACHE.append(CatalogCache())
+    return CATALOG_CACHE[0]
+
+
+def getStamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime, stat.st_size]
+
+
+def compileTemplate(text):
+    '''
+    Converts a translation with {0}, {1}... placeholders in a format
+    template, so all the parameters are set in one step
+
+    Arguments:
+        text {str} -- translated text
+
+    Returns:
+        tuple -- (format template, number of parameters used)
+    '''
+    parts = PLACEHOLDER.split(text)
+    template = []
+    count = 0
+    for index, part in enumerate(parts):
+        if(index % 2):
+            count = max(count, int(part) + 1)
+            template.append('{%s}' % part)
+        else:
+            template.append(part.replace('{', '{{').replace('}', '}}'))
+    return (''.join(template), count)
+
+
+def replaceParams(text, params):
+    for seq, param in enumerate(params):
+        seq_text = '{%d}' % seq
+        text = text.replace(seq_text, str(param))
+    return text
+
+
 def loadTransDict(text):
     trans_dict = {}
     lines = text.split('\n')
@@ -10,7 +10,6 @@ import os
 import time
 import json
 import datetime
-import threading
 import tempfile
 import sublime
 from shutil import rmtree
@@ -26,7 +25,7 @@ from .I18n import I18n
 from .JSONFile import JSONFile
 from . import __version__ as version
 from .Preferences import Preferences
-from .Progress import ThreadProgress
+from . import Tasks
 
 _ = I18n().translate
 
@@ -67,9 +66,9 @@ class PioInstall(object):
             self.message_queue.put("_deviot_{0}", version)
 
     def checkPio(self):
-        thread = threading.Thread(target=self.threadcheckPio)
-        thread.start()
-        ThreadProgress(thread, _('processing'), _('done'))
+        Tasks.submit(self.threadcheckPio, name='check platformio',
+                     priority=Tasks.BACKGROUND,
+                     message=_('processing'), success_message=_('done'))
 
     def threadcheckPio(self):
         '''Check PlatformIO
@@ -523,11 +522,15 @@ class PioInstall(object):
         Arguments: type {string} -- type of action.
                    Valid values: build/upload/clean
         """
-        thread = threading.Thread(target=func)
-        thread.start()
+        # a worker waiting for other task could block the pool
+        if(join and Tasks.currentTask() is not None):
+            func()
+            return
+
+        task = Tasks.submit(func, message=_('processing'),
+                            success_message=_('done'))
         if(join):
-            thread.join()
-        ThreadProgress(thread, _('processing'), _('done'))
+            task.wait()
 
     def installDependencies(self, dependency='all'):
 
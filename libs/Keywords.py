@@ -7,13 +7,18 @@ from __future__ import print_function
 from __future__ import division
 from __future__ import unicode_literals
 
+import os
+import io
+import re
+import threading
+from collections import namedtuple
 
-class Keyword(object):
+REGEX_SPECIAL = frozenset('\\.^$|?*+()[]{}')
+CLASS_SPECIAL = frozenset('\\]^-[')
 
-    def __init__(self, _id, word_type, ref):
-        self.id = _id
-        self.word_type = word_type
-        self.ref = ref
+
+class Keyword(namedtuple('Keyword', ['id', 'word_type', 'ref'])):
+    __slots__ = ()
 
     def get_id(self):
         return self.id
@@ -26,14 +31,17 @@ class Keyword(object):
 
 
 class KeywordsFile(object):
+    __slots__ = ('path', 'mtime', 'keywords', 'index')
 
-    def __init__(self, path):
+    def __init__(self, path, mtime=None):
         self.path = path
+        self.mtime = mtime
+        self.index = None
         self.load()
 
     def load(self):
-        self.keywords = []
-        with open(self.path) as text:
+        keywords = []
+        with io.open(self.path, encoding='utf-8', errors='replace') as text:
             for line in text:
                 line = line.strip()
                 if line and not line.startswith('#') and not line.startswith('//'):
@@ -48,16 +56,183 @@ class KeywordsFile(object):
                             word_list.append('')
                     elif len(word_list) == 1:
                         word_list += ['', '']
-                    keyword = Keyword(*word_list)
-                    self.keywords.append(keyword)
-            self.keyword_ids = [k.id for k in self.keywords]
-            self.id_keyword_dict = dict(zip(self.keyword_ids, self.keywords))
+                    keywords.append(Keyword(*word_list))
+        self.keywords = tuple(keywords)
 
     def get_id_keyword_dict(self):
-        return self.id_keyword_dict
+        return dict((k.id, k) for k in self.keywords)
 
     def get_keywords(self):
         return self.keywords
 
     def get_keyword_ids(self):
-        return self.keyword_ids
+        return [k.id for k in self.keywords]
+
+    def get_index(self):
+        """
+        Keywords sorted by their lowercase id to search them by prefix
+
+        Returns:
+            tuple -- (lowercase ids, keywords) in the same order
+        """
+        if(self.index is None):
+            words = {}
+            for keyword in self.keywords:
+                words.setdefault(keyword.id, keyword)
+            ordered = sorted(words.values(),
+                             key=lambda k: (k.id.lower(), k.id))
+            self.index = ([k.id.lower() for k in ordered], ordered)
+        return self.index
+
+
+class KeywordStore(object):
+    '''
+    Keeps the keywords.txt files parsed in memory, a file is only parsed
+    again when its modification time changes
+    '''
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.files = {}
+
+    def getFile(self, path):
+        '''
+        Gets a keywords file parsed, it's only parsed again when it changes
+
+        Arguments:
+            path {str} -- path of the keywords.txt file
+
+        Returns:
+            KeywordsFile -- None if the file doesn't exist
+        '''
+        with self.lock:
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                return None
+
+            keywords_file = self.files.get(path)
+            if(not keywords_file or keywords_file.mtime != mtime):
+                try:
+                    keywords_file = KeywordsFile(path, mtime)
+                except (IOError, OSError):
+                    return None
+                self.files[path] = keywords_file
+
+            return keywords_file
+
+    def getKeywords(self, paths):
+        '''
+        Gets the keywords of the given files, the files that don't
+        exist are ignored
+
+        Arguments:
+            paths {list} -- paths of the keywords.txt files
+
+        Returns:
+            list -- Keyword tuples of all the files
+        '''
+        with self.lock:
+            keywords = []
+            found = set()
+
+            for path in paths:
+                keywords_file = self.getFile(path)
+                if(keywords_file):
+                    found.add(path)
+                    keywords.extend(keywords_file.keywords)
+
+            # forget the files of the removed libraries
+            for path in list(self.files):
+                if(path not in found):
+                    self.files.pop(path)
+
+            return keywords
+
+
+keyword_store = KeywordStore()
+
+
+def trieRegex(words):
+    """
+    Builds a regex alternation of the given words factorized by their
+    common prefixes, 'analog|analogRead|analogWrite' becomes
+    'analog(?:Read|Write)?'. The words are deduplicated and sorted so
+    the result is always the same for the same words.
+
+    Arguments:
+        words {iterable} -- words to match
+
+    Returns:
+        str -- regex (without anchors), empty when there are no words
+    """
+    trie = {}
+    for word in sorted(set(words)):
+        if(not word):
+            continue
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = None
+
+    if(not trie):
+        return ''
+    return trieNodeRegex(trie)
+
+
+def trieNodeRegex(node):
+    """
+    Regex of the words that follow a node of the trie, the node must
+    have at least one child
+
+    Arguments:
+        node {dict} -- {char: child node}, '' marks the end of a word
+
+    Returns:
+        str -- regex
+    """
+    alternatives = []
+    chars = []
+
+    for char in sorted(key for key in node if key):
+        child = node[char]
+        if(list(child) == ['']):
+            # only one char left, it can be merged in a class
+            chars.append(char)
+        else:
+            alternatives.append(escapeRegex(char) + trieNodeRegex(child))
+
+    if(len(chars) == 1):
+        alternatives.append(escapeRegex(chars[0]))
+    elif(chars):
+        chars = ''.join([('\\' + c if c in CLASS_SPECIAL else c)
+                         for c in chars])
+        alternatives.append('[%s]' % chars)
+
+    optional = '' in node
+    single = len(alternatives) == 1
+
+    if(single and not optional):
+        return alternatives[0]
+
+    if(single and isAtom(alternatives[0])):
+        regex = alternatives[0]
+    else:
+        regex = '(?:%s)' % '|'.join(alternatives)
+
+    return regex + '?' if optional else regex
+
+
+def isAtom(regex):
+    """
+    Checks if the regex is a single char or a char class, it means
+    a quantifier can be added without a group
+    """
+    if(len(regex) == 1 or (len(regex) == 2 and regex[0] == '\\')):
+        return True
+    return (regex.startswith('[') and regex.endswith(']') and
+            regex.count(']') == 1 + regex.count('\\]'))
+
+
+def escapeRegex(text):
+    return ''.join([('\\' + c if c in REGEX_SPECIAL else c) for c in text])
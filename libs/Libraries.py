@@ -10,19 +10,28 @@ import os
 import json
 import time
 import sublime
-import threading
-
-from urllib.parse import urlencode
-from urllib.request import Request
-from urllib.request import urlopen
 
 from . import Paths
 from . import Tools
 from . import Messages
 from . import __version__ as version
 from .JSONFile import JSONFile
+from .LibrarySearch import LibrarySearch
+from .LibraryRegistry import getLibraryRegistry
+from .LibraryCatalog import getLibraryCatalog
+from .LibraryCatalog import listFolders
+from .LibraryCatalog import readLibrary
+from .LibraryInstaller import DependencyResolver
+from .LibraryInstaller import getProjectSpecs
+from .LibraryInstaller import queueInstall
+from .LibraryInstaller import nextBatch
+from .LibraryInstaller import resetQueue
+from .LibraryInstaller import specKey
+from .LibraryInstaller import isURL
+from .LibraryInstaller import quoteSpec
+from .ProjectConfig import getProjectConfig
 from .Preferences import Preferences
-from .Progress import ThreadProgress
+from . import Tasks
 from .Commands import CommandsPy
 from .Messages import MessageQueue
 from .I18n import I18n
@@ -40,6 +49,7 @@ class Libraries:
         self.view = view
         self.window = window
         self.Preferences = Preferences()
+        self.more_results = False
         self.pio_version = int(self.Preferences.get('pio_version', 2)[0])
 
         # create window and view if not exists
@@ -61,50 +71,77 @@ class Libraries:
         """
         Search a library in the platformio API api.platformio.org
         the data of all pages are stored in a json file. The result
-        of the search is showing in the st quick panel
+        of the search is showing in the st quick panel as soon as the
+        first page arrives, the rest of pages are downloaded at the
+        same time (see LibrarySearch)
+
+        When the whole registry was downloaded or imported (or the offline
+        search is enabled) the search is answered by the local registry
+        without network, otherwise the online results are added to it
 
         Arguments:
             keyword {string}:
                 Keyword to search the library in the platformio API
         """
-        # building query
-        request = {}
-        request['query'] = keyword
-        query = urlencode(request)
-
-        # request parameters
-        url = 'http://api.platformio.org/lib/search?'
-        req = Request(url + query, headers=Tools.getHeaders())
-
-        # receive first page
-        response = urlopen(req)
-        list = json.loads(response.read().decode())
-
-        # check number of pages
-        nloop = list['total'] / list['perpage']
-        if(nloop > 1):
-            # next pages
-            nloop = int(nloop) + 1 if nloop > int(nloop) else int(nloop)
-            for page in range(2, nloop + 1):
-                # building query of next pages
-                request['page'] = page
-                query = urlencode(request)
-                req = Request(url + query, headers=Tools.getHeaders())
-                # receive first page
-                response = urlopen(req)
-                page_next = json.loads(response.read().decode())
-                for item_next in page_next['items']:
-                    list['items'].append(item_next)
-
-        # save data in file
-        self.saveLibraryData(list, 'default_list.json')
-        # show result in the quick panel
-        self.window.run_command('show_results')
+        registry = getLibraryRegistry()
+        offline = self.Preferences.get('library_search_offline', False)
+
+        if(offline or registry.isComplete()):
+            result = registry.searchResult(keyword)
+            if(result['total'] or offline):
+                self.saveLibraryData(result, 'default_list.json')
+                self.window.run_command('show_results')
+
+                if(not offline and registry.isOutdated()):
+                    openInThread('update_registry')
+                return
+
+        shown = []
+
+        def showResults(result):
+            # save data in file
+            self.saveLibraryData(result, 'default_list.json')
+            # show result in the quick panel
+            if(not shown):
+                shown.append(True)
+                self.window.run_command('show_results')
+
+        result = LibrarySearch(keyword).run(on_page=showResults)
+
+        # keep the results for the next searches
+        if(result is not None):
+            registry.addLibraries(result['items'])
+
+    def updateRegistry(self):
+        """
+        Downloads the whole library registry to search without network
+        """
+        count = getLibraryRegistry().refresh()
+        self.message_queue.startPrint()
+        self.message_queue.put('registry_libraries_{0}', count)
+
+    def importRegistry(self, path):
+        """
+        Adds the libraries of a JSON dump to the library registry
+
+        Arguments:
+            path {str} -- path of the JSON file
+        """
+        self.message_queue.startPrint()
+        try:
+            getLibraryRegistry().importDump(path)
+        except (IOError, OSError, ValueError) as error:
+            self.message_queue.put('registry_import_error_{0}', str(error))
+            return
+
+        count = len(getLibraryRegistry().data['libraries'])
+        self.message_queue.put('registry_libraries_{0}', count)
 
     def getList(self):
         """
         Gets the list with all libraries found and returns
-        on the quick panel
+        on the quick panel. While the search is running, the last item
+        allows to show the list again with the pages received
 
         Returns:
             [dict] -- dictionary with all libraries found
@@ -137,11 +174,18 @@ class Libraries:
 
         # save and return data
         self.saveLibraryData(quick_list, 'quick_list.json')
+
+        if(not list.get('complete', True)):
+            pages_left = list['pages'] - list['pages_received']
+            quick_list.append([_('more_results_{0}', pages_left), '', ''])
+            self.more_results = True
+
         return quick_list
 
     def installLibrary(self, selected):
         """
-        Install the selected library
+        Install the selected library, when other libraries are being
+        installed it's added to the queue and installed in the next batch
 
         Arguments:
             selected {int}
@@ -155,18 +199,141 @@ class Libraries:
         self.message_queue.put('[ Deviot {0} ]\\n', version)
         time.sleep(0.01)
 
-        # Install Library with CLI
+        if(not queueInstall([lib_id])):
+            self.message_queue.put('lib_install_queued_{0}', lib_name)
+            return
+
+        self.installQueued()
+
+    def installProjectLibraries(self):
+        """
+        Install all the libraries listed in the lib_deps option of the
+        current project in one batch, in the libraries folder of the
+        project (where PlatformIO searches them when it builds)
+        """
+        working_path = Tools.getWorkingPath(self.view)
+        ini_path = Paths.getFullIniPath(working_path)
+
+        self.message_queue.startPrint()
+        self.message_queue.put('[ Deviot {0} ]\\n', version)
+        time.sleep(0.01)
+
+        specs = getProjectSpecs(ini_path)
+        if(not specs):
+            self.message_queue.put('none_lib_deps')
+            return
+
+        storage = None
         if(self.pio_version > 2):
-            command = ['lib', '--global', 'install', lib_id]
+            config = getProjectConfig(ini_path).load()
+            libdeps = config.get('platformio', {}).get('libdeps_dir')
+            storage = os.path.join(working_path, libdeps or '.piolibdeps')
+
+        if(not queueInstall(specs, storage)):
+            self.message_queue.put('lib_install_queued_{0}',
+                                   ', '.join(specs))
+            return
+
+        self.installQueued()
+
+    def installQueued(self):
+        """
+        Installs the libraries queued in batches until the queue is empty
+        """
+        stopped = False
+        try:
+            while(True):
+                batch = nextBatch()
+                if(not batch):
+                    stopped = True
+                    return
+
+                for storage, specs in batch.items():
+                    self.installBatch(specs, storage)
+        finally:
+            # nextBatch stops the installer when the queue is empty, when
+            # the loop is broken by an error it must be stopped here
+            if(not stopped):
+                resetQueue()
+
+    def installBatch(self, specs, storage=None):
+        """
+        Install a group of libraries with their dependencies in a single
+        PlatformIO command. The dependencies are resolved before (see
+        DependencyResolver), the libraries already installed are skipped
+        and a summary is shown at the end
+
+        Arguments:
+            specs {list} -- library specifications (id, name, name@version)
+
+        Keyword Arguments:
+            storage {str} -- libraries folder, None for the global libraries
+        """
+        specs = DependencyResolver().resolve(specs)
+        if(Tasks.isCancelled()):
+            return
+
+        installed = self.getInstalledKeys(storage)
+        pending = [spec for spec in specs if specKey(spec) not in installed]
+        already = len(specs) - len(pending)
+
+        error = False
+        if(pending):
+            quoted = [quoteSpec(spec) for spec in pending]
+            if(storage):
+                command = ['lib', '--storage-dir', quoteSpec(storage),
+                           'install'] + quoted
+            elif(self.pio_version > 2):
+                command = ['lib', '--global', 'install'] + quoted
+            else:
+                command = ['lib', 'install'] + quoted
+
+            self.Commands.runCommand(command, 'installing_libs_{0}{1}',
+                                     extra_message=len(pending))
+            error = self.Commands.error_running
+
+            if(storage is None):
+                # update list of libraries installed in the preference
+                # file, the import and examples menus are read from the
+                # same catalog
+                self.updateInstalled()
+
+        installed = self.getInstalledKeys(storage)
+        failed = [spec for spec in pending
+                  if specKey(spec) not in installed and
+                  (error or not isURL(spec))]
+
+        self.message_queue.put('lib_install_summary_{0}{1}{2}',
+                               len(pending) - len(failed), already,
+                               len(failed))
+        if(failed):
+            self.message_queue.put('lib_install_failed_{0}',
+                                   ', '.join(failed))
+
+    def getInstalledKeys(self, storage=None):
+        """
+        Ids and lowercase names of the libraries installed
+
+        Keyword Arguments:
+            storage {str} -- libraries folder, None for the global libraries
+
+        Returns:
+            set -- ids (as strings) and names
+        """
+        if(storage is None):
+            libraries = self.getInstalledLibraries()
+            if(libraries is None):
+                libraries = self.getInstalledListCLI()
         else:
-            command = ['lib', 'install', lib_id]
-        self.Commands.runCommand(
-            command, 'installing_lib_{0}{1}', extra_message=lib_name)
+            libraries = [readLibrary(os.path.join(storage, folder), '')
+                         for folder in listFolders(storage)]
 
-        # update list of libraries installed in the preference file
-        self.getInstalledList(ids=True)
-        # update menu
-        Tools.updateMenuLibs()
+        keys = set()
+        for library in libraries or []:
+            keys.add(library['name'].lower())
+            if(library['id'] is not None):
+                keys.add(str(library['id']))
+        return keys
 
     def installedList(self):
         """
@@ -180,26 +347,26 @@ class Libraries:
 
     def getInstalledList(self, ids=False):
         """
-        Run the CLI command to get the list of library(ies) installed,
-        stores the data in a json file and run a command to show the
-        quick panel with all the data founded
+        Gets the list of library(ies) installed, stores the data in a
+        json file and run a command to show the quick panel with all the
+        data founded. The list is read from the manifests of the libraries
+        (see LibraryCatalog), the CLI is only used when they can't be read
+
+        Keyword Arguments:
+            ids {bool} -- only updates the ids of the installed libraries
+                          in the preferences (default: {False})
         """
-
-        if(self.pio_version > 2):
-            command = ['lib', '--global', 'list', '--json-output']
-        else:
-            command = ['lib', 'list', '--json-output']
-
-        Commands = CommandsPy()
-        output = Commands.runCommand(command, setReturn=True)
-        output = json.loads(output)
+        output = self.getInstalledLibraries()
+        if(output is None):
+            output = self.getInstalledListCLI()
 
         # return a dict with the ids of the installed libraries
         if(ids):
             installed_ids = []
             if(output):
                 for item in output:
-                    installed_ids.append(str(item['id']))
+                    if(item['id'] is not None):
+                        installed_ids.append(str(item['id']))
                 self.Preferences.set('user_libraries', installed_ids)
                 return
 
@@ -210,7 +377,12 @@ class Libraries:
                 item_list = []
                 item_list.append(item['name'])
                 item_list.append(item['description'])
-                item_list.append(str(item['id']))
+                # libraries not installed from the registry are removed
+                # by name
+                if(item['id'] is not None):
+                    item_list.append(str(item['id']))
+                else:
+                    item_list.append(item['name'])
                 quick_list.append(item_list)
         else:
             quick_list = [_('none_lib_installed')]
@@ -219,6 +391,47 @@ class Libraries:
         self.saveLibraryData(quick_list, 'quick_list.json')
         self.window.run_command('show_remove_list')
 
+    def getInstalledLibraries(self):
+        """
+        Libraries installed in the PlatformIO libraries folder, read from
+        the library catalog. The catalog is only read again when the folder
+        changes or after Deviot installs or removes a library
+
+        Returns:
+            list -- dicts with name, description and id, None if the
+                    catalog can't be read
+        """
+        try:
+            catalog = getLibraryCatalog()
+        except (IOError, OSError):
+            return None
+
+        return catalog.getInstalled()
+
+    def getInstalledListCLI(self):
+        """
+        Runs the CLI command to get the list of library(ies) installed
+
+        Returns:
+            list -- dicts with name, description and id
+        """
+        if(self.pio_version > 2):
+            command = ['lib', '--global', 'list', '--json-output']
+        else:
+            command = ['lib', 'list', '--json-output']
+
+        Commands = CommandsPy()
+        output = Commands.runCommand(command, setReturn=True)
+        return json.loads(output)
+
+    def updateInstalled(self):
+        """
+        Reads again the libraries installed after an installation or
+        removal, and updates the ids in the preferences
+        """
+        getLibraryCatalog(refresh=False).invalidate()
+        self.getInstalledList(ids=True)
+
     def removeLibrary(self, selected):
         """
         Run a CLI command with the ID of the library to uninstall,
@@ -237,22 +450,28 @@ class Libraries:
         time.sleep(0.01)
 
         # uninstall Library with CLI
-        if(self.pio_version > 2):
-            command = ['lib', '--global', 'uninstall', lib_id]
-        else:
-            command = ['lib', 'uninstall', lib_id]
-
+        command = self.uninstallCommand(lib_id)
         self.Commands.runCommand(
             command, 'uninstalling_lib_{0}{1}', extra_message=lib_name)
 
         # remove from preferences
         if (not self.Commands.error_running):
-            installed = self.Preferences.get('user_libraries', '')
-            if(installed):
-                if(lib_id in installed):
-                    self.Preferences.data.setdefault(
-                        'user_libraries', []).remove(lib_id)
-                    self.Preferences.saveData()
+            self.updateInstalled()
+
+    def uninstallCommand(self, spec):
+        """
+        PlatformIO command to uninstall a global library
+
+        Arguments:
+            spec {str} -- id of the library, or its name when the
+                          library doesn't have id
+
+        Returns:
+            list -- command
+        """
+        if(self.pio_version > 2):
+            return ['lib', '--global', 'uninstall', quoteSpec(spec)]
+        return ['lib', 'uninstall', quoteSpec(spec)]
 
     def saveLibraryData(self, data, file_name):
         """
@@ -301,22 +520,32 @@ def openInThread(type, window=None, keyword=None):
         keyword {string} -- String with board selected {Default: None}
     """
     if(type == 'download'):
-        thread = threading.Thread(
-            target=Libraries(window).downloadList, args=(keyword,))
-        thread.start()
-        ThreadProgress(thread, _('searching'), _('done'))
+        Tasks.submit(Libraries(window).downloadList, keyword,
+                     name='library search', priority=Tasks.INTERACTIVE,
+                     message=_('searching'), success_message=_('done'))
     elif(type == 'install'):
-        thread = threading.Thread(
-            target=Libraries(window).installLibrary, args=(keyword,))
-        thread.start()
-        ThreadProgress(thread, _('installing'), _('done'))
+        Tasks.submit(Libraries(window).installLibrary, keyword,
+                     name='library install',
+                     message=_('installing'), success_message=_('done'))
+    elif(type == 'install_project'):
+        Tasks.submit(Libraries(window).installProjectLibraries,
+                     name='library install',
+                     message=_('installing'), success_message=_('done'))
     elif(type == 'list'):
-        thread = threading.Thread(target=Libraries(
-            feedback=False).getInstalledList)
-        thread.start()
-        ThreadProgress(thread, _('preparing_list'), _('done'))
+        Tasks.submit(Libraries(feedback=False).getInstalledList,
+                     name='library list', priority=Tasks.INTERACTIVE,
+                     message=_('preparing_list'), success_message=_('done'))
+    elif(type == 'update_registry'):
+        Tasks.submit(Libraries(window).updateRegistry,
+                     name='library registry', priority=Tasks.BACKGROUND,
+                     message=_('updating_registry'),
+                     success_message=_('done'))
+    elif(type == 'import_registry'):
+        Tasks.submit(Libraries(window).importRegistry, keyword,
+                     name='library registry import',
+                     message=_('updating_registry'),
+                     success_message=_('done'))
     elif(type == 'remove'):
-        thread = threading.Thread(
-            target=Libraries(window).removeLibrary, args=(keyword,))
-        thread.start()
-        ThreadProgress(thread, _('removing'), _('done'))
+        Tasks.submit(Libraries(window).removeLibrary, keyword,
+                     name='library remove',
+                     message=_('removing'), success_message=_('done'))
@@ -0,0 +1,472 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import os
+import re
+import threading
+
+from . import Paths
+from .JSONFile import JSONFile
+
+CATALOG_VERSION = 2
+LIBRARY_ID = re.compile(r"^(\w+)_ID?")
+FOLDER_ID = re.compile(r"_ID(\d+)$")
+PROPERTIES = re.compile(r"^\s*(name|sentence|version)\s*=\s*(.+?)\s*$", re.M)
+
+
+class LibraryCatalog(JSONFile):
+    '''
+    Index of the libraries installed in PlatformIO (~/.platformio/lib) and
+    in the frameworks (~/.platformio/packages/*/libraries). Each library
+    has its name, registry id, description, version, path, platform
+    (package where it's installed), headers and examples folder.
+
+    The index is stored in the Deviot cache folder. When it's refreshed,
+    only the folders with a different modification time are read again.
+
+    Extends: JSONFile
+    '''
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.changed = False
+        self.revision = 0
+        self.header_index = None
+        self.header_revision = None
+
+        path = os.path.join(Paths.getCacheDir(), 'libraries.json')
+        super(LibraryCatalog, self).__init__(path)
+
+        if(self.data.get('version') != CATALOG_VERSION):
+            self.data = {'version': CATALOG_VERSION,
+                         'packages': {},
+                         'containers': {}}
+
+    def refresh(self):
+        '''
+        Updates the index with the folders modified since the last refresh
+        and stores it in the cache file when something changed
+        '''
+        with self.lock:
+            self.changed = False
+
+            containers = {Paths.getPioLibrary(): ''}
+            containers.update(self.getPackageContainers())
+
+            # libraries folders found inside of other libraries folder
+            pending = list(containers.items())
+            while pending:
+                path, platform = pending.pop()
+                for core in self.refreshContainer(path, platform):
+                    if(core not in containers):
+                        containers[core] = platform
+                        pending.append((core, platform))
+
+            # removed folders
+            for path in list(self.data['containers']):
+                if(path not in containers):
+                    self.data['containers'].pop(path)
+                    self.changed = True
+
+            if(self.changed):
+                self.revision += 1
+                self.saveData()
+
+    def getPackageContainers(self):
+        '''
+        Searches the libraries folders of each package installed. The
+        folders of a package are only searched again if it was modified
+
+        Returns:
+            dict -- {libraries folder: package name}
+        '''
+        root = Paths.getPioPackages()
+        packages = self.data['packages']
+        containers = {}
+        found_packages = set()
+
+        for name in listFolders(root):
+            path = os.path.join(root, name)
+            found_packages.add(path)
+            mtime = getMTime(path)
+            cached = packages.get(path)
+
+            if(not cached or cached['mtime'] != mtime):
+                found = [os.path.join(path, sub) for sub in listFolders(path)
+                         if 'libraries' in sub]
+                cached = {'mtime': mtime, 'containers': found}
+                packages[path] = cached
+                self.changed = True
+
+            for container in cached['containers']:
+                containers[container] = name
+
+        # removed packages
+        for path in list(packages):
+            if(path not in found_packages):
+                packages.pop(path)
+                self.changed = True
+
+        return containers
+
+    def refreshContainer(self, path, platform):
+        '''
+        Reads the libraries of a folder, if it wasn't modified since the
+        last refresh the stored libraries are used
+
+        Arguments:
+            path {str} -- folder with libraries
+            platform {str} -- package name, empty for the PlatformIO
+                              libraries
+
+        Returns:
+            list -- libraries folders inside (__cores__ folder)
+        '''
+        mtime = getMTime(path)
+        cached = self.data['containers'].get(path)
+
+        if(cached and cached['mtime'] == mtime):
+            return cached['cores']
+
+        old_libraries = {}
+        if(cached):
+            old_libraries = {lib['path']: lib for lib in cached['libraries']}
+
+        libraries = []
+        cores = []
+        for name in listFolders(path):
+            lib_path = os.path.join(path, name)
+
+            if(name == '__cores__'):
+                cores.extend([os.path.join(lib_path, core)
+                              for core in listFolders(lib_path)])
+                continue
+
+            lib_mtime = getMTime(lib_path)
+            library = old_libraries.get(lib_path)
+            if(not library or library['mtime'] != lib_mtime):
+                library = readLibrary(lib_path, platform)
+                library['mtime'] = lib_mtime
+            libraries.append(library)
+
+        self.data['containers'][path] = {'mtime': mtime,
+                                         'platform': platform,
+                                         'libraries': libraries,
+                                         'cores': cores}
+        self.changed = True
+
+        return cores
+
+    def invalidate(self, path=None):
+        '''
+        Forces to read again a libraries folder in the next refresh, used
+        after Deviot installs or removes a library, the modification time
+        of the folder can be the same when it's changed in the same second
+
+        Keyword Arguments:
+            path {str} -- libraries folder (default: PlatformIO libraries)
+        '''
+        if(path is None):
+            path = Paths.getPioLibrary()
+
+        with self.lock:
+            cached = self.data['containers'].get(path)
+            if(cached):
+                cached['mtime'] = None
+                for library in cached['libraries']:
+                    library['mtime'] = None
+
+    def getInstalled(self):
+        '''
+        Libraries installed in the PlatformIO libraries folder (global
+        libraries), without the frameworks libraries
+
+        Returns:
+            list -- dicts with the library details sorted by name
+        '''
+        with self.lock:
+            cached = self.data['containers'].get(Paths.getPioLibrary())
+            libraries = list(cached['libraries']) if cached else []
+
+        return sorted(libraries, key=lambda lib: lib['name'].lower())
+
+    def getLibrary(self, path):
+        '''
+        Gets a library by its folder
+
+        Arguments:
+            path {str} -- library folder
+
+        Returns:
+            dict -- library details, None if it's not in the catalog
+        '''
+        with self.lock:
+            container = self.data['containers'].get(os.path.dirname(path))
+            if(not container):
+                return None
+            for library in container['libraries']:
+                if(library['path'] == path):
+                    return library
+        return None
+
+    def getHeaderIndex(self):
+        '''
+        Reverse index of the headers, it maps each header name to the
+        libraries that provide it (in all the platforms). It's built from
+        the stored catalog, only again when the catalog changes
+
+        Returns:
+            dict -- {header name: [library]}
+        '''
+        with self.lock:
+            if(self.header_revision == self.revision and
+                    self.header_index is not None):
+                return self.header_index
+
+            pio_lib = Paths.getPioLibrary()
+            index = {}
+            for path in sorted(self.data['containers'],
+                               key=lambda path: (path != pio_lib, path)):
+                container = self.data['containers'][path]
+                for library in container['libraries']:
+                    for header in library['headers']:
+                        index.setdefault(header, []).append(library)
+
+            self.header_index = index
+            self.header_revision = self.revision
+            return index
+
+    def findHeader(self, header, platform='all'):
+        '''
+        Libraries that provide a header, the PlatformIO libraries first.
+        When no library has the exact name, the case is ignored
+
+        Arguments:
+            header {str} -- header name ('Wire.h')
+
+        Keyword Arguments:
+            platform {str} -- platform of the current board (default: {'all'})
+
+        Returns:
+            list -- dicts with the library details
+        '''
+        header = os.path.basename(header.strip().strip('<>"'))
+        index = self.getHeaderIndex()
+        libraries = index.get(header)
+
+        if(libraries is None):
+            lower = header.lower()
+            libraries = [library for name in index if name.lower() == lower
+                         for library in index[name]]
+
+        return [library for library in libraries
+                if matchPlatform(library['platform'], platform)]
+
+    def getFolders(self, platform='all'):
+        '''
+        Folders with libraries available for the given platform
+
+        Keyword Arguments:
+            platform {str} -- platform of the current board (default: {'all'})
+
+        Returns:
+            list -- folders paths
+        '''
+        with self.lock:
+            containers = self.data['containers']
+            return sorted([path for path in containers
+                           if matchPlatform(containers[path]['platform'],
+                                            platform)])
+
+    def getLibraries(self, platform='all'):
+        '''
+        Libraries available for the given platform, sorted by the
+        folders (PlatformIO libraries first)
+
+        Keyword Arguments:
+            platform {str} -- platform of the current board (default: {'all'})
+
+        Returns:
+            list -- dicts with the library details
+        '''
+        with self.lock:
+            pio_lib = Paths.getPioLibrary()
+            containers = self.data['containers']
+            folders = self.getFolders(platform)
+            folders.sort(key=lambda path: path != pio_lib)
+
+            libraries = []
+            for path in folders:
+                libraries.extend(containers[path]['libraries'])
+            return libraries
+
+
+def readLibrary(path, platform):
+    '''
+    Reads the details of a library folder
+
+    Arguments:
+        path {str} -- library folder
+        platform {str} -- package where it's installed
+
+    Returns:
+        dict -- name, id, description, version, path, platform, headers
+                and examples
+    '''
+    folder = os.path.basename(path)
+    name = folder
+    id_name = LIBRARY_ID.search(name)
+    if(id_name is not None):
+        name = id_name.group(1)
+    name = FOLDER_ID.sub('', name)
+
+    manifest = readManifest(path)
+    name = manifest.get('name') or name
+
+    lib_id = manifest.get('id')
+    if(lib_id is None):
+        folder_id = FOLDER_ID.search(folder)
+        if(folder_id is not None):
+            lib_id = int(folder_id.group(1))
+
+    src_path = os.path.join(path, 'src')
+    if(not os.path.isdir(src_path)):
+        src_path = path
+    headers = sorted([file for file in listFiles(src_path)
+                      if file.endswith(('.h', '.hh', '.hpp'))])
+
+    examples = os.path.join(path, 'examples')
+    if(not os.path.isdir(examples) or not os.listdir(examples)):
+        examples = None
+
+    return {'name': name,
+            'id': lib_id,
+            'description': manifest.get('description') or '',
+            'version': manifest.get('version') or '',
+            'path': path,
+            'platform': platform,
+            'headers': headers,
+            'examples': examples}
+
+
+def readManifest(path):
+    '''
+    Reads the manifest of a library: .library.json (written by PlatformIO
+    when it installs a library from the registry, it includes the id),
+    library.json or library.properties (Arduino)
+
+    Arguments:
+        path {str} -- library folder
+
+    Returns:
+        dict -- name, id, description and version found
+    '''
+    manifest = {}
+
+    for file_name in ('.library.json', 'library.json'):
+        json_file = os.path.join(path, file_name)
+        if(not os.path.isfile(json_file)):
+            continue
+        data = JSONFile(json_file).getData()
+        if(not isinstance(data, dict)):
+            continue
+        for key in ('name', 'id', 'description', 'version'):
+            if(data.get(key) and key not in manifest):
+                manifest[key] = data[key]
+
+    properties_file = os.path.join(path, 'library.properties')
+    if(not manifest.get('name') and os.path.isfile(properties_file)):
+        try:
+            with open(properties_file, 'rb') as file:
+                text = file.read().decode('utf-8', 'replace')
+        except (IOError, OSError):
+            text = ''
+        properties = dict(PROPERTIES.findall(text))
+        manifest.setdefault('name', properties.get('name'))
+        manifest.setdefault('description', properties.get('sentence'))
+        manifest.setdefault('version', properties.get('version'))
+
+    if(isinstance(manifest.get('version'), dict)):
+        manifest['version'] = manifest['version'].get('name', '')
+
+    return manifest
+
+
+def getHeaderPath(library, header):
+    '''
+    Full path of a header of a library
+    '''
+    src_path = os.path.join(library['path'], 'src')
+    if(not os.path.isdir(src_path)):
+        src_path = library['path']
+    return os.path.join(src_path, header)
+
+
+def matchPlatform(library_platform, platform):
+    '''
+    Checks if the libraries of a package can be used in the platform,
+    the PlatformIO libraries can be used in any platform
+    '''
+    if(platform == 'atmelavr'):
+        platform = 'avr'
+    return (not library_platform or platform == 'all' or
+            platform in library_platform)
+
+
+def listFolders(path):
+    try:
+        names = os.listdir(path)
+    except OSError:
+        return []
+    return [name for name in names
+            if os.path.isdir(os.path.join(path, name))]
+
+
+def listFiles(path):
+    try:
+        names = os.listdir(path)
+    except OSError:
+        return []
+    return [name for name in names
+            if os.path.isfile(os.path.join(path, name))]
+
+
+def getMTime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+LIBRARY_CATALOG = None
+CATALOG_LOCK = threading.Lock()
+
+
+def getLibraryCatalog(refresh=True):
+    '''
+    Gets the shared catalog refreshed with the last changes in the
+    libraries folders
+
+    Keyword Arguments:
+        refresh {bool} -- when it's False the folders are not checked,
+                          unless the catalog is loaded for the first
+                          time (default: {True})
+
+    Returns:
+        LibraryCatalog
+    '''
+    global LIBRARY_CATALOG
+
+    with CATALOG_LOCK:
+        if(LIBRARY_CATALOG is None):
+            LIBRARY_CATALOG = LibraryCatalog()
+            refresh = True
+
+    if(refresh):
+        LIBRARY_CATALOG.refresh()
+    return LIBRARY_CATALOG
@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import os
+import re
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import Tasks
+from . import Tools
+from .LibrarySearch import ConnectionPool
+from .LibrarySearch import ResponseCache
+from .LibrarySearch import MAX_CONNECTIONS
+from .LibraryRegistry import getLibraryRegistry
+
+INFO_URL = 'http://api.platformio.org/lib/info/%s'
+SPEC_SEPARATOR = re.compile(r'[,\n]')
+
+
+def parseSpec(spec):
+    '''
+    Splits a library specification: '64', 'ArduinoJson', 'ArduinoJson@5.13'
+    or an url (git, archive)
+
+    Arguments:
+        spec {str} -- library specification
+
+    Returns:
+        tuple -- name (or id or url) and version (empty if not given)
+    '''
+    spec = spec.strip().strip('"\'')
+    if(isURL(spec)):
+        return (spec, '')
+
+    name, _, version = spec.partition('@')
+    return (name.strip(), version.strip())
+
+
+def isURL(spec):
+    return '://' in spec or spec.startswith('git@') or \
+        spec.endswith(('.zip', '.tar.gz', '.git'))
+
+
+def quoteSpec(spec):
+    '''
+    Quotes a library specification or a folder for the command line (the
+    commands run in a shell), the names can have spaces
+
+    Arguments:
+        spec {str} -- library specification
+
+    Returns:
+        str -- quoted specification
+    '''
+    return '"%s"' % spec.strip().strip('"\'')
+
+
+def specKey(spec):
+    '''
+    Key to compare the specifications, the registry id or the lowercase
+    name without version
+    '''
+    return parseSpec(spec)[0].lower()
+
+
+def splitSpecs(value):
+    '''
+    Library specifications of a lib_deps option, separated by commas or
+    new lines (ConfigObj gives a list when there are commas)
+
+    Arguments:
+        value {str/list} -- value of the option
+
+    Returns:
+        list -- specifications
+    '''
+    if(not isinstance(value, list)):
+        value = [value]
+
+    specs = []
+    for item in value:
+        specs.extend(spec.strip() for spec in SPEC_SEPARATOR.split(item))
+    return [spec for spec in specs if spec and not spec.startswith(';')]
+
+
+def getProjectSpecs(ini_path, environment=None):
+    '''
+    Libraries listed in the lib_deps option of the environment (and of
+    the common [env] section) of a platformio.ini file
+
+    Arguments:
+        ini_path {str} -- path of the platformio.ini file
+
+    Keyword Arguments:
+        environment {str} -- environment name, all the environments
+                             when it's None (default: {None})
+
+    Returns:
+        list -- library specifications without duplicates
+    '''
+    from .ProjectConfig import getProjectConfig
+
+    if(not os.path.isfile(ini_path)):
+        return []
+
+    config = getProjectConfig(ini_path).load()
+    sections = ['env']
+    if(environment):
+        sections.append('env:%s' % environment)
+    else:
+        sections.extend(name for name in config if name.startswith('env:'))
+
+    specs = []
+    found = set()
+    for section in sections:
+        if(section not in config):
+            continue
+        for spec in splitSpecs(config[section].get('lib_deps', [])):
+            if(specKey(spec) not in found):
+                found.add(specKey(spec))
+                specs.append(spec)
+    return specs
+
+
+class DependencyResolver(object):
+    '''
+    Finds all the libraries needed to install a list of libraries (the
+    dependency closure) before running PlatformIO. The details of each
+    level of dependencies are downloaded at the same time from the
+    registry API, reusing the connections and the response cache of the
+    library search. The dependencies given by name are resolved to their
+    id with the local library registry when it's possible.
+    '''
+
+    def __init__(self, url=INFO_URL, max_connections=None, cache=None):
+        self.url = url
+        self.max_connections = max_connections or MAX_CONNECTIONS
+        self.cache = cache or ResponseCache()
+        self.pool = ConnectionPool(self.max_connections)
+        self.names = {}
+
+    def getInfo(self, lib_id):
+        '''
+        Details of a library in the registry
+
+        Arguments:
+            lib_id {str} -- registry id
+
+        Returns:
+            dict -- library details, empty when it couldn't be downloaded
+        '''
+        url = self.url % lib_id
+        try:
+            body = self.cache.get(url, self.pool, Tools.getHeaders())
+            return json.loads(body)
+        except Exception:
+            return {}
+
+    def getId(self, name):
+        '''
+        Id of a library name in the local registry
+
+        Returns:
+            str -- registry id, None when the name is not in the registry
+        '''
+        if(name.isdigit()):
+            return name
+        if(isURL(name)):
+            return None
+
+        if(not self.names):
+            registry = getLibraryRegistry()
+            for library in registry.data['libraries'].values():
+                self.names.setdefault(library['name'].lower(),
+                                      str(library['id']))
+
+        return self.names.get(name.lower())
+
+    def resolve(self, specs):
+        '''
+        Adds the dependencies of the libraries, the libraries are listed
+        before their dependencies
+
+        Arguments:
+            specs {list} -- library specifications (see parseSpec)
+
+        Returns:
+            list -- library specifications with their dependencies
+        '''
+        resolved = {}
+        order = []
+        level = list(specs)
+
+        try:
+            while(level and not Tasks.isCancelled()):
+                fetch = []
+                for spec in level:
+                    name, version = parseSpec(spec)
+                    lib_id = self.getId(name)
+                    key = lib_id or name.lower()
+                    if(key in resolved):
+                        continue
+
+                    if(lib_id and lib_id != name):
+                        spec = '%s@%s' % (lib_id, version) if version \
+                            else lib_id
+                    resolved[key] = spec
+                    order.append(key)
+
+                    if(lib_id):
+                        fetch.append(lib_id)
+
+                with ThreadPoolExecutor(
+                        max_workers=self.max_connections) as executor:
+                    infos = list(executor.map(self.getInfo, fetch))
+
+                level = []
+                for info in infos:
+                    for dependency in info.get('dependencies') or []:
+                        if(isinstance(dependency, dict)):
+                            name = dependency.get('name') or ''
+                            version = dependency.get('version') or ''
+                            dependency = '%s@%s' % (name, version) \
+                                if version else name
+                        if(dependency):
+                            level.append(dependency)
+        finally:
+            self.pool.close()
+
+        return [resolved[key] for key in order]
+
+
+INSTALL_LOCK = threading.Lock()
+install_queue = []
+installing = []
+
+
+def queueInstall(specs, storage=None):
+    '''
+    Adds libraries to the install queue
+
+    Arguments:
+        specs {list} -- library specifications
+
+    Keyword Arguments:
+        storage {str} -- folder where the libraries are installed, None
+                         for the PlatformIO global libraries
+
+    Returns:
+        bool -- True if there isn't an installer running, the caller
+                must start it
+    '''
+    with INSTALL_LOCK:
+        install_queue.extend((spec, storage) for spec in specs)
+        if(installing):
+            return False
+        installing.append(True)
+        return True
+
+
+def nextBatch():
+    '''
+    Libraries queued since the last batch grouped by storage folder, when
+    the queue is empty the installer is marked as stopped
+
+    Returns:
+        dict -- {storage: [specs]}, empty when there is nothing to install
+    '''
+    with INSTALL_LOCK:
+        batch = {}
+        for spec, storage in install_queue:
+            batch.setdefault(storage, []).append(spec)
+        del install_queue[:]
+
+        if(not batch):
+            del installing[:]
+        return batch
+
+
+def resetQueue():
+    '''
+    Forgets the libraries queued and marks the installer as stopped, used
+    when the installer fails, otherwise the next installs would wait for
+    it forever
+    '''
+    with INSTALL_LOCK:
+        del install_queue[:]
+        del installing[:]
@@ -0,0 +1,349 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import os
+import re
+import json
+import time
+import codecs
+import threading
+from bisect import bisect_left
+
+from . import Paths
+from .JSONFile import JSONFile
+
+REGISTRY_VERSION = 1
+# seconds before the registry is refreshed in background
+REFRESH_AGE = 7 * 24 * 3600
+
+WORD = re.compile(r'[A-Za-z0-9]+')
+CAMEL_CASE = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+')
+FILTER = re.compile(r'\b(framework|platform):(\S+)', re.I)
+
+# weight of each field in the ranking
+FIELD_WEIGHTS = (('name', 10), ('keywords', 5), ('frameworks', 3),
+                 ('platforms', 3), ('authors', 2), ('description', 1))
+
+
+def tokenize(text):
+    '''
+    Lowercase words of the text, the words in camel case are also split:
+    'ESP8266WiFi_Sensor' gives ['esp8266wifi', 'esp', '8266', 'wi', 'fi',
+    'sensor']
+    '''
+    tokens = []
+    for word in WORD.findall(text):
+        tokens.append(word.lower())
+        parts = CAMEL_CASE.findall(word)
+        if(len(parts) > 1):
+            tokens.extend(part.lower() for part in parts)
+    return tokens
+
+
+def toNames(values):
+    '''
+    The API gives the frameworks, platforms, keywords and authors as
+    strings, lists of strings or lists of objects with a name, they're
+    stored as lists of strings
+    '''
+    if(not values):
+        return []
+
+    if(not isinstance(values, list)):
+        values = [values]
+
+    names = []
+    for value in values:
+        if(isinstance(value, dict)):
+            value = value.get('name') or value.get('title') or ''
+        names.append('%s' % value)
+    return names
+
+
+class LibraryRegistry(JSONFile):
+    '''
+    Local copy of the PlatformIO library registry with a full text index.
+    It's filled with the results of the online searches, a background
+    refresh of the whole registry, or a JSON dump imported by the user.
+    Once the whole registry was downloaded or imported (it's complete),
+    the searches are answered from memory, without network.
+
+    The registry is stored in the Deviot cache folder.
+
+    Extends: JSONFile
+    '''
+
+    def __init__(self, path=None):
+        if(path is None):
+            path = os.path.join(Paths.getCacheDir(), 'registry.json')
+
+        self.lock = threading.RLock()
+        self.index = None
+        self.tokens = []
+
+        super(LibraryRegistry, self).__init__(path)
+
+        if(self.data.get('version') != REGISTRY_VERSION):
+            self.data = {'version': REGISTRY_VERSION,
+                         'updated': 0,
+                         'complete': False,
+                         'libraries': {}}
+
+    def isEmpty(self):
+        return not self.data['libraries']
+
+    def isComplete(self):
+        '''
+        Checks if the registry has all the libraries (refreshed or imported),
+        and not only the results of the previous online searches
+        '''
+        return self.data.get('complete', False)
+
+    def isOutdated(self):
+        return time.time() - self.data.get('updated', 0) > REFRESH_AGE
+
+    def addLibraries(self, items, save=True):
+        '''
+        Adds or replaces libraries in the registry
+
+        Arguments:
+            items {list} -- libraries in the format of the search API
+
+        Keyword Arguments:
+            save {bool} -- write the registry file (default: {True})
+
+        Returns:
+            int -- number of libraries added
+        '''
+        added = 0
+        with self.lock:
+            libraries = self.data['libraries']
+            for item in items:
+                if(not isinstance(item, dict) or 'id' not in item):
+                    continue
+
+                library = {'id': item['id'],
+                           'name': item.get('name') or '',
+                           'description': item.get('description') or '',
+                           'keywords': toNames(item.get('keywords')),
+                           'frameworks': toNames(item.get('frameworks')),
+                           'platforms': toNames(item.get('platforms')),
+                           'authors': toNames(item.get('authornames') or
+                                              item.get('authors'))}
+                libraries[str(item['id'])] = library
+                added += 1
+
+            self.index = None
+            if(save and added):
+                self.saveData()
+
+        return added
+
+    def importDump(self, path):
+        '''
+        Adds the libraries of a JSON file: a list of libraries, a search
+        API page ({"items": [...]}) or a registry file ({"libraries": {}})
+
+        Arguments:
+            path {str} -- path of the JSON file
+
+        Returns:
+            int -- number of libraries imported
+        '''
+        with codecs.open(path, 'r', 'utf-8') as file:
+            dump = json.loads(file.read())
+
+        if(isinstance(dump, dict)):
+            if('items' in dump):
+                dump = dump['items']
+            elif(isinstance(dump.get('libraries'), dict)):
+                dump = list(dump['libraries'].values())
+            else:
+                dump = dump.get('libraries', [])
+
+        with self.lock:
+            added = self.addLibraries(dump, save=False)
+            if(added):
+                self.data['updated'] = time.time()
+                self.data['complete'] = True
+                self.saveData()
+            return added
+
+    def refresh(self, url=None):
+        '''
+        Downloads the whole registry from the search API (a search
+        without query gives all the libraries)
+
+        Keyword Arguments:
+            url {str} -- search endpoint (default: {None})
+
+        Returns:
+            int -- number of libraries in the registry
+        '''
+        from .LibrarySearch import LibrarySearch
+        from .LibrarySearch import SEARCH_URL
+
+        result = LibrarySearch('', url=url or SEARCH_URL).run()
+        if(result is None):
+            return len(self.data['libraries'])
+
+        with self.lock:
+            self.addLibraries(result['items'], save=False)
+            self.data['updated'] = time.time()
+            self.data['complete'] = True
+            self.saveData()
+            return len(self.data['libraries'])
+
+    def getIndex(self):
+        '''
+        Inverted index of the tokens of each library, it's built the first
+        time it's needed after the registry changes
+
+        Returns:
+            dict -- {token: {library id: weight}}
+        '''
+        with self.lock:
+            if(self.index is not None):
+                return self.index
+
+            index = {}
+            for key, library in self.data['libraries'].items():
+                for field, weight in FIELD_WEIGHTS:
+                    value = library.get(field) or ''
+                    if(isinstance(value, list)):
+                        value = ' '.join(value)
+                    for token in set(tokenize(value)):
+                        postings = index.setdefault(token, {})
+                        postings[key] = postings.get(key, 0) + weight
+
+            self.index = index
+            self.tokens = sorted(index)
+            return index
+
+    def search(self, query, framework=None, platform=None, limit=None):
+        '''
+        Searches the libraries with all the words of the query (as prefix
+        of a word of the name, keywords, description, frameworks,
+        platforms or authors). The query can include 'framework:name' and
+        'platform:name' filters.
+
+        Arguments:
+            query {str} -- text to search
+
+        Keyword Arguments:
+            framework {str} -- only libraries for this framework
+            platform {str} -- only libraries for this platform
+            limit {int} -- maximum number of results (default: {None})
+
+        Returns:
+            list -- libraries ordered by relevance
+        '''
+        for name, value in FILTER.findall(query):
+            if(name.lower() == 'framework'):
+                framework = value
+            else:
+                platform = value
+        query = FILTER.sub(' ', query)
+
+        with self.lock:
+            index = self.getIndex()
+            libraries = self.data['libraries']
+            words = tokenize(query)
+
+            if(words):
+                scores = None
+                for word in words:
+                    matches = self.matchPrefix(index, word)
+                    if(scores is None):
+                        scores = matches
+                    else:
+                        scores = dict((key, scores[key] + matches[key])
+                                      for key in scores if key in matches)
+                    if(not scores):
+                        return []
+            else:
+                scores = dict.fromkeys(libraries, 0)
+
+            results = []
+            query_name = query.strip().lower()
+            for key, score in scores.items():
+                library = libraries[key]
+                if(not self.hasName(library['frameworks'], framework) or
+                        not self.hasName(library['platforms'], platform)):
+                    continue
+                exact = library['name'].lower() == query_name
+                results.append(((not exact, -score, library['name'].lower()),
+                                library))
+
+        results.sort(key=lambda result: result[0])
+        results = [result[1] for result in results]
+
+        return results[:limit] if limit else results
+
+    def matchPrefix(self, index, word):
+        '''
+        Libraries with a token starting with the word, the full words
+        weight more than the prefixes
+
+        Returns:
+            dict -- {library id: weight}
+        '''
+        matches = {}
+        position = bisect_left(self.tokens, word)
+
+        while(position < len(self.tokens) and
+              self.tokens[position].startswith(word)):
+            token = self.tokens[position]
+            position += 1
+            factor = 2 if token == word else 1
+            for key, weight in index[token].items():
+                matches[key] = max(matches.get(key, 0), weight * factor)
+
+        return matches
+
+    def hasName(self, names, wanted):
+        if(not wanted):
+            return True
+        wanted = wanted.lower()
+        return any(name.lower() == wanted for name in names)
+
+    def searchResult(self, query, limit=None):
+        '''
+        Search result in the same format of the search API, to show it
+        as the online results
+
+        Returns:
+            dict -- total, perpage, page and items
+        '''
+        items = self.search(query, limit=limit)
+        return {'total': len(items),
+                'perpage': len(items),
+                'page': 1,
+                'items': items,
+                'complete': True,
+                'offline': True}
+
+
+LIBRARY_REGISTRY = None
+REGISTRY_LOCK = threading.Lock()
+
+
+def getLibraryRegistry():
+    '''
+    Gets the registry shared by all the commands, it's loaded the first
+    time it's used
+
+    Returns:
+        LibraryRegistry
+    '''
+    global LIBRARY_REGISTRY
+
+    with REGISTRY_LOCK:
+        if(LIBRARY_REGISTRY is None):
+            LIBRARY_REGISTRY = LibraryRegistry()
+        return LIBRARY_REGISTRY
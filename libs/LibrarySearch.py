@@ -0,0 +1,385 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import os
+import json
+import zlib
+import base64
+import hashlib
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+from urllib.parse import urlencode
+from urllib.parse import urlsplit
+from urllib.parse import unquote
+from urllib.request import getproxies
+from urllib.request import proxy_bypass
+
+from . import Paths
+from . import Tasks
+from . import Tools
+from .JSONFile import JSONFile
+
+SEARCH_URL = 'http://api.platformio.org/lib/search'
+# pages downloaded at the same time (and connections kept open per host)
+MAX_CONNECTIONS = 4
+TIMEOUT = 30
+
+
+class HTTPError(Exception):
+    '''
+    Response of the server with an unexpected status
+    '''
+
+    def __init__(self, url, status):
+        super(HTTPError, self).__init__('%s: HTTP %s' % (url, status))
+        self.url = url
+        self.status = status
+
+
+class ConnectionPool(object):
+    '''
+    Keeps the HTTP connections open to reuse them in the next requests
+    to the same host (keep-alive), instead of opening a new connection
+    for each page. A connection is only used by one thread at a time.
+
+    The proxies of the system (or the http_proxy, https_proxy and
+    no_proxy variables) are used as urlopen does: the http requests are
+    sent to the proxy with the full url and the https requests go
+    through a tunnel (CONNECT).
+    '''
+
+    def __init__(self, max_connections=MAX_CONNECTIONS, timeout=TIMEOUT):
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.idle = {}
+
+    def request(self, url, headers=None):
+        '''
+        Sends a GET request, when a reused connection was closed by the
+        server, the request is sent again in a new connection
+
+        Arguments:
+            url {str} -- full url
+
+        Keyword Arguments:
+            headers {dict} -- headers of the request (default: {None})
+
+        Returns:
+            tuple -- status, response headers (lowercase names) and body
+        '''
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = parts.path or '/'
+        if(parts.query):
+            path += '?' + parts.query
+
+        headers = dict(headers or {})
+        headers.setdefault('Accept-Encoding', 'gzip')
+
+        proxy = self.getProxy(parts.scheme, parts.netloc)
+        if(proxy and parts.scheme == 'http'):
+            path = '%s://%s%s' % (parts.scheme, parts.netloc, path)
+            if(proxy['auth']):
+                headers['Proxy-Authorization'] = proxy['auth']
+
+        for attempt in range(2):
+            connection, reused = self.acquire(key, proxy)
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                if(reused and not attempt):
+                    continue
+                raise
+
+            response_headers = dict((name.lower(), value)
+                                    for name, value in response.getheaders())
+            if(response.will_close):
+                connection.close()
+            else:
+                self.release(key, connection)
+
+            if(response_headers.get('content-encoding') == 'gzip'):
+                body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+
+            return (response.status, response_headers, body)
+
+    def getProxy(self, scheme, netloc):
+        '''
+        Proxy used to connect to the host
+
+        Arguments:
+            scheme {str} -- http or https
+            netloc {str} -- host and port
+
+        Returns:
+            dict -- netloc of the proxy and Proxy-Authorization header
+                    (None without credentials), None without proxy
+        '''
+        proxy = getproxies().get(scheme)
+        if(not proxy or proxy_bypass(netloc)):
+            return None
+
+        if('://' not in proxy):
+            proxy = 'http://' + proxy
+        parts = urlsplit(proxy)
+
+        auth = None
+        if(parts.username):
+            credentials = '%s:%s' % (unquote(parts.username),
+                                     unquote(parts.password or ''))
+            credentials = base64.b64encode(credentials.encode('utf-8'))
+            auth = 'Basic ' + credentials.decode('ascii')
+
+        netloc = parts.hostname
+        if(parts.port):
+            netloc = '%s:%s' % (netloc, parts.port)
+
+        return {'netloc': netloc, 'auth': auth}
+
+    def acquire(self, key, proxy=None):
+        '''
+        Gets an idle connection to the host or opens a new one
+
+        Arguments:
+            key {tuple} -- scheme and host
+
+        Keyword Arguments:
+            proxy {dict} -- proxy to connect (see getProxy)
+
+        Returns:
+            tuple -- connection and True if it was reused
+        '''
+        with self.lock:
+            idle = self.idle.get(key)
+            if(idle):
+                return (idle.pop(), True)
+
+        scheme, netloc = key
+        address = proxy['netloc'] if proxy else netloc
+        if(scheme == 'https'):
+            connection = http.client.HTTPSConnection(address,
+                                                     timeout=self.timeout)
+            if(proxy):
+                headers = {}
+                if(proxy['auth']):
+                    headers['Proxy-Authorization'] = proxy['auth']
+                connection.set_tunnel(netloc, headers=headers)
+        else:
+            connection = http.client.HTTPConnection(address,
+                                                    timeout=self.timeout)
+        return (connection, False)
+
+    def release(self, key, connection):
+        with self.lock:
+            idle = self.idle.setdefault(key, [])
+            if(len(idle) < self.max_connections):
+                idle.append(connection)
+                return
+        connection.close()
+
+    def close(self):
+        with self.lock:
+            idle = self.idle
+            self.idle = {}
+
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+
+class ResponseCache(object):
+    '''
+    Stores the responses in the Deviot cache folder with their ETag and
+    Last-Modified headers. The next request of the same url is sent with
+    If-None-Match/If-Modified-Since, and when the server answers 304 (not
+    modified), the stored body is used.
+    '''
+
+    def __init__(self, path=None):
+        if(path is None):
+            path = os.path.join(Paths.getCacheDir(), 'http')
+        self.path = path
+        Paths.makeFolder(path)
+
+    def getEntry(self, url):
+        name = hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json'
+        return JSONFile(os.path.join(self.path, name))
+
+    def get(self, url, pool, headers=None):
+        '''
+        Gets the body of the url, validating the stored response
+
+        Arguments:
+            url {str} -- full url
+            pool {ConnectionPool} -- connections used for the request
+
+        Keyword Arguments:
+            headers {dict} -- headers of the request (default: {None})
+
+        Returns:
+            str -- body of the response
+        '''
+        entry = self.getEntry(url)
+        cached = entry.getData()
+        headers = dict(headers or {})
+
+        if(cached.get('url') == url):
+            if(cached.get('etag')):
+                headers['If-None-Match'] = cached['etag']
+            if(cached.get('last_modified')):
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        status, response_headers, body = pool.request(url, headers)
+
+        if(status == 304 and 'body' in cached):
+            return cached['body']
+
+        if(status != 200):
+            raise HTTPError(url, status)
+
+        body = body.decode('utf-8')
+        etag = response_headers.get('etag')
+        last_modified = response_headers.get('last-modified')
+
+        if(etag or last_modified):
+            entry.setData({'url': url,
+                           'etag': etag,
+                           'last_modified': last_modified,
+                           'body': body})
+
+        return body
+
+
+class LibrarySearch(object):
+    '''
+    Searches libraries in the PlatformIO registry. The first page is
+    downloaded alone to know the number of pages, then the rest are
+    downloaded at the same time (up to MAX_CONNECTIONS) over persistent
+    connections.
+
+    search = LibrarySearch('sensor')
+    result = search.run(on_page=callback)
+    '''
+
+    def __init__(self, keyword, url=SEARCH_URL, max_connections=None,
+                 cache=None):
+        '''
+        Arguments:
+            keyword {str} -- text to search
+
+        Keyword Arguments:
+            url {str} -- search endpoint (default: {SEARCH_URL})
+            max_connections {int} -- pages downloaded at the same time
+            cache {ResponseCache} -- stored responses (default: cache folder)
+        '''
+        self.keyword = keyword
+        self.url = url
+        self.max_connections = max_connections or MAX_CONNECTIONS
+        self.cache = cache or ResponseCache()
+        self.pool = ConnectionPool(self.max_connections)
+
+    def getPageUrl(self, page):
+        request = [('query', self.keyword)]
+        if(page > 1):
+            request.append(('page', page))
+        return '%s?%s' % (self.url, urlencode(request))
+
+    def getPage(self, page):
+        '''
+        Downloads a page of the results
+
+        Arguments:
+            page {int} -- page number, from 1
+
+        Returns:
+            dict -- page with total, perpage, page and items keys
+        '''
+        url = self.getPageUrl(page)
+        body = self.cache.get(url, self.pool, Tools.getHeaders())
+        return json.loads(body)
+
+    def run(self, on_page=None):
+        '''
+        Downloads all the pages of the search. The items are joined while
+        the pages arrive: each page is added once, when all the pages
+        before it were received, the pages that arrive early wait.
+
+        Keyword Arguments:
+            on_page {function} -- called with the result after each page
+                                  arrives, the 'complete' key is False
+                                  until the last one. The items are the
+                                  ones of the pages received in order
+                                  (the list grows with the next pages)
+                                  (default: {None})
+
+        Returns:
+            dict -- total, perpage and items of all the pages, the items
+                    are in the order of the pages. None when the task
+                    was cancelled
+        '''
+        try:
+            first = self.getPage(1)
+            perpage = max(first.get('perpage') or 1, 1)
+            total = first.get('total', 0)
+            pages_count = max((total + perpage - 1) // perpage, 1)
+
+            items = list(first.get('items', []))
+            result = self.getResult(first, items, 1, pages_count)
+            if(on_page):
+                on_page(result)
+
+            if(pages_count == 1):
+                return result
+
+            # pages received before the previous ones
+            waiting = {}
+            next_page = 2
+            received = 1
+
+            jobs = min(self.max_connections, pages_count - 1)
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                futures = dict((pool.submit(self.getPage, page), page)
+                               for page in range(2, pages_count + 1))
+
+                for future in as_completed(futures):
+                    if(Tasks.isCancelled()):
+                        for pending in futures:
+                            pending.cancel()
+                        return None
+
+                    waiting[futures[future]] = \
+                        future.result().get('items', [])
+                    received += 1
+
+                    while(next_page in waiting):
+                        items.extend(waiting.pop(next_page))
+                        next_page += 1
+
+                    result = self.getResult(first, items, received,
+                                            pages_count)
+                    if(on_page):
+                        on_page(result)
+
+            return result
+        finally:
+            self.pool.close()
+
+    def getResult(self, first, items, received, pages_count):
+        return {'total': first.get('total', 0),
+                'perpage': first.get('perpage', 0),
+                'page': 1,
+                'items': items,
+                'pages': pages_count,
+                'pages_received': received,
+                'complete': received == pages_count}
@@ -8,12 +8,11 @@ from __future__ import unicode_literals
 
 import os
 import json
-import glob
-from re import search
 
 from . import Paths
 from .Preferences import Preferences
 from .JSONFile import JSONFile
+from .LibraryCatalog import getLibraryCatalog
 from .I18n import I18n
 
 
@@ -46,7 +45,7 @@ class Menu(object):
         boards = [[_("select_board_list").upper()]]
         data = self.getTemplateMenu(file_name=file, user_path=True)
 
-        list_env = Preferences().get('board_id', [])
+        list_env = list(Preferences().get('board_id', []))
         list_env.extend(Tools.getEnvFromFile())
         list_env = sorted(list(set(list_env)))
 
@@ -92,7 +91,7 @@ class Menu(object):
         environments = [[_("select_env_list").upper()]]
         index = 0
 
-        list_env = Preferences().get('board_id', [])
+        list_env = list(Preferences().get('board_id', []))
         list_env.extend(Tools.getEnvFromFile())
         list_env = sorted(list(set(list_env)))
 
@@ -154,49 +153,15 @@ class Menu(object):
         except:
             platform = 'all'
 
-        library_paths = Paths.getLibraryFolders(platform)
+        catalog = getLibraryCatalog()
         added_lib = [[_("select_library").upper()]]
-        check_list = []
-
-        # get preset
-        for library_dir in library_paths:
-            # add separator
-            sub_path = glob.glob(library_dir)
-            # search in sub path
-            for library in sub_path:
-                # Add core libraries
-                if '__cores__' in library:
-                    core_subs = os.path.join(library, '*')
-                    core_subs = glob.glob(core_subs)
-                    for core_sub in core_subs:
-                        core_sub_subs = os.path.join(core_sub, '*')
-                        core_sub_subs = glob.glob(core_sub_subs)
-                        for core_lib in core_sub_subs:
-                            if caption not in check_list:
-                                caption = os.path.basename(core_lib)
-                                added_lib.append([caption, library])
-                                check_list.append(caption)
-
-                # the rest of the libraries
-                caption = os.path.basename(library)
-
-                # get library name from json file
-                pio_libs = os.path.join('platformio', 'lib')
-                if pio_libs in library:
-                    # get library json details
-                    json_file = os.path.join(library, 'library.json')
-                    if not os.path.exists(json_file):
-                        json_file = os.path.join(library, 'library.properties')
-
-                    # when there´s json content, read it
-                    data = JSONFile(json_file)
-                    data = data.getData()
-                    if (data != {}):
-                        caption = data['name']
-
-                if caption not in added_lib and '__cores__' not in caption and caption not in check_list:
-                    added_lib.append([caption, library])
-                    check_list.append(caption)
+        check_list = set()
+
+        for library in catalog.getLibraries(platform):
+            caption = library['name']
+            if(caption not in check_list):
+                added_lib.append([caption, library['path']])
+                check_list.add(caption)
 
         if(len(added_lib) <= 1):
             added_lib = [[_("menu_not_libraries")]]
@@ -222,26 +187,18 @@ class Menu(object):
             platform = 'all'
 
         examples = [[_("select_library").upper()]]
-        check_list = []
-
-        library_paths = Paths.getLibraryFolders(platform)
-
-        for path in library_paths:
-            sub_paths = glob.glob(path)
-            for sub in sub_paths:
-                sub = os.path.join(sub, '*')
-                libs = glob.glob(sub)
-                for lib in libs:
-                    caption = os.path.basename(os.path.dirname(lib))
-                    new_caption = search(r"^(\w+)_ID?", caption)
-                    if(new_caption is not None):
-                        caption = new_caption.group(1)
-                    if 'examples' in lib and os.path.isdir(lib) and os.listdir(lib) and caption not in check_list:
-                        examples.append([caption, lib])
-                        check_list.append(caption)
+        check_list = set()
+
+        catalog = getLibraryCatalog()
+
+        for library in catalog.getLibraries(platform):
+            caption = library['name']
+            if(library['examples'] and caption not in check_list):
+                examples.append([caption, library['examples']])
+                check_list.add(caption)
 
         if(len(examples) <= 1):
-            added_lib = [[_("menu_not_libraries")]]
+            examples = [[_("menu_not_libraries")]]
 
         return examples
 
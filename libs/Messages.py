@@ -6,7 +6,7 @@ from __future__ import print_function
 from __future__ import division
 from __future__ import unicode_literals
 
-from re import search
+import re
 import threading
 import sublime
 import time
@@ -18,17 +18,29 @@ from .I18n import I18n
 _ = I18n().translate
 
 
+# progress line of the upload, it must be printed alone (see Console)
+PROGRESS = re.compile(r"[Uploading:]\s\[=*\s*\] \d+%")
+
+
 class MessageQueue(object):
     """
     Print messages in the user console,
-    placed in the message queue
+    placed in the message queue.
+
+    All the messages in the queue are joined and printed at once,
+    the queue is checked at most 'console_max_fps' times per second
     """
 
     def __init__(self, console=None):
+        from .Preferences import Preferences
+
         self.queue = queue.Queue(0)
         self.is_alive = False
         self.console = console
 
+        max_fps = Preferences().get('console_max_fps', 30)
+        self.frame_time = 1.0 / max(max_fps, 1)
+
     def put(self, text, *args):
         text = _(text, *args)
         if '\\n' in text:
@@ -48,16 +60,35 @@ class MessageQueue(object):
         else:
             while self.is_alive:
                 self.printOnce()
-                time.sleep(0.01)
+                time.sleep(self.frame_time)
 
     def printOnce(self):
-        while not self.queue.empty():
-            text = self.queue.get()
-            if self.console:
-                self.console.printScreen(text)
-            else:
+        """
+        Takes all the messages in the queue and prints them in a single
+        call. The upload progress lines are printed alone because the
+        console replaces the previous line with them.
+        """
+        batch = []
+        while True:
+            try:
+                text = self.queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if not self.console:
                 print(text)
-            time.sleep(0.01)
+            elif PROGRESS.search(text) is not None:
+                self.output(''.join(batch))
+                self.output(text)
+                batch = []
+            else:
+                batch.append(text)
+
+        self.output(''.join(batch))
+
+    def output(self, text):
+        if text and self.console:
+            self.console.printScreen(text)
 
     def stopPrint(self):
         while(not self.queue.empty()):
@@ -98,7 +129,7 @@ class Console:
             self.panel.set_read_only(False)
 
             # allow to show percentage in one line
-            if(search(r"[Uploading:]\s\[=*\s*\] \d+%", text) is not None):
+            if(PROGRESS.search(text) is not None):
                 # change focus
                 panel_view = self.window.find_output_panel('exec')
                 self.window.focus_view(panel_view)
@@ -7,7 +7,6 @@ from __future__ import division
 from __future__ import unicode_literals
 
 import os
-import glob
 import errno
 import inspect
 import sublime
@@ -371,33 +370,22 @@ def selectDir(window, index=-2, level=0, paths=None, key=None, func=None, label=
 
 
 def getLibraryFolders(platform='all'):
+    """
+    Folders with libraries available for the given platform, taken
+    from the library catalog
 
-    # Platformio Libraries
-    pio_lib_path = getPioLibrary()
-    pio_lib_path = os.path.join(pio_lib_path, '*')
-
-    library_folders = [pio_lib_path]
-
-    # Core Paths
-    pio_packages = getPioPackages()
-    pio_packages = os.path.join(pio_packages, '*')
-    sub_dirs = glob.glob(pio_packages)
+    Keyword Arguments:
+        platform {str} -- platform of the current board (default: {'all'})
 
-    if(platform == 'atmelavr'):
-        platform = 'avr'
+    Returns:
+        list -- glob patterns of the libraries in each folder
+    """
+    from .LibraryCatalog import getLibraryCatalog
 
-    for path in sub_dirs:
-        if(platform in path or platform == 'all'):
-            sub_paths = glob.glob(path)
-            for sub_path in sub_paths:
-                sub_path = os.path.join(sub_path, '*')
-                sub_path = glob.glob(sub_path)
-                for core_lib in sub_path:
-                    if 'libraries' in core_lib:
-                        lib = os.path.join(core_lib, '*')
-                        library_folders.append(lib)
+    catalog = getLibraryCatalog()
+    folders = catalog.getFolders(platform)
 
-    return library_folders
+    return [os.path.join(folder, '*') for folder in folders]
 
 
 def makeFolder(path):
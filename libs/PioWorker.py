@@ -0,0 +1,101 @@
+"""
+Long-lived PlatformIO worker used by Deviot (see Commands.PioWorker)
+
+PlatformIO is imported only once, each command received by stdin runs
+in a forked child process, that way the commands don't share any state
+but none of them pays the import time. The output of the command is
+written in stdout followed by the end mark and the return code.
+
+Each child is the leader of a new session, its id is written before any
+output of the command, that way Deviot can stop the command with all the
+processes started by it (compilers, uploaders) without stop the worker.
+
+Request format (one per line): {"args": [...], "cwd": "...", "path": "..."}
+"""
+import os
+import sys
+import json
+import traceback
+
+READY = 'deviot-worker-ready'
+END = '\x00deviot-end'
+PID = '\x00deviot-pid'
+
+try:
+    from platformio.__main__ import main
+except ImportError:
+    sys.stdout.write('platformio not found\n')
+    sys.stdout.flush()
+    sys.exit(1)
+
+
+def child(request, sync):
+    code = 1
+    try:
+        os.setsid()
+
+        # wait until the parent sent the pid
+        os.read(sync, 1)
+        os.close(sync)
+
+        # the child never reads from the request pipe
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+
+        if request.get('cwd'):
+            os.chdir(request['cwd'])
+        if request.get('path'):
+            os.environ['PATH'] = request['path']
+
+        sys.argv = ['platformio'] + request['args']
+        code = main()
+    except SystemExit as exc:
+        code = exc.code
+    except Exception:
+        traceback.print_exc()
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        if not isinstance(code, int):
+            code = 0 if code is None else 1
+        os._exit(code)
+
+
+def run(request):
+    read_sync, write_sync = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        os.close(write_sync)
+        child(request, read_sync)
+
+    os.close(read_sync)
+    sys.stdout.write('%s %d\n' % (PID, pid))
+    sys.stdout.flush()
+    os.write(write_sync, b'x')
+    os.close(write_sync)
+
+    _, status = os.waitpid(pid, 0)
+    if os.WIFEXITED(status):
+        code = os.WEXITSTATUS(status)
+    else:
+        code = 1
+
+    sys.stdout.write('%s %d\n' % (END, code))
+    sys.stdout.flush()
+
+
+sys.stdout.write(READY + '\n')
+sys.stdout.flush()
+
+while True:
+    line = sys.stdin.readline()
+    if not line:
+        break
+
+    try:
+        request = json.loads(line)
+    except ValueError:
+        continue
+
+    run(request)
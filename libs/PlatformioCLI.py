@@ -9,24 +9,31 @@ from __future__ import unicode_literals
 import os
 import time
 import json
-import threading
 import sublime
 from re import search
+from multiprocessing import cpu_count
+from concurrent.futures import ThreadPoolExecutor
 from shutil import move
 
 from .Commands import CommandsPy
+from .Commands import SIZE_REPORT
+from .Commands import output_classifier
+from .Commands import cancelCommands
 from . import Paths
 from . import Tools
 from .Messages import Console
 from .Messages import MessageQueue
 from .Preferences import Preferences
 from .JSONFile import JSONFile
+from .BuildManifest import BuildManifest
 from .Menu import Menu
 from .I18n import I18n
-from .Progress import ThreadProgress
+from . import Tasks
 from . import __version__ as version
 from .QuickPanel import quickPanel
-from .configobj.configobj import ConfigObj
+from .ProjectConfig import getProjectConfig
+from .LibraryCatalog import getLibraryCatalog
+from .Diagnostics import diagnostics
 
 _ = I18n().translate
 
@@ -63,6 +70,7 @@ class PlatformioCLI(CommandsPy):
     def __init__(self):
         self.window = sublime.active_window()
         self.view = self.window.active_view()
+        self.task = None
 
     def checkIOT(self):
         C['SKETCHPATH'] = self.view.file_name()
@@ -184,7 +192,6 @@ class PlatformioCLI(CommandsPy):
 
                 for service in mdns:
                     try:
-                        service = json.loads(service)
                         ip = service['ip']
                         if(ip == PORT):
                             auth = service["properties"]["auth_upload"]
@@ -213,34 +220,43 @@ class PlatformioCLI(CommandsPy):
         # avoid an error in a non native project if the folder of the
         # sketch has been renamed
         if(not C['NATIVE'] and os.path.exists(C['INIPATH'])):
-            INIFILE = ConfigObj(C['INIPATH'])
+            PROJECT = getProjectConfig(C['INIPATH'])
+            INIFILE = PROJECT.load()
 
             # check src_dir
             if('src_dir' in INIFILE['platformio']):
-                if(INIFILE['platformio']['src_dir'] is not C['SKETCHDIR']):
+                if(INIFILE['platformio']['src_dir'] != C['SKETCHDIR']):
                     INIFILE['platformio']['src_dir'] = C['SKETCHDIR']
-                    INIFILE.write()
+                    PROJECT.write()
 
         # Call method in a new thread
         callback = getattr(self, C['CALLBACK'])
         self.openInThread(callback)
 
-    def initProject(self):
+    def initProject(self, environment=None):
         """
         Initializes the PlatformIO project with selected environment
+
+        Keyword Arguments:
+            environment {str} -- environment to initialize, by default the
+                                 selected environment (default: {None})
         """
 
         # check if it was already initialized (stop execution if it was)
         CMD = C['CMDS']
         NATIVE = C['NATIVE']
-        ENVIRONMENT = C['ENVIRONMENT']
-        INIFILE = ConfigObj(C['INIPATH'])
+        ENVIRONMENT = environment or C['ENVIRONMENT']
+        PROJECT = getProjectConfig(C['INIPATH'])
+        INIFILE = PROJECT.load()
 
         # checks if the environment was previously initialized
         for env in INIFILE:
             if(ENVIRONMENT in env):
                 return None
 
+        # PlatformIO must read the pending changes
+        PROJECT.save()
+
         # Run Command
         command = ['init', '-b %s' % (ENVIRONMENT)]
         CMD.runCommand(command, "init_project_{0}")
@@ -266,18 +282,284 @@ class PlatformioCLI(CommandsPy):
 
         # add the programmer option to the platformio.ini
         programmer = Preferences().get("programmer", False)
-        self.programmer(programmer)
+        self.programmer(programmer, save=False)
 
         # stop if there is an error
         if(CMD.error_running):
             return
 
+        # write all the changes in the platformio.ini file at once
+        getProjectConfig(C['INIPATH']).save()
+
+        # skip the build when nothing changed since the last one, the
+        # platformio.ini file is already updated so its changes are seen
+        manifest = self.getBuildManifest()
+        if(manifest):
+            changes = manifest.getChanges()
+            current_time = time.strftime('%H:%M:%S')
+
+            if(not changes):
+                self.message_queue.put('build_up_to_date_{0}', current_time)
+                for line in manifest.getSizeReport():
+                    self.message_queue.put(line)
+                return
+
+            if('firmware' not in changes):
+                changes = [os.path.basename(name) for name in changes]
+                self.message_queue.put('build_changed_{0}', ', '.join(changes))
+
+        # a new build of the same environment cancels the previous one
         command = ['run', '-e %s' % C['ENVIRONMENT']]
-        CMD.runCommand(command, "built_project_{0}")
+        CMD.runCommand(command, "built_project_{0}",
+                       cancel_key=self.cancelKey(), diagnostics=True)
+
+        if(CMD.cancelled):
+            return
 
         if(CMD.error_running):
-            exec_view = self.window.find_output_panel('exec')
-            Tools.ERRORS_LIST.extend(Tools.highlightError(exec_view))
+            self.reportMissingHeaders()
+        elif(manifest):
+            manifest.save(CMD.size_report)
+
+    def reportMissingHeaders(self):
+        """
+        After a failed build, shows in the console the installed library
+        that provides each header not found by the compiler, using the
+        header index of the library catalog
+        """
+        catalog = getLibraryCatalog()
+        reported = set()
+
+        for error in diagnostics.getDiagnostics(severity='error'):
+            found = search(r'^(\S+): No such file or directory', error.message)
+            if(found is None or found.group(1) in reported):
+                continue
+
+            header = found.group(1)
+            reported.add(header)
+
+            libraries = catalog.findHeader(header)
+            if(libraries):
+                library = libraries[0]
+                self.message_queue.put('missing_header_{0}{1}{2}', header,
+                                       library['name'], library['path'])
+            else:
+                self.message_queue.put('missing_header_{0}', header)
+
+    def cancelKey(self, environment=None):
+        """
+        Identifies the commands running PlatformIO in an environment of
+        the current project, a new command with the same key cancels
+        the previous one
+
+        Keyword Arguments:
+            environment {str} -- by default the selected environment
+                                 (default: {None})
+
+        Returns:
+            tuple -- key of the command
+        """
+        return ('run', C['WORKINGPATH'], environment or C['ENVIRONMENT'])
+
+    def getBuildManifest(self, environment=None):
+        """
+        Gets the manifest with the inputs of the last successful build of
+        the current environment
+
+        Keyword Arguments:
+            environment {str} -- by default the selected environment
+                                 (default: {None})
+
+        Returns:
+            BuildManifest -- None if the build cache is disabled
+        """
+        if(not Preferences().get('build_cache', False)):
+            return None
+
+        return BuildManifest(C['WORKINGPATH'], C['SKETCHDIR'],
+                             C['INIPATH'], environment or C['ENVIRONMENT'])
+
+    def buildAll(self):
+        """
+        Builds all the environments of the project at the same time, the
+        number of builds running at once is limited by the number of CPUs
+        (or 'build_all_jobs' in the preferences). The output of each
+        environment is captured separately and a summary is shown at the end
+        """
+        CMD = C['CMDS']
+        self.message_queue = MessageQueue(C['CONSOLE'])
+        self.message_queue.startPrint()
+        self.message_queue.put('[ Deviot {0} ] {1}\\n', version, C['FILENAME'])
+
+        environments = self.getProjectEnvironments()
+        current_time = time.strftime('%H:%M:%S')
+        self.message_queue.put('build_all_envs_{0}{1}', current_time,
+                               len(environments))
+
+        # the environments are initialized one by one, each init
+        # modifies the platformio.ini file
+        for environment in environments:
+            self.initProject(environment)
+
+            if(CMD.error_running):
+                return
+
+        getProjectConfig(C['INIPATH']).save()
+
+        jobs = Preferences().get('build_all_jobs', 0) or cpu_count()
+        jobs = max(min(jobs, len(environments)), 1)
+
+        # the builds run in other threads, they're stopped when this
+        # task is cancelled
+        def cancelBuilds():
+            for environment in environments:
+                cancelCommands(self.cancelKey(environment))
+
+        self.task = Tasks.currentTask()
+        if(self.task is not None):
+            self.task.addCancelCallback(cancelBuilds)
+
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(self.buildEnvironment, environments))
+
+        if(self.task is not None):
+            self.task.removeCancelCallback(cancelBuilds)
+
+        # highlight the errors of all the environments
+        diagnostics.clear(C['WORKINGPATH'])
+        for result in results:
+            for line in result['diagnostics']:
+                diagnostics.feed(line)
+
+        self.buildAllSummary(results)
+
+    def getProjectEnvironments(self):
+        """
+        Gets the environments in the platformio.ini file and the boards
+        selected by the user (not native projects)
+
+        Returns:
+            list -- environments sorted by name
+        """
+        environments = Tools.getEnvFromFile()
+
+        if(not C['NATIVE']):
+            environments.extend(Preferences().get('board_id', []))
+
+        if(C['ENVIRONMENT']):
+            environments.append(C['ENVIRONMENT'])
+
+        return sorted(set(environments))
+
+    def buildEnvironment(self, environment):
+        """
+        Builds a single environment capturing its output, it's skipped
+        when nothing changed since its last successful build
+
+        Arguments:
+            environment {str} -- environment to build
+
+        Returns:
+            dict -- result of the build (see buildAllSummary)
+        """
+        start_time = time.time()
+        result = {'environment': environment,
+                  'status': 'success',
+                  'warnings': 0,
+                  'diagnostics': [],
+                  'size_report': []}
+
+        if(self.task is not None and self.task.cancelled()):
+            result['status'] = 'cancelled'
+            result['time'] = 0
+            return result
+
+        manifest = self.getBuildManifest(environment)
+        if(manifest and not manifest.getChanges()):
+            result['status'] = 'cached'
+            result['size_report'] = manifest.getSizeReport()
+            result['time'] = time.time() - start_time
+            return result
+
+        CMD = CommandsPy(cwd=C['WORKINGPATH'])
+        command = ['run', '-e %s' % environment]
+        return_code, output = CMD.captureCommand(
+            command, cancel_key=self.cancelKey(environment))
+
+        if(CMD.cancelled):
+            result['status'] = 'cancelled'
+            result['time'] = time.time() - start_time
+            return result
+
+        for line in output.splitlines(True):
+            kinds = output_classifier.classify(line.lower())
+
+            if('warning' in kinds and 'cygwin' not in kinds):
+                result['warnings'] += 1
+                result['diagnostics'].append(line)
+
+            if('error' in kinds):
+                result['diagnostics'].append(line)
+
+            if(SIZE_REPORT.match(line) is not None):
+                result['size_report'].append(line)
+
+        if(return_code):
+            result['status'] = 'error'
+        elif(result['warnings']):
+            result['status'] = 'success_warnings'
+
+        if(not return_code and manifest):
+            manifest.save(result['size_report'])
+
+        result['time'] = time.time() - start_time
+        return result
+
+    def buildAllSummary(self, results):
+        """
+        Shows a table with the result of each environment: status,
+        warnings, duration and size of the firmware. The errors and
+        warnings of each failed environment are shown after the table
+
+        Arguments:
+            results {list} -- results of buildEnvironment
+        """
+        # nothing was built (there are no environments)
+        if(not results):
+            return
+
+        width = max(len(result['environment']) for result in results)
+        status = {'success': _('success'),
+                  'success_warnings': _('success_warnings'),
+                  'error': _('error'),
+                  'cancelled': _('cancelled'),
+                  'cached': _('build_all_cached')}
+        status_width = max(len(text) for text in status.values())
+
+        self.message_queue.put('\\n')
+        for result in results:
+            line = '%s | %s | %s | %ss | %s\\n' % (
+                result['environment'].ljust(width),
+                status[result['status']].ljust(status_width),
+                _('build_all_warnings_{0}', result['warnings']),
+                '{0:.2f}'.format(result['time']),
+                firmwareSize(result['size_report']))
+            self.message_queue.put(line)
+
+        for result in results:
+            if(result['status'] == 'error'):
+                self.message_queue.put('\\n[ %s ]\\n' % result['environment'])
+                for line in result['diagnostics']:
+                    self.message_queue.put(line)
+
+        failed = any(result['status'] == 'error' for result in results)
+        cancelled = any(result['status'] == 'cancelled' for result in results)
+        CMD = C['CMDS']
+        CMD.status_bar = _('error') if failed else _('success')
+        if(cancelled):
+            CMD.status_bar = _('cancelled')
+        CMD.status_erase_time = 5000
+        sublime.set_timeout(CMD.setStatus, 0)
 
     def upload(self):
         """
@@ -319,13 +601,21 @@ class PlatformioCLI(CommandsPy):
             command = ['run', '-t', 'program', '-e', '%s' % (ENVIRONMENT)]
 
         # add the programmer option
-        self.programmer(programmer)
+        self.programmer(programmer, save=False)
 
         # add ota auth
-        self.authOTA()
+        self.authOTA(save=False)
+
+        # write all the changes in the platformio.ini file at once
+        getProjectConfig(C['INIPATH']).save()
 
         # run command
-        CMD.runCommand(command, "uploading_firmware_{0}")
+        CMD.runCommand(command, "uploading_firmware_{0}",
+                       cancel_key=self.cancelKey(), diagnostics=True)
+
+        if(CMD.cancelled):
+            self.message_queue.stopPrint()
+            return
 
         # start the monitor serial if was running previously
         if(not CMD.error_running):
@@ -333,9 +623,6 @@ class PlatformioCLI(CommandsPy):
             if(autorun):
                 Tools.toggleSerialMonitor()
                 Preferences().set('autorun_monitor', False)
-        else:
-            exec_view = self.window.find_output_panel('exec')
-            Tools.ERRORS_LIST.extend(Tools.highlightError(exec_view))
         self.message_queue.stopPrint()
 
     def clean(self):
@@ -346,10 +633,15 @@ class PlatformioCLI(CommandsPy):
             return
 
         CMD = C['CMDS']
+        getProjectConfig(C['INIPATH']).save()
 
         command = ['run', '-t', 'clean', '-e', '%s' % (C['ENVIRONMENT'])]
         CMD.runCommand(command, "clean_built_files__{0}")
 
+        manifest = self.getBuildManifest()
+        if(manifest):
+            manifest.remove()
+
     def selectPort(self):
         """
         Shows the quick panel with the list of all ports currently available
@@ -425,22 +717,28 @@ class PlatformioCLI(CommandsPy):
         (when the file haven't PlatformIO structure)
         """
         # open platformio.ini
-        INIFILE = ConfigObj(C['INIPATH'])
+        PROJECT = getProjectConfig(C['INIPATH'])
+        INIFILE = PROJECT.load()
 
         # set 'src_dir' in [platformio]
         source = {'src_dir': C['SKETCHDIR']}
         INIFILE['platformio'] = source
 
-        # write in file
-        INIFILE.write()
+        # write in file (when the build starts)
+        PROJECT.write()
 
-    def programmer(self, programmer):
+    def programmer(self, programmer, save=True):
         """
         Adds the programmer strings in the platformio.ini file, it considerate
         environment and programmer selected
 
         Arguments:
             programmer {str} -- id of chosen option
+
+        Keyword Arguments:
+            save {bool} -- write the file immediately, when it's False the
+                           change is written with the rest of changes of
+                           the build (default: {True})
         """
 
         # list of programmers
@@ -463,11 +761,12 @@ class PlatformioCLI(CommandsPy):
         }
 
         # prevent to do anything if none environment is selected
-        if(not C['ENVIRONMENT']):
+        if(not C['ENVIRONMENT'] or not C['INIPATH']):
             return
 
         # open platformio.ini and get the environment
-        INIFILE = ConfigObj(C['INIPATH'])
+        PROJECT = getProjectConfig(C['INIPATH'])
+        INIFILE = PROJECT.load()
         ENVIRONMENT = 'env:%s' % C['ENVIRONMENT']
 
         # stop if environment wasn't initialized yet
@@ -488,7 +787,9 @@ class PlatformioCLI(CommandsPy):
             ENV.merge(flags[programmer])
 
         # save in file
-        INIFILE.write()
+        PROJECT.write()
+        if(save):
+            PROJECT.save()
 
     def getMCU(self):
         """
@@ -513,29 +814,31 @@ class PlatformioCLI(CommandsPy):
 
         return selected
 
-    def authOTA(self):
+    def authOTA(self, save=True):
         """
         Adds OTA authentication (password) in the platformio.ini file
         based in the current environment chosen
 
-        Arguments:
-            password {str} -- password
+        Keyword Arguments:
+            save {bool} -- write the file immediately (default: {True})
         """
         password = Preferences().get('auth', '0')
-        INIFILE = ConfigObj(C['INIPATH'])
+        PROJECT = getProjectConfig(C['INIPATH'])
+        INIFILE = PROJECT.load()
         ENVIRONMENT = 'env:%s' % C['ENVIRONMENT']
 
         # remove flag
         if(not password or password == '0'):
             if('upload_flags' in INIFILE[ENVIRONMENT]):
                 INIFILE[ENVIRONMENT].pop('upload_flags')
-                INIFILE.write()
-            return
+        else:
+            # Write flag
+            FLAG = {'upload_flags': '--auth=%s' % password}
+            INIFILE[ENVIRONMENT].merge(FLAG)
 
-        # Write flag
-        FLAG = {'upload_flags': '--auth=%s' % password}
-        INIFILE[ENVIRONMENT].merge(FLAG)
-        INIFILE.write()
+        PROJECT.write()
+        if(save):
+            PROJECT.save()
 
     def mDNSCheck(self, feedback=True):
         """
@@ -595,14 +898,21 @@ class PlatformioCLI(CommandsPy):
             join {bool} -- use thread.join when it's True (default: {False})
         """
         if(type(func) is str):
-            thread = threading.Thread(target=self.fileCheck, args=(func,))
-            thread.start()
-        else:
-            thread = threading.Thread(target=func)
-            thread.start()
-            if(join):
-                thread.join()
-        ThreadProgress(thread, _('processing'), _('done'))
+            Tasks.submit(self.fileCheck, func, name=func,
+                         priority=Tasks.INTERACTIVE,
+                         message=_('processing'), success_message=_('done'))
+            return
+
+        # a worker waiting for other task could block the pool
+        if(join and Tasks.currentTask() is not None):
+            func()
+            return
+
+        task = Tasks.submit(func, priority=Tasks.INTERACTIVE,
+                            message=_('processing'),
+                            success_message=_('done'))
+        if(join):
+            task.wait()
 
     def saveCodeInFile(self):
         """
@@ -660,7 +970,6 @@ class PlatformioCLI(CommandsPy):
             for service in mdns:
                 index += 1
                 try:
-                    service = json.loads(service)
                     one = service["server"][:-1] + ' | ' + service["ip"]
                     two = service["properties"]["board"]
                     if(current_port and current_port == service["ip"]):
@@ -697,12 +1006,38 @@ class PlatformioCLI(CommandsPy):
             data=boards, file_name='platformio_boards.json', user_path=True)
 
 
+def firmwareSize(size_report):
+    """
+    Gets a short text with the size of the firmware from the size report
+
+    Arguments:
+        size_report {list} -- lines of the size report of the build
+
+    Returns:
+        str -- size of the firmware, empty if it isn't in the report
+    """
+    for line in size_report:
+        if(line.startswith(('Program:', 'Flash:'))):
+            return ' '.join(line.split())
+
+    # avr-size output: text data bss dec hex filename
+    for line in size_report:
+        values = line.split()
+        if(values and values[0].isdigit()):
+            return 'text: %s data: %s bss: %s' % tuple(values[:3])
+    return ''
+
+
 def generateFiles():
     """
-    It calls the functions and methods to create the main menu, completions
-    and syntax file
+    It calls the functions and methods to create the main menu and the
+    syntax file
     """
 
+    from .Completions import removeStaticCompletions
+
     Menu().createMainMenu()
-    Tools.createCompletions()
     Tools.createSyntaxFile()
+
+    # the completions are served from memory (Completions.py)
+    removeStaticCompletions()
@@ -6,13 +6,155 @@ from __future__ import print_function
 from __future__ import division
 from __future__ import unicode_literals
 
+import os
+import json
+import atexit
+import codecs
+import threading
+
 from .JSONFile import JSONFile
 from . import Paths
 
+# seconds to wait before write the pending changes in the file
+FLUSH_DELAY = 0.5
+
+
+class PreferencesCache(object):
+    '''
+    Keeps in memory the content of the preferences file, it's shared
+    by all the Preferences objects. The file is only read again when
+    its modification time changes, and the writes are delayed to merge
+    many calls of 'set' in a single write. The revision number changes
+    each time the preferences change.
+    '''
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.revision = 0
+        self.data = {}
+        self.path = None
+        self.mtime = None
+        self.dirty = False
+        self.timer = None
+
+    def load(self, path, encoding='utf-8'):
+        '''
+        Reads the preferences file only when it has been changed since the
+        last read (or it's the first time). The pending changes are never
+        overwritten by the content of the file.
+
+        Arguments: path {string} -- full path of the preferences file
+                   encoding {string} -- encoding of the file
+
+        Returns: {dict} -- shared dictionary with the preferences
+        '''
+        with self.lock:
+            mtime = getMTime(path)
+
+            if(path == self.path and (self.dirty or mtime == self.mtime)):
+                return self.data
+
+            text = ''
+            try:
+                with codecs.open(path, 'r', encoding) as file:
+                    text = file.read()
+            except (IOError, UnicodeError):
+                pass
+
+            try:
+                data = json.loads(text)
+            except ValueError:
+                data = {}
+
+            # update in place to keep the reference in all the instances
+            self.data.clear()
+            self.data.update(data)
+            self.path = path
+            self.mtime = mtime
+            self.revision += 1
+
+            return self.data
+
+    def save(self, data):
+        '''
+        Marks the preferences as modified and schedules the write
+        of the file
+
+        Arguments: data {dict} -- preferences to store
+        '''
+        with self.lock:
+            if(data is not self.data):
+                self.data.clear()
+                self.data.update(data)
+
+            self.dirty = True
+            self.revision += 1
+
+            if(self.timer is None):
+                self.timer = threading.Timer(FLUSH_DELAY, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self, encoding='utf-8'):
+        '''
+        Writes the pending changes in the preferences file. The content is
+        written in a temporal file and moved over the original one, that way
+        the file is never left half written.
+
+        Keyword Arguments: encoding {string} -- encoding of the file
+        '''
+        with self.lock:
+            if(self.timer is not None):
+                self.timer.cancel()
+                self.timer = None
+
+            if(not self.dirty or not self.path):
+                return
+
+            text = json.dumps(self.data, sort_keys=True, indent=4)
+            temp_path = self.path + '.tmp'
+
+            try:
+                with codecs.open(temp_path, 'w', encoding) as file:
+                    file.write(text)
+                os.replace(temp_path, self.path)
+            except (IOError, OSError, UnicodeError):
+                return
+
+            self.mtime = getMTime(self.path)
+            self.dirty = False
+
+
+CACHE = PreferencesCache()
+atexit.register(CACHE.flush)
+
+
+def getMTime(path):
+    '''
+    Gets the modification time of a file
+
+    Arguments: path {string} -- file path
+
+    Returns: {float/None} -- modification time, None if file doesn't exist
+    '''
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def flushPreferences():
+    '''
+    Writes immediately any pending change of the preferences. Use it before
+    restart or unload the plugin
+    '''
+    CACHE.flush()
+
 
 class Preferences(JSONFile):
     '''
-    Class to handle the preferences of the plugin
+    Class to handle the preferences of the plugin, all the instances
+    share the same data in memory (see PreferencesCache)
 
     Extends: JSONFile
     '''
@@ -26,6 +168,21 @@ class Preferences(JSONFile):
         path = Paths.getPreferencesFile()
         super(Preferences, self).__init__(path)
 
+    def loadData(self):
+        '''
+        Gets the shared preferences, the file is only read
+        when it was modified
+        '''
+        self.data = CACHE.load(self.path, self.encoding)
+
+    def saveData(self):
+        '''
+        Schedules the write of the preferences file, multiple
+        calls in a short time are written only once
+        '''
+        CACHE.save(self.data)
+        self.data = CACHE.data
+
     def set(self, key, value):
         '''
         Save a value in the preferences file using a list and
@@ -34,8 +191,9 @@ class Preferences(JSONFile):
         Arguments: key {string} -- identifier of the preference
                    value {[type]} -- value of the preference
         '''
-        self.data[key] = value
-        self.saveData()
+        with CACHE.lock:
+            self.data[key] = value
+            self.saveData()
 
     def get(self, key, default_value=False):
         '''
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import os
+import io
+import threading
+
+from .configobj.configobj import ConfigObj
+
+
+class ProjectConfig(object):
+    '''
+    Keeps in memory the platformio.ini file of a project. The file is
+    parsed again only when it's modified outside of Deviot (PlatformIO
+    init for example). The changes are kept in memory until 'save' is
+    called, then the file is written once and only if its content changed.
+    '''
+
+    def __init__(self, path):
+        '''
+        Arguments: path {string} -- full path of the platformio.ini file
+        '''
+        self.path = path
+        self.lock = threading.RLock()
+        self.config = None
+        self.stamp = None
+        self.dirty = False
+
+    def load(self):
+        '''
+        Gets the ConfigObj with the content of the file, it's parsed only
+        when the file changed since the last read. The changes not saved
+        are never overwritten.
+
+        Returns: {ConfigObj} -- content of the file
+        '''
+        with self.lock:
+            stamp = getStamp(self.path)
+
+            if(self.config is None or
+                    (not self.dirty and stamp != self.stamp)):
+                self.config = ConfigObj(self.path)
+                self.stamp = stamp
+
+            return self.config
+
+    def write(self):
+        '''
+        Marks the content as modified, the file is written when
+        'save' is called
+        '''
+        with self.lock:
+            self.dirty = True
+
+    def save(self):
+        '''
+        Writes the pending changes in the file. The file is only written
+        when the new content is different, in a temporal file moved
+        over the original one.
+        '''
+        with self.lock:
+            if(not self.dirty or self.config is None):
+                return
+
+            self.dirty = False
+
+            output = io.BytesIO()
+            self.config.write(output)
+            content = output.getvalue()
+
+            try:
+                with open(self.path, 'rb') as file:
+                    if(file.read() == content):
+                        return
+            except (IOError, OSError):
+                pass
+
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'wb') as file:
+                file.write(content)
+            os.replace(temp_path, self.path)
+
+            self.stamp = getStamp(self.path)
+
+
+CONFIGS = {}
+CONFIGS_LOCK = threading.Lock()
+
+
+def getProjectConfig(path):
+    '''
+    Gets the shared ProjectConfig of the given platformio.ini file
+
+    Arguments: path {string} -- full path of the platformio.ini file
+
+    Returns: {ProjectConfig}
+    '''
+    with CONFIGS_LOCK:
+        if(path not in CONFIGS):
+            CONFIGS[path] = ProjectConfig(path)
+        return CONFIGS[path]
+
+
+def getStamp(path):
+    '''
+    Modification time and size of the file, None if doesn't exist
+    '''
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime, stat.st_size)
@@ -7,12 +7,12 @@ from __future__ import unicode_literals
 
 import glob
 import time
+import codecs
 import sublime
 import threading
 
 from . import pyserial
 from . import Messages
-from . import Tools
 from .Preferences import Preferences
 
 if(sublime.platform() == 'windows'):
@@ -38,6 +38,8 @@ class SerialMonitor(object):
         if(header):
             self.queue.put("Serial Monitor - %s\n\n" % serial_port)
         self.Preferences = Preferences()
+        self.converter = DisplayConverter(
+            self.Preferences.get('display_mode', 'Text'))
         self.is_alive = False
 
     def isRunning(self):
@@ -47,6 +49,8 @@ class SerialMonitor(object):
         if not self.is_alive:
             baudrate = self.Preferences.get('baudrate', 9600)
             self.serial.baudrate = baudrate
+            self.serial.timeout = self.Preferences.get(
+                'monitor_read_timeout', 0.5)
             if isSerialAvailable(self.port):
                 self.serial.open()
                 self.is_alive = True
@@ -61,18 +65,78 @@ class SerialMonitor(object):
         self.queue.stopPrint()
 
     def receive(self):
-        length_before = 0
+        """
+        Reads the data from the serial port until the monitor is stopped.
+        By default the thread waits (select/poll or overlapped read in
+        windows) until there is data available, the old polling mode can
+        be used setting 'monitor_polling' to true in the preferences file
+        """
+        if(self.Preferences.get('monitor_polling', False)):
+            self.receivePolling()
+        else:
+            self.receiveBlocking()
+        self.serial.close()
+
+    def receivePolling(self):
+        """
+        Checks the input buffer each 10 ms
+        """
         while self.is_alive:
             number = self.serial.inWaiting()
             if number > 0:
                 in_text = self.serial.read(number)
-                length_in_text = len(in_text)
-                in_text = convertMode(in_text, length_before)
-                self.queue.put(in_text)
-                length_before += length_in_text
-                length_before %= 16
+                self.queue.put(self.converter.convert(in_text))
+            else:
+                self.flushConverter()
             time.sleep(0.01)
-        self.serial.close()
+
+    def receiveBlocking(self):
+        """
+        Blocks in the read of the first byte until it arrives or the
+        timeout ends, after that reads everything waiting in the input
+        buffer (up to 'monitor_read_size' bytes) and send it to the display.
+        The timeout only sets how often the thread checks if the monitor
+        was stopped.
+        """
+        read_size = self.Preferences.get('monitor_read_size', 4096)
+
+        while self.is_alive:
+            try:
+                in_text = self.serial.read(1)
+                if not in_text:
+                    self.flushConverter()
+                    continue
+
+                number = min(self.serial.inWaiting(), read_size - 1)
+                if number > 0:
+                    in_text += self.serial.read(number)
+            except pyserial.serialutil.SerialException:
+                # device disconnected
+                self.is_alive = False
+                break
+
+            self.queue.put(self.converter.convert(in_text))
+
+    def flushConverter(self):
+        """
+        Shows the data kept by the converter (incomplete rows in Mix mode)
+        when there is no more data waiting in the port
+        """
+        text = self.converter.flush()
+        if(text):
+            self.queue.put(text)
+
+    def setDisplayMode(self, display_mode):
+        """
+        Changes the display mode of a running monitor
+
+        Arguments:
+            display_mode {string}
+                Text, Ascii, Hex or Mix
+        """
+        if(display_mode != self.converter.display_mode):
+            self.flushConverter()
+            self.converter = DisplayConverter(display_mode)
 
     def send(self, out_text):
         line_ending = self.Preferences.get('line_ending', '\n')
@@ -82,56 +146,106 @@ class SerialMonitor(object):
         self.serial.write(out_text)
 
 
-def convertMode(in_text, str_len=0):
-    """
-    Convert a text in differents formats (ASCII,HEX)
-
-    Arguments:
-        in_text {string}
-            Text to convert
+# tables used to convert the bytes received in the monitor
+HEX_TABLE = ['%02X ' % byte for byte in range(256)]
+HEX_SEPARATORS = ['', '', '', '', '', '', '', '\t',
+                  '', '', '', '', '', '', '', '\t\n']
+HEX_ROW = ('%02X ' * 8 + '\t') * 2
+MIX_TABLE = bytes.maketrans(b'\n', b'+')
 
-    Keyword Arguments:
-        str_len {int}
-            leng of the in_text string (default: {0})
 
-    Returns:
-        [string] -- Converted string
-    """
-    text = u''
-    display_mode = Preferences().get('display_mode', 'Text')
-    if display_mode == 'Ascii':
-        for character in in_text:
-            text += chr(character)
-    elif display_mode == 'Hex':
-        for (index, character) in enumerate(in_text):
-            text += u'%02X ' % character
-            if (index + str_len + 1) % 8 == 0:
-                text += '\t'
-            if (index + str_len + 1) % 16 == 0:
-                text += '\n'
-    elif display_mode == 'Mix':
-        text_mix = u''
-        for (index, character) in enumerate(in_text):
-            text_mix += chr(character)
-            text += u'%02X ' % character
-            if (index + str_len + 1) % 8 == 0:
-                text += '\t'
-            if (index + str_len + 1) % 16 == 0:
-                text_mix = text_mix.replace('\n', '+')
-                text += text_mix
-                text += '\n'
-                text_mix = ''
-        if(text_mix):
-            less = (31 - index)
-            for sp in range(less):
-                text += '   '
-            text += '\t'
-            text += text_mix
+class DisplayConverter(object):
+    """
+    Convert the bytes received in the differents formats (Text, ASCII,
+    HEX, Mix). It's created once per monitor and keeps the column of the
+    hex dump and the incomplete UTF-8 characters between chunks.
+    """
 
-    else:
-        text = in_text.decode('utf-8', 'replace')
-        text = text.replace('\r', '').replace('NULL', '')
-    return text
+    def __init__(self, display_mode='Text'):
+        self.display_mode = display_mode
+        self.column = 0
+        self.pending = b''
+        self.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+
+        if(display_mode == 'Ascii'):
+            self.convert = self.toAscii
+        elif(display_mode == 'Hex'):
+            self.convert = self.toHex
+        elif(display_mode == 'Mix'):
+            self.convert = self.toMix
+        else:
+            self.convert = self.toText
+
+    def toText(self, in_text):
+        text = self.decoder.decode(in_text)
+        return text.replace('\r', '').replace('NULL', '')
+
+    def toAscii(self, in_text):
+        return in_text.decode('latin-1')
+
+    def toHex(self, in_text):
+        """
+        Formats the bytes in rows of 16 values, the complete rows
+        are formatted with a single operation
+        """
+        text = []
+        column = self.column
+        index = 0
+        size = len(in_text)
+
+        # complete the current row
+        while column and index < size:
+            text.append(HEX_TABLE[in_text[index]] + HEX_SEPARATORS[column])
+            column = (column + 1) % 16
+            index += 1
+
+        # complete rows
+        while size - index >= 16:
+            text.append(HEX_ROW % tuple(in_text[index:index + 16]) + '\n')
+            index += 16
+
+        # beginning of the next row
+        while index < size:
+            text.append(HEX_TABLE[in_text[index]] + HEX_SEPARATORS[column])
+            column += 1
+            index += 1
+
+        self.column = column
+        return ''.join(text)
+
+    def toMix(self, in_text):
+        """
+        Shows each row of 16 values in hex and ascii, the incomplete
+        row is kept until is completed or flush is called
+        """
+        in_text = self.pending + in_text
+        rows = len(in_text) - len(in_text) % 16
+        self.pending = in_text[rows:]
+
+        text = []
+        for index in range(0, rows, 16):
+            row = in_text[index:index + 16]
+            text.append(HEX_ROW % tuple(row))
+            text.append(row.translate(MIX_TABLE).decode('latin-1') + '\n')
+        return ''.join(text)
+
+    def flush(self):
+        """
+        Returns the incomplete row in the Mix mode, filled with spaces
+        to keep the ascii column aligned
+        """
+        if(not self.pending):
+            return ''
+
+        row = self.pending
+        self.pending = b''
+
+        text = [HEX_TABLE[byte] + HEX_SEPARATORS[column][:1]
+                for (column, byte) in enumerate(row)]
+        text += ['   ' + HEX_SEPARATORS[column][:1]
+                 for column in range(len(row), 16)]
+        text.append(row.translate(MIX_TABLE).decode('latin-1') + '\n')
+        return ''.join(text)
 
 
 def isSerialAvailable(serial_port):
@@ -225,21 +339,157 @@ def listLinuxSerialPorts():
     return serial_ports
 
 
-def listMdnsServices():
-    import os
-    from . import Paths
+# seconds before start the mDNS browser again when it stopped by itself
+MDNS_RESTART_DELAY = 60
+
+
+class MdnsBrowser(object):
+    """
+    Keeps running the mDNS browser (libs/mDNS.py) in the PlatformIO
+    virtualenv, where zeroconf is installed, and stores the services
+    announced in a table. Each service expires when it isn't announced
+    again in 'ttl' seconds (the browser renews the known services each
+    10 seconds).
+
+    When the browser can't run (it exits right after start), it isn't
+    started again until MDNS_RESTART_DELAY seconds later, otherwise each
+    list of ports would wait for a new browser.
+    """
+
+    def __init__(self, ttl=35):
+        self.ttl = ttl
+        self.services = {}
+        self.lock = threading.Lock()
+        self.process = None
+        self.restart_time = 0
+        self.dependency_installed = False
 
-    executable = os.path.join(Paths.getEnvBinDir(), 'python')
-    mdns = os.path.join(Paths.getPluginPath(), 'libs', 'mDNS.py')
+    def isRunning(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self, wait=0.5):
+        """
+        Starts the browser if it isn't running
+
+        Keyword Arguments:
+            wait {float}
+                seconds to wait for the first services when the browser is
+                started (default: {0.5})
+        """
+        import os
+        import subprocess
+        from . import Paths
+
+        if self.isRunning() or time.time() < self.restart_time:
+            return
+
+        # the next start is delayed if this one fails
+        self.restart_time = time.time() + MDNS_RESTART_DELAY
+
+        executable = os.path.join(Paths.getEnvBinDir(), 'python')
+        mdns = os.path.join(Paths.getPluginPath(), 'libs', 'mDNS.py')
+
+        try:
+            self.process = subprocess.Popen([executable, mdns, '--watch'],
+                                            stdin=subprocess.PIPE,
+                                            stdout=subprocess.PIPE,
+                                            stderr=subprocess.STDOUT,
+                                            universal_newlines=True)
+        except OSError:
+            self.process = None
+            return
+
+        thread = threading.Thread(target=self.read, args=(self.process,))
+        thread.daemon = True
+        thread.start()
+
+        if wait:
+            time.sleep(wait)
+
+    def stop(self):
+        if self.isRunning():
+            try:
+                self.process.stdin.close()
+                self.process.terminate()
+            except (OSError, IOError):
+                pass
+        self.process = None
+        self.restart_time = 0
+
+        with self.lock:
+            self.services.clear()
 
-    cmd = ['"%s"' % executable, '"%s"' % mdns]
-    out = Tools.runCommand(cmd)
-    out = out[1].replace("'", "\"")
-    out = out.split('\n')
+    def read(self, process):
+        """
+        Reads the events sended by the browser and updates the table
+
+        Arguments:
+            process {Popen}
+                browser process
+        """
+        import json
+
+        for line in iter(process.stdout.readline, ''):
+            if 'No module named' in line and 'zeroconf' in line:
+                self.installDependency()
+                return
+
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+
+            with self.lock:
+                if event['event'] == 'add':
+                    expire = time.time() + self.ttl
+                    self.services[event['name']] = (expire, event)
+                else:
+                    self.services.pop(event['name'], None)
+
+    def installDependency(self):
+        """
+        Installs zeroconf in the virtualenv and restart the browser,
+        it's only tried once
+        """
+        self.process = None
+
+        if self.dependency_installed:
+            return
+        self.dependency_installed = True
 
-    if('ImportError: No module named zeroconf' in out):
         from .Install import PioInstall
         PioInstall().installDependencies('zeroconf')
-        out = listMdnsServices()
+        self.restart_time = 0
+        self.start(wait=0)
+
+    def getServices(self):
+        """
+        Returns the services currently available
 
-    return out
+        Returns:
+            [list] -- list of dicts with the keys: name, server,
+                      ip and properties
+        """
+        self.start()
+
+        now = time.time()
+        with self.lock:
+            for name, (expire, service) in list(self.services.items()):
+                if expire < now:
+                    self.services.pop(name)
+            services = [service for (expire, service) in
+                        self.services.values()]
+        return services
+
+
+mdns_browser = MdnsBrowser()
+
+
+def listMdnsServices():
+    """
+    List the mDNS services (_arduino._tcp) currently available
+
+    Returns:
+        [list] -- list of dicts with the data of each service
+    """
+    return mdns_browser.getServices()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import os
+import sys
+import time
+import threading
+import importlib
+
+START_TIME = time.time()
+TIMINGS = []
+TIMINGS_LOCK = threading.Lock()
+LOG_NAME = 'startup.log'
+LOG_WRITTEN = []
+
+
+class Measure(object):
+    '''
+    Records the time taken by the block in the startup report
+
+    with Measure('plugin_loaded'):
+        ...
+    '''
+
+    def __init__(self, label):
+        self.label = label
+
+    def __enter__(self):
+        self.start = time.time()
+
+    def __exit__(self, *args):
+        record(self.label, time.time() - self.start)
+
+
+def record(label, elapsed):
+    '''
+    Adds a timing in the startup report, when the report was already
+    written the timing is appended to the log file
+
+    Arguments:
+        label {str} -- what was measured
+        elapsed {float} -- seconds
+    '''
+    with TIMINGS_LOCK:
+        TIMINGS.append((label, elapsed))
+        if(LOG_WRITTEN):
+            appendLog(['%8.1f ms  %s (first use)' % (elapsed * 1000, label)])
+
+
+def importModule(name):
+    '''
+    Imports a module of the libs package recording the time taken
+
+    Arguments:
+        name {str} -- module name (Paths, Tools...)
+
+    Returns:
+        module
+    '''
+    full_name = '%s.%s' % (__package__, name)
+    if(full_name in sys.modules):
+        return sys.modules[full_name]
+
+    start = time.time()
+    module = importlib.import_module(full_name)
+    record('import %s' % name, time.time() - start)
+    return module
+
+
+def isLoaded(name):
+    '''
+    Checks if a module of the libs package was already imported, to avoid
+    loading it only to stop something that was never started
+    '''
+    return '%s.%s' % (__package__, name) in sys.modules
+
+
+class LazyModule(object):
+    '''
+    Module of the libs package imported the first time one of its
+    attributes is used
+    '''
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+
+    def __getattr__(self, attr):
+        module = importModule(self.__dict__['_name'])
+        return getattr(module, attr)
+
+
+class LazyAttribute(object):
+    '''
+    Class or function of a module imported the first time it's called
+    '''
+
+    def __init__(self, module, name):
+        self.module = module
+        self.name = name
+
+    def __call__(self, *args, **kwargs):
+        target = getattr(importModule(self.module), self.name)
+        return target(*args, **kwargs)
+
+
+def translate(text, *params):
+    '''
+    Same as I18n().translate, the translations are only loaded when the
+    first text is translated
+    '''
+    I18n = importModule('I18n').I18n
+    return I18n().translate(text, *params)
+
+
+def writeLog():
+    '''
+    Writes the startup report (imports and plugin_loaded time) in the
+    Deviot cache folder
+    '''
+    from . import __version__
+
+    with TIMINGS_LOCK:
+        lines = ['Deviot %s startup %s' % (
+            __version__, time.strftime('%Y-%m-%d %H:%M:%S'))]
+        for label, elapsed in TIMINGS:
+            lines.append('%8.1f ms  %s' % (elapsed * 1000, label))
+        total = time.time() - START_TIME
+        lines.append('%8.1f ms  total' % (total * 1000))
+
+        appendLog(lines, mode='w')
+        LOG_WRITTEN.append(True)
+
+
+def appendLog(lines, mode='a'):
+    from . import Paths
+
+    log_path = os.path.join(Paths.getCacheDir(), LOG_NAME)
+    try:
+        with open(log_path, mode) as file:
+            file.write('\n'.join(lines) + '\n')
+    except (IOError, OSError):
+        pass
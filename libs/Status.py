@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import sublime
+
+from . import Tools
+from . import __version__, __title__
+from .Preferences import CACHE
+from .Preferences import Preferences
+
+# milliseconds to wait after the last activated view to update the status
+STATUS_DELAY = 100
+
+
+class StatusBar(object):
+    '''
+    Shows the Deviot version, the environment and the port selected in the
+    status bar. The texts are computed from the preferences in memory
+    only when the preferences change, and each view is only updated when
+    its texts are different. When many views are activated in a short
+    time (switching tabs), only the last one is updated.
+    '''
+
+    def __init__(self):
+        self.pending = 0
+        self.revision = None
+        self.status = {}
+        self.views = {}
+
+    def schedule(self, view):
+        '''
+        Updates the status of the view after STATUS_DELAY, if another view
+        is activated before, this update is discarded
+
+        Arguments: view {st object} -- view activated
+        '''
+        self.pending += 1
+        pending = self.pending
+
+        def update():
+            if(pending == self.pending):
+                self.update(view)
+
+        sublime.set_timeout(update, STATUS_DELAY)
+
+    def update(self, view=None):
+        '''
+        Sets the status texts in the view, only when the view is an IoT file
+
+        Keyword Arguments:
+            view {st object} -- view to update, by default the active view
+        '''
+        if(view is None):
+            view = sublime.active_window().active_view()
+
+        if(not view or not Tools.isIOTFile(view.file_name())):
+            return
+
+        status = self.getStatus()
+        applied = self.views.get(view.id(), {})
+
+        for key, text in status.items():
+            if(applied.get(key) == text):
+                continue
+            if(text):
+                view.set_status(key, text)
+            else:
+                view.erase_status(key)
+
+        self.views[view.id()] = status
+
+    def getStatus(self):
+        '''
+        Status texts computed from the preferences, they're only computed
+        again when the preferences changed
+
+        Returns:
+            dict -- {status key: text}
+        '''
+        if(CACHE.path is None):
+            Preferences()
+
+        with CACHE.lock:
+            if(self.revision == CACHE.revision):
+                return self.status
+
+            preferences = CACHE.data
+            native = preferences.get('native', False)
+            if(native):
+                env = preferences.get('native_env_selected', False)
+            else:
+                env = preferences.get('env_selected', False)
+            port = preferences.get('port_bar', False)
+            pio_version = preferences.get('pio_version', 0)
+
+            self.status = {
+                '_deviot_version': '%s v%s | Pio v%s' % (
+                    __title__, str(__version__), pio_version),
+                '_deviot_env': env.upper() if env else '',
+                '_deviot_port': port.upper() if port else ''
+            }
+            self.revision = CACHE.revision
+
+            return self.status
+
+    def forgetView(self, view):
+        self.views.pop(view.id(), None)
+
+
+status_bar = StatusBar()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import time
+import heapq
+import threading
+import itertools
+import traceback
+
+import sublime
+
+# priority classes, the lowest number runs first
+INTERACTIVE = 0
+NORMAL = 1
+BACKGROUND = 2
+
+PRIORITY_NAMES = {INTERACTIVE: 'interactive',
+                  NORMAL: 'normal',
+                  BACKGROUND: 'background'}
+
+# seconds a worker without tasks waits before exit
+IDLE_TIMEOUT = 30
+STATUS_KEY = '_deviot_action_command'
+
+
+class Task(object):
+    '''
+    Function to run in the task executor. A task can be cancelled while
+    it's waiting; when it's running, the function must check
+    'isCancelled()' to stop (cooperative cancellation).
+    '''
+
+    def __init__(self, func, args, kwargs, name, priority,
+                 message, success_message):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.name = name
+        self.priority = priority
+        self.message = message
+        self.success_message = success_message
+        self.state = 'queued'
+        self.result = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_event = threading.Event()
+        self.done_event = threading.Event()
+        self.cancel_callbacks = []
+
+    def run(self):
+        CURRENT.task = self
+        self.started = time.time()
+        self.state = 'running'
+        try:
+            self.result = self.func(*self.args, **self.kwargs)
+            self.state = 'cancelled' if self.cancelled() else 'done'
+        except Exception:
+            self.state = 'error'
+            traceback.print_exc()
+        finally:
+            self.finished = time.time()
+            CURRENT.task = None
+            self.done_event.set()
+
+    def cancel(self):
+        '''
+        Requests the cancellation of the task
+        '''
+        self.cancel_event.set()
+        for callback in list(self.cancel_callbacks):
+            callback()
+
+    def addCancelCallback(self, callback):
+        '''
+        Calls a function when the task is cancelled (immediately if it
+        was already cancelled), used to stop the processes started by
+        the task
+        '''
+        self.cancel_callbacks.append(callback)
+        if(self.cancelled()):
+            callback()
+
+    def removeCancelCallback(self, callback):
+        if(callback in self.cancel_callbacks):
+            self.cancel_callbacks.remove(callback)
+
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def wait(self, timeout=None):
+        '''
+        Waits until the task finishes
+
+        Returns:
+            bool -- False when the timeout expired
+        '''
+        return self.done_event.wait(timeout)
+
+    def getAge(self):
+        '''
+        Seconds since the task was started, or since it was queued
+        when it's waiting
+        '''
+        return time.time() - (self.started or self.created)
+
+
+class TaskExecutor(object):
+    '''
+    Bounded pool of worker threads shared by all the Deviot actions.
+    The tasks wait in a priority queue (interactive actions first,
+    then normal and background tasks, in order of arrival), and the
+    workers are created on demand and exit after IDLE_TIMEOUT.
+    '''
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+        self.condition = threading.Condition()
+        self.queue = []
+        self.running = []
+        self.workers = 0
+        self.idle = 0
+        self.counter = itertools.count()
+        self.progress = ProgressIndicator(self)
+
+    def submit(self, func, args=(), kwargs=None, name=None,
+               priority=NORMAL, message=None, success_message=None):
+        '''
+        Queues a function to run in the pool
+
+        Arguments:
+            func {function} -- function to run
+
+        Keyword Arguments:
+            args {tuple} -- positional arguments of the function
+            kwargs {dict} -- keyword arguments of the function
+            name {str} -- name showed in the task list (default: function
+                          name)
+            priority {int} -- INTERACTIVE, NORMAL or BACKGROUND
+            message {str} -- text of the progress indicator, None to run
+                             without progress indicator
+            success_message {str} -- text showed when the task finishes
+
+        Returns:
+            Task -- the task queued
+        '''
+        name = name or getattr(func, '__name__', 'task')
+        task = Task(func, args, kwargs or {}, name, priority,
+                    message, success_message)
+
+        with self.condition:
+            heapq.heappush(self.queue, (priority, next(self.counter), task))
+
+            if(self.idle > 0):
+                self.condition.notify()
+            elif(self.workers < self.getMaxWorkers()):
+                self.workers += 1
+                worker = threading.Thread(target=self.work,
+                                          name='deviot-worker')
+                worker.daemon = True
+                worker.start()
+
+        if(message):
+            self.progress.start()
+
+        return task
+
+    def getMaxWorkers(self):
+        if(self.max_workers):
+            return self.max_workers
+
+        from .Preferences import Preferences
+        return max(1, Preferences().get('task_workers', 4))
+
+    def work(self):
+        '''
+        Loop of each worker thread
+        '''
+        while(True):
+            with self.condition:
+                task = self.nextTask()
+                if(task is None):
+                    self.workers -= 1
+                    return
+                self.running.append(task)
+
+            task.run()
+
+            with self.condition:
+                self.running.remove(task)
+            self.progress.taskFinished(task)
+
+    def nextTask(self):
+        '''
+        Waits for the next task, the cancelled tasks are discarded.
+        It must be called with the condition acquired
+
+        Returns:
+            Task -- None when there weren't tasks after IDLE_TIMEOUT
+        '''
+        while(True):
+            deadline = time.time() + IDLE_TIMEOUT
+            while(not self.queue):
+                remaining = deadline - time.time()
+                if(remaining <= 0):
+                    return None
+                self.idle += 1
+                self.condition.wait(remaining)
+                self.idle -= 1
+
+            task = heapq.heappop(self.queue)[2]
+            if(not task.cancelled()):
+                return task
+
+            task.state = 'cancelled'
+            task.done_event.set()
+
+    def getTasks(self):
+        '''
+        Running tasks followed by the queued tasks in order of execution
+        '''
+        with self.condition:
+            queued = [entry[2] for entry in sorted(self.queue)
+                      if not entry[2].cancelled()]
+            return list(self.running) + queued
+
+    def cancelAll(self, name=None):
+        '''
+        Cancels all the tasks, or only the ones with the given name
+
+        Keyword Arguments:
+            name {str} -- name of the tasks to cancel (default: {None})
+        '''
+        for task in self.getTasks():
+            if(name is None or task.name == name):
+                task.cancel()
+
+
+class ProgressIndicator(object):
+    '''
+    Single animation in the status bar for all the running tasks with
+    a message. It shows the message of the oldest task and the number
+    of tasks running with it.
+    '''
+
+    def __init__(self, executor):
+        self.executor = executor
+        self.lock = threading.Lock()
+        self.active = False
+        self.step = 0
+        self.addend = 1
+        self.size = 15
+        self.last_view = None
+        self.success_message = None
+
+    def start(self):
+        with self.lock:
+            if(self.active):
+                return
+            self.active = True
+        sublime.set_timeout(self.run, 100)
+
+    def taskFinished(self, task):
+        if(task.message and task.state == 'done'):
+            self.success_message = task.success_message
+
+    def run(self):
+        window = sublime.active_window()
+        view = window.active_view() if window else None
+
+        if(self.last_view is not None and view != self.last_view):
+            self.last_view.erase_status(STATUS_KEY)
+        self.last_view = view
+
+        tasks = [task for task in self.executor.getTasks()
+                 if task.message and not task.cancelled()]
+
+        if(not tasks):
+            with self.lock:
+                self.active = False
+            self.finish(view)
+            return
+
+        if(view is not None):
+            running = [task for task in tasks if task.state == 'running']
+            task = running[0] if running else tasks[0]
+            message = task.message
+            if(len(tasks) > 1):
+                message = '%s (+%d)' % (message, len(tasks) - 1)
+
+            before = self.step % self.size
+            after = (self.size - 1) - before
+            view.set_status(STATUS_KEY, '%s [%s=%s]' % (
+                message, ' ' * before, ' ' * after))
+
+            if not after:
+                self.addend = -1
+            if not before:
+                self.addend = 1
+            self.step += self.addend
+
+        sublime.set_timeout(self.run, 100)
+
+    def finish(self, view):
+        if(view is None):
+            return
+
+        success_message = self.success_message
+        self.success_message = None
+
+        if(not success_message):
+            view.erase_status(STATUS_KEY)
+            return
+
+        view.set_status(STATUS_KEY, success_message)
+
+        def cleanup():
+            if(not self.active):
+                view.erase_status(STATUS_KEY)
+        sublime.set_timeout(cleanup, 5000)
+
+
+CURRENT = threading.local()
+CURRENT.task = None
+
+executor = TaskExecutor()
+
+
+def submit(func, *args, **kwargs):
+    '''
+    Queues a function in the shared executor, the keyword arguments
+    name, priority, message and success_message configure the task and
+    the rest are passed to the function
+
+    Arguments:
+        func {function} -- function to run
+
+    Returns:
+        Task -- the task queued
+    '''
+    options = {}
+    for key in ('name', 'priority', 'message', 'success_message'):
+        if(key in kwargs):
+            options[key] = kwargs.pop(key)
+
+    return executor.submit(func, args, kwargs, **options)
+
+
+def currentTask():
+    '''
+    Task running in the current thread, None outside of the executor
+    '''
+    return getattr(CURRENT, 'task', None)
+
+
+def isCancelled():
+    '''
+    Checks if the task running in the current thread was cancelled,
+    the long operations must check it to stop as soon as possible
+    '''
+    task = currentTask()
+    return task is not None and task.cancelled()
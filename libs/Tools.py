@@ -113,22 +113,9 @@ def userPreferencesStatus():
 
     Arguments: view {st object} -- stores many info related with ST
     '''
-    from .Preferences import Preferences
-
-    native = Preferences().get('native', False)
-
-    # Check for environment
-    if native:
-        env = Preferences().get('native_env_selected', False)
-    else:
-        env = Preferences().get('env_selected', False)
-    if env:
-        setStatus(env.upper(), key='_deviot_env')
+    from .Status import status_bar
 
-    # check for port
-    port = Preferences().get('port_bar', False)
-    if port:
-        setStatus(port.upper(), key='_deviot_port')
+    status_bar.update()
 
 
 def singleton(cls):
@@ -322,101 +309,57 @@ def closeSerialMonitors():
 
 def getKeywords():
     """
-    Gets the keywords from the installed libraries
+    Gets the keywords from the installed libraries, each keywords.txt
+    file is only parsed again when it changes
 
     Returns:
-        [list] -- list of object with the keywords
-    """
-    from . import Paths
-    from . import Keywords
-
-    keywords = []
-    keywords_dirs = Paths.getLibraryFolders()
-
-    for path in keywords_dirs:
-        sub_dirs = glob.glob(path)
-        for sub_dir in sub_dirs:
-            key_file = os.path.join(sub_dir, 'keywords.txt')
-            if(os.path.isfile(key_file)):
-                keywords.append(Keywords.KeywordsFile(key_file))
-    return keywords
-
-
-def createCompletions():
+        [list] -- list of Keyword tuples (id, word_type, ref)
     """
-    Generate the completions file
-    """
-    from . import Paths
-    from .JSONFile import JSONFile
-
-    keywords = getKeywords()
-    keyword_ids = []
-    user_path = Paths.getDeviotUserPath()
-    completion_path = os.path.join(user_path, 'Deviot.sublime-completions')
-
-    cpp_keywords = ['define', 'error', 'include', 'elif', 'endif']
-    cpp_keywords += ['ifdef', 'ifndef', 'undef', 'line', 'pragma']
+    from .LibraryCatalog import getLibraryCatalog
+    from .Keywords import keyword_store
 
-    for k in keywords:
-        for w in k.get_keywords():
-            keyword_ids += [w.get_id() for w in k.get_keywords()]
+    catalog = getLibraryCatalog()
+    paths = [os.path.join(library['path'], 'keywords.txt')
+             for library in catalog.getLibraries()]
 
-    keyword_ids = set(keyword_ids)
-    keyword_ids = [word for word in keyword_ids]
+    return keyword_store.getKeywords(paths)
 
-    completions_dict = {'scope': 'source.iot'}
-    completions_dict['completions'] = keyword_ids
 
-    file = JSONFile(completion_path)
-    file.setData(completions_dict)
-
-
-def createSyntaxFile():
+def createSyntaxFile(keywords=None):
     """
     Generate the syntax file based in the installed libraries
+
+    Keyword Arguments:
+        keywords {list} -- keywords of the installed libraries, when it's
+                           None they're taken from getKeywords
     """
+    from xml.sax.saxutils import escape
     from . import Paths
     from .JSONFile import JSONFile
+    from .Keywords import trieRegex
 
-    keywords = getKeywords()
+    if(keywords is None):
+        keywords = getKeywords()
 
-    LITERAL1s = []
-    KEYWORD1s = []
-    KEYWORD2s = []
-    KEYWORD3s = []
+    word_groups = {'LITERAL1': set(), 'KEYWORD1': set(),
+                   'KEYWORD2': set(), 'KEYWORD3': set()}
 
     # set keywords
-    for k in keywords:
-        for w in k.get_keywords():
-            if 'LITERAL1' in w.get_type():
-                LITERAL1s.append(w.get_id())
-            if 'KEYWORD1' in w.get_type():
-                KEYWORD1s.append(w.get_id())
-            if 'KEYWORD2' in w.get_type():
-                KEYWORD2s.append(w.get_id())
-            if 'KEYWORD3' in w.get_type():
-                KEYWORD3s.append(w.get_id())
-
-    # formating
-    LITERAL1s = set(LITERAL1s)
-    LITERAL1s = '|'.join(LITERAL1s)
-    KEYWORD1s = set(KEYWORD1s)
-    KEYWORD1s = '|'.join(KEYWORD1s)
-    KEYWORD2s = set(KEYWORD2s)
-    KEYWORD2s = '|'.join(KEYWORD2s)
-    KEYWORD3s = set(KEYWORD3s)
-    KEYWORD3s = '|'.join(KEYWORD3s)
+    for word in keywords:
+        for word_type in word_groups:
+            if word_type in word.word_type:
+                word_groups[word_type].add(word.id)
 
     # get sintax preset
     sintax_path = Paths.getSyntaxPath()
     sintax_file = JSONFile(sintax_path)
     sintax = sintax_file.readFile()
 
-    # replace words in sintax file
-    sintax = sintax.replace('${LITERAL1}', LITERAL1s)
-    sintax = sintax.replace('${KEYWORD1}', KEYWORD1s)
-    sintax = sintax.replace('${KEYWORD2}', KEYWORD2s)
-    sintax = sintax.replace('${KEYWORD3}', KEYWORD3s)
+    # replace words in sintax file, the words are factorized by their
+    # prefixes to make the regex faster than a plain alternation
+    for word_type, words in word_groups.items():
+        words = escape(trieRegex(words))
+        sintax = sintax.replace('${%s}' % word_type, words)
 
     # Save File
     file_path = Paths.getTmLanguage()
@@ -426,28 +369,36 @@ def createSyntaxFile():
 
 def addLibraryToSketch(view, edit, lib_path):
     """
-    Search the file in the given path and adds as a library header
+    Search the file in the given path and adds as a library header.
+    The headers are taken from the library catalog and the headers
+    already included from the completions cache of the view, the folder
+    is only listed when the library isn't in the catalog
 
     Arguments:
         view {object} -- ST view
         edit {object} -- ST object
         lib_path {string} -- path where library is located
     """
-    lib_src = os.path.join(lib_path, 'src')
-    if os.path.isdir(lib_src):
-        lib_path = lib_src
-    lib_path = os.path.join(lib_path, '*')
+    from .Completions import completion_index
+    from .LibraryCatalog import getLibraryCatalog
 
-    region = sublime.Region(0, view.size())
-    src_text = view.substr(region)
-    headers = listHeadersFromSrc(src_text)
+    headers = completion_index.getIncludes(view)
 
-    h_files = []
-    sub_files = glob.glob(lib_path)
-    for file in sub_files:
-        file_name = os.path.basename(file)
-        if H_EXTS[0] in file_name:
-            h_files.append(file_name)
+    library = getLibraryCatalog(refresh=False).getLibrary(lib_path)
+    if(library is not None):
+        h_files = list(library['headers'])
+    else:
+        lib_src = os.path.join(lib_path, 'src')
+        if os.path.isdir(lib_src):
+            lib_path = lib_src
+        lib_path = os.path.join(lib_path, '*')
+
+        h_files = []
+        sub_files = glob.glob(lib_path)
+        for file in sub_files:
+            file_name = os.path.basename(file)
+            if H_EXTS[0] in file_name:
+                h_files.append(file_name)
 
     h_files = [f for f in h_files if f not in headers]
 
@@ -548,7 +499,7 @@ def saveEnvironment(data):
 
 
 def getEnvFromFile():
-    from .configobj.configobj import ConfigObj
+    from .ProjectConfig import getProjectConfig
 
     window = sublime.active_window()
     view = window.active_view()
@@ -557,7 +508,7 @@ def getEnvFromFile():
 
     envs = []
     if(os.path.exists(inipath)):
-        inifile = ConfigObj(inipath)
+        inifile = getProjectConfig(inipath).load()
         for env in inifile:
             if('env' in env):
                 envs.append(env.split(":")[1])
@@ -686,108 +637,6 @@ def getWorkingPath(view):
 
     return returnpath
 
-ERRORS_LIST = []
-
-
-def highlightError(view, conf=False):
-    from re import search
-
-    # Default config
-    if(not conf):
-        icon = 'Packages/Theme - Default/dot.png'
-        flag = sublime.DRAW_NO_FILL
-    else:
-        icon = conf['icon']
-        flag = conf['flag']
-
-    idn = 0
-    errors_list = []
-
-    region = sublime.Region(0, view.size())
-    sketch = view.substr(region)
-
-    for text in sketch.splitlines():
-        if('before' in text):
-            string_before = search(u'\'(\w+)\'$', text).group(1)
-
-        if 'error:' in text:
-            r_error = []
-            before = False
-            before_found = False
-            previous_line = False
-            # error is in previous line
-            if('before' in text):
-                before = True
-
-            text = text.split('error:')[0].strip()
-            infos = text.split(':')
-
-            if ':/' in text:
-                file_path = infos[0] + ':' + infos[1]
-                infos.pop(0)
-                infos.pop(0)
-            else:
-                file_path = infos[0]
-                infos.pop(0)
-
-            line_no = int(infos[0])
-            column_no = int(infos[1])
-
-            file_view = view.window().open_file(file_path)
-            current_line = ""
-            sketch_name = file_view.file_name().replace('\\', '_')
-
-            # get view
-            while(not current_line):
-                point = file_view.text_point(line_no, column_no)
-                line = file_view.line(point)
-                current_line = file_view.substr(line)
-
-                point = file_view.text_point(line_no - 1, column_no)
-                line = file_view.line(point)
-                previous_line = file_view.substr(line)
-
-                if(string_before in current_line):
-                    before_found = True
-
-                if(not before_found or not previous_line):
-                    current_line = ""
-
-                line_no = line_no - 1
-
-            if(before):
-                point = file_view.text_point(line_no, column_no)
-                line = file_view.line(point)
-
-            key_name = sketch_name + str(idn)
-            errors_list.append(key_name)
-
-            r_error.append(sublime.Region(line.a, line.b))
-            file_view.add_regions(key_name, r_error, 'invalid', icon, flag)
-
-            if(not idn):
-                file_view.show(point)
-
-            idn = idn + 1
-
-    return errors_list
-
-
-def highlightRemove(errors_list):
-    from time import sleep
-
-    return_list = []
-    view = sublime.active_window().active_view()
-    file_name = view.file_name().replace('\\', '_')
-
-    for error in errors_list:
-        if(file_name in error):
-            view.erase_regions(error)
-        else:
-            return_list.append(error)
-
-    return return_list
-
 
 def runCommand(command, cwd=None):
     '''Commands
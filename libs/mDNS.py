@@ -1,21 +1,94 @@
+import sys
+import json
 import time
 import socket
+import threading
 from zeroconf import ServiceBrowser, Zeroconf
 
+SERVICE_TYPE = "_arduino._tcp.local."
+
+# seconds between the checks of the known services
+REFRESH_TIME = 10
+
+
+def decode(value):
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    return value
+
+
+def output(event, name, info=None):
+    service = {"event": event, "name": name}
+
+    if info is not None:
+        properties = info.properties or {}
+        service["server"] = str(info.server)
+        service["ip"] = socket.inet_ntoa(info.address)
+        service["properties"] = dict((decode(key), decode(value))
+                                     for key, value in properties.items())
+
+    sys.stdout.write(json.dumps(service) + '\n')
+    sys.stdout.flush()
+
 
 class MyListener(object):
 
+    def __init__(self):
+        self.names = set()
+        self.lock = threading.Lock()
+
     def add_service(self, zeroconf, type, name):
         info = zeroconf.get_service_info(type, name)
-        lista = {"server": str(info.server),
-                 "ip": socket.inet_ntoa(info.address),
-                 "properties": info.properties}
-        print(lista)
+        if info is None:
+            return
+        with self.lock:
+            self.names.add(name)
+        output("add", name, info)
+
+    def remove_service(self, zeroconf, type, name):
+        with self.lock:
+            self.names.discard(name)
+        output("remove", name)
+
+    def refresh(self, zeroconf):
+        """
+        Resolves again the known services, the plugin uses it to
+        renew the time to live of each service
+        """
+        with self.lock:
+            names = list(self.names)
+
+        for name in names:
+            info = zeroconf.get_service_info(SERVICE_TYPE, name)
+            if info is None:
+                self.remove_service(zeroconf, SERVICE_TYPE, name)
+            else:
+                output("add", name, info)
+
+
+def watch(zeroconf, listener):
+    """
+    Keeps the browser running until stdin is closed (Deviot was
+    closed or the browser stopped)
+    """
+    def refresh():
+        while True:
+            time.sleep(REFRESH_TIME)
+            listener.refresh(zeroconf)
+
+    thread = threading.Thread(target=refresh)
+    thread.daemon = True
+    thread.start()
+
+    sys.stdin.read()
 
 
 zeroconf = Zeroconf()
 listener = MyListener()
-browser = ServiceBrowser(zeroconf, "_arduino._tcp.local.", listener)
+browser = ServiceBrowser(zeroconf, SERVICE_TYPE, listener)
 
-time.sleep(0.2)
+if '--watch' in sys.argv:
+    watch(zeroconf, listener)
+else:
+    time.sleep(0.2)
 zeroconf.close()
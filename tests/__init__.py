@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import os
+import sys
+import types
+import atexit
+import shutil
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if(ROOT not in sys.path):
+    sys.path.insert(0, ROOT)
+
+# the plugin modules import the Sublime Text API, outside of the editor
+# a minimal replacement is used (only what's called at import time and by
+# the modules tested)
+if('sublime' not in sys.modules):
+    PACKAGES = tempfile.mkdtemp(prefix='deviot-tests-')
+    atexit.register(shutil.rmtree, PACKAGES, True)
+
+    sublime = types.ModuleType('sublime')
+    sublime.platform = lambda: 'linux'
+    sublime.version = lambda: '3211'
+    sublime.packages_path = lambda: PACKAGES
+    sublime.set_timeout = lambda callback, delay=0: None
+    sublime.set_timeout_async = lambda callback, delay=0: None
+    sublime.active_window = lambda: None
+    sublime.windows = lambda: []
+    sublime.load_settings = lambda name: {}
+    sublime.DRAW_NO_FILL = 32
+    sublime.Region = lambda a, b=None: (a, a if b is None else b)
+    sys.modules['sublime'] = sublime
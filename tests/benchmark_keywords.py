@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+# Compares the regex of the library keywords built by trieRegex with a
+# flat alternation, it's not part of the test suite:
+# python -m tests.benchmark_keywords path/to/keywords.txt [...]
+
+import re
+import sys
+import time
+import random
+
+from tests import ROOT  # noqa: F401 (sets the import path)
+from libs.Keywords import KeywordsFile
+from libs.Keywords import escapeRegex
+from libs.Keywords import trieRegex
+
+
+def flatRegex(words):
+    """
+    Regex alternation of the given words without any factorization
+    """
+    return '|'.join([escapeRegex(word) for word in sorted(set(words))])
+
+
+def benchmarkRegex(words, repeat=5, size=200000):
+    """
+    Compares the time to find the words in a text using a flat
+    alternation and the trie regex. Python regex engine is used as
+    reference of the one used by Sublime Text to highlight the sketch.
+
+    Arguments:
+        words {list} -- words to match
+
+    Keyword Arguments:
+        repeat {int} -- times each regex is run (default: {5})
+        size {int} -- approximated length of the text (default: {200000})
+
+    Returns:
+        dict -- best time in seconds of each regex and the matches found
+    """
+    words = sorted(set(words))
+    rand = random.Random(0)
+
+    # sketch like text, words mixed with identifiers not included
+    tokens = []
+    length = 0
+    while(length < size):
+        if(rand.random() < 0.3):
+            token = rand.choice(words)
+        else:
+            token = rand.choice(words) + rand.choice(['_x', 'Z', '2'])
+        tokens.append(token)
+        length += len(token) + 2
+    text = '(\n'.join(tokens)
+
+    results = {}
+    for name, regex in (('flat', flatRegex(words)),
+                        ('trie', trieRegex(words))):
+        pattern = re.compile(r'\b(%s)\b' % regex)
+        best = None
+        for attempt in range(repeat):
+            start = time.time()
+            matches = pattern.findall(text)
+            elapsed = time.time() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = best
+        results[name + '_matches'] = len(matches)
+        results[name + '_length'] = len(regex)
+
+    return results
+
+
+if __name__ == '__main__':
+    # python -m tests.benchmark_keywords path/to/keywords.txt [...]
+    words = []
+    for path in sys.argv[1:]:
+        words.extend(keyword.id for keyword in KeywordsFile(path).keywords)
+
+    if(not words):
+        print('usage: python -m tests.benchmark_keywords keywords.txt '
+              '[keywords.txt ...]')
+        sys.exit(1)
+
+    results = benchmarkRegex(words)
+    print('%d words' % len(set(words)))
+    for name in ('flat', 'trie'):
+        print('%s: %.4fs, %d matches, regex length %d' % (
+            name, results[name], results[name + '_matches'],
+            results[name + '_length']))
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from tests import ROOT  # noqa: F401 (sets the import path)
+from libs import Paths
+from libs.BuildManifest import BuildManifest
+
+
+class BuildManifestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.project = tempfile.mkdtemp(prefix='deviot-project-')
+        self.libraries = tempfile.mkdtemp(prefix='deviot-libraries-')
+
+        patcher = mock.patch.object(Paths, 'getPioLibrary',
+                                    lambda: self.libraries)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.source = os.path.join(self.project, 'src')
+        os.makedirs(self.source)
+        self.write(os.path.join(self.source, 'main.ino'),
+                   '#include "config.h"\n#include <DHT.h>\n')
+        self.write(os.path.join(self.source, 'config.h'), '#define PIN 2\n')
+
+        # a firmware of a previous build
+        firmware = os.path.join(self.project, '.pioenvs', 'uno')
+        os.makedirs(firmware)
+        self.write(os.path.join(firmware, 'firmware.hex'), '')
+
+        self.manifest = self.getManifest()
+        self.manifest.remove()
+
+    def tearDown(self):
+        shutil.rmtree(self.project, True)
+        shutil.rmtree(self.libraries, True)
+
+    def write(self, path, text):
+        with open(path, 'w') as file:
+            file.write(text)
+
+    def getManifest(self):
+        ini_path = os.path.join(self.project, 'platformio.ini')
+        return BuildManifest(self.project, self.source, ini_path, 'uno')
+
+    def test_first_build(self):
+        self.assertEqual(self.manifest.getChanges(), ['firmware'])
+
+    def test_up_to_date(self):
+        self.manifest.save(['RAM: 10%'])
+
+        manifest = self.getManifest()
+        self.assertEqual(manifest.getChanges(), [])
+        self.assertEqual(manifest.getSizeReport(), ['RAM: 10%'])
+
+    def test_local_header_changed(self):
+        self.manifest.save()
+        self.write(os.path.join(self.source, 'config.h'), '#define PIN 3\n')
+
+        self.assertEqual(self.getManifest().getChanges(),
+                         [os.path.join('src', 'config.h')])
+
+    def test_library_installed(self):
+        self.manifest.save()
+
+        library = os.path.join(self.libraries, 'DHT_ID19')
+        os.makedirs(library)
+        self.write(os.path.join(library, 'library.json'), '{}')
+
+        self.assertEqual(self.getManifest().getChanges(), ['libraries'])
+
+
+if __name__ == '__main__':
+    unittest.main()
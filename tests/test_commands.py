@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import unittest
+
+from tests import ROOT  # noqa: F401 (sets the import path)
+from libs.Commands import output_classifier
+
+
+class OutputClassifierTest(unittest.TestCase):
+
+    def classify(self, text):
+        return output_classifier.classify(text.lower())
+
+    def test_diagnostics(self):
+        self.assertEqual(self.classify("main.cpp:3:1: error: expected ';'"),
+                         set(['error']))
+        self.assertEqual(self.classify("main.cpp:5: warning: unused 'x'"),
+                         set(['warning']))
+        self.assertEqual(self.classify('In function void setup():'),
+                         set(['function']))
+
+    def test_progress(self):
+        self.assertEqual(self.classify('Uploading [ 45% ]'),
+                         set(['percentage']))
+        self.assertEqual(self.classify('[====>   ] 40% 120/300 kB'),
+                         set(['progress']))
+        self.assertIn('attempt', self.classify('avrdude: attempt 2 of 10'))
+
+    def test_info_rules(self):
+        self.assertEqual(self.classify('[INFO]: Starting on 0.0.0.0'),
+                         set(['info']))
+        self.assertEqual(self.classify('[ERROR]: No Answer'),
+                         set(['info']))
+
+    def test_several_kinds(self):
+        self.assertEqual(self.classify('/usr/bin/ld: warning: cygwin path'),
+                         set(['warning', 'cygwin']))
+
+    def test_plain_output(self):
+        self.assertEqual(self.classify('Compiling .pioenvs/uno/main.o'),
+                         set())
+
+
+if __name__ == '__main__':
+    unittest.main()
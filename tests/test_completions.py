@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from tests import ROOT  # noqa: F401 (sets the import path)
+from libs.Completions import CompletionIndex
+
+SKETCH = '''#include <Arduino.h>
+#include "DHT.h"
+
+void setup() {
+    dht.
+'''
+
+
+class FakeView(object):
+    '''
+    View with the text of a sketch, the change count grows when the
+    text is modified
+    '''
+
+    def __init__(self, text):
+        self.text = text
+        self.changes = 1
+
+    def id(self):
+        return 1
+
+    def change_count(self):
+        return self.changes
+
+    def size(self):
+        return len(self.text)
+
+    def substr(self, region):
+        return self.text[region[0]:region[1]]
+
+    def line(self, point):
+        start = self.text.rfind('\n', 0, point) + 1
+        end = self.text.find('\n', point)
+        return FakeRegion(start, len(self.text) if end < 0 else end)
+
+    def insert(self, text):
+        self.text += text
+        self.changes += 1
+
+
+class FakeRegion(object):
+
+    def __init__(self, a, b):
+        self.a = a
+        self.b = b
+
+
+class FakeCatalog(object):
+
+    def __init__(self, path):
+        self.revision = 1
+        self.index = {'DHT.h': [{'name': 'DHT sensor library',
+                                 'path': path,
+                                 'platform': ''}]}
+
+    def getHeaderIndex(self):
+        return self.index
+
+
+class CompletionIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix='deviot-library-')
+        with open(os.path.join(self.folder, 'keywords.txt'), 'w') as file:
+            file.write('DHT\tKEYWORD1\nreadHumidity\tKEYWORD2\n'
+                       'readTemperature\tKEYWORD2\n')
+
+        catalog = FakeCatalog(self.folder)
+        patches = [mock.patch('libs.Completions.getLibraryCatalog',
+                              lambda refresh=True: catalog),
+                   mock.patch.object(CompletionIndex, 'getPlatform',
+                                     lambda self: 'all'),
+                   mock.patch('libs.Tasks.submit', self.submit)]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.submitted = []
+        self.index = CompletionIndex()
+        self.view = FakeView(SKETCH)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, True)
+
+    def submit(self, func, *args, **kwargs):
+        self.submitted.append((func, args))
+
+    def runSubmitted(self):
+        submitted = self.submitted
+        self.submitted = []
+        for func, args in submitted:
+            func(*args)
+
+    def test_empty_until_updated(self):
+        self.assertEqual(self.index.query(self.view, 'read'), [])
+        self.assertEqual(len(self.submitted), 1)
+
+        # the queries don't queue more updates while one is pending
+        self.index.query(self.view, 'read')
+        self.assertEqual(len(self.submitted), 1)
+
+        self.runSubmitted()
+        self.assertEqual(self.index.query(self.view, 'read'),
+                         [['readHumidity\tDHT sensor library',
+                           'readHumidity'],
+                          ['readTemperature\tDHT sensor library',
+                           'readTemperature']])
+        self.assertEqual(self.submitted, [])
+
+    def test_modified_view_is_updated(self):
+        self.index.schedule(self.view)
+        self.runSubmitted()
+
+        self.view.insert('readH')
+        # the previous index answers while the new one is built
+        self.assertEqual(len(self.index.query(self.view, 'readH')), 1)
+        self.assertEqual(len(self.submitted), 1)
+
+    def test_headers(self):
+        self.view.insert('}\n#include <dh')
+        self.index.schedule(self.view)
+        self.runSubmitted()
+
+        location = len(self.view.text)
+        self.assertEqual(self.index.query(self.view, 'dh', location),
+                         [['DHT.h\tDHT sensor library', 'DHT.h']])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import re
+import unittest
+
+from tests import ROOT  # noqa: F401 (sets the import path)
+from libs.Keywords import trieRegex
+
+WORDS = ['analog', 'analogRead', 'analogWrite', 'analogReference',
+         'digitalRead', 'digitalWrite', 'delay', 'delayMicroseconds',
+         'HIGH', 'LOW', 'A0', 'A1', 'A2', 'Serial', 'Serial1', 'F',
+         'operator[]', 'a.b', 'x+y']
+
+
+class TrieRegexTest(unittest.TestCase):
+
+    def pattern(self, words):
+        return re.compile(r'(?:%s)$' % trieRegex(words))
+
+    def test_every_word_matches(self):
+        pattern = self.pattern(WORDS)
+        for word in WORDS:
+            self.assertIsNotNone(pattern.match(word), word)
+
+    def test_near_misses(self):
+        pattern = self.pattern(WORDS)
+        for word in ['analo', 'analogRea', 'analogReads', 'digital',
+                     'A3', 'Serial2', 'delayMicro', 'HIGHLOW', 'ab',
+                     'operator', 'xy', 'f', '']:
+            self.assertIsNone(pattern.match(word), word)
+
+    def test_common_prefix(self):
+        self.assertEqual(trieRegex(['analog', 'analogRead', 'analogWrite']),
+                         'analog(?:Read|Write)?')
+        self.assertEqual(trieRegex(['A0', 'A1', 'A2']), 'A[012]')
+
+    def test_same_result(self):
+        self.assertEqual(trieRegex(WORDS), trieRegex(reversed(WORDS * 2)))
+        self.assertEqual(trieRegex([]), '')
+        self.assertEqual(trieRegex(['']), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
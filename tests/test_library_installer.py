@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import shlex
+import unittest
+
+from tests import ROOT  # noqa: F401 (sets the import path)
+from libs import LibraryInstaller
+from libs.Libraries import Libraries
+
+
+class InstallQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        LibraryInstaller.resetQueue()
+
+    def tearDown(self):
+        LibraryInstaller.resetQueue()
+
+    def test_first_queue_starts_the_installer(self):
+        self.assertTrue(LibraryInstaller.queueInstall(['64']))
+        self.assertFalse(LibraryInstaller.queueInstall(['19']))
+        self.assertEqual(LibraryInstaller.installing, [True])
+
+    def test_batch_groups_by_storage(self):
+        LibraryInstaller.queueInstall(['64', '19'])
+        LibraryInstaller.queueInstall(['OneWire'], '/project/.piolibdeps')
+
+        batch = LibraryInstaller.nextBatch()
+        self.assertEqual(batch, {None: ['64', '19'],
+                                 '/project/.piolibdeps': ['OneWire']})
+        self.assertEqual(LibraryInstaller.install_queue, [])
+        # the installer keeps running until it finds the queue empty
+        self.assertEqual(LibraryInstaller.installing, [True])
+
+    def test_queued_while_installing_go_in_next_batch(self):
+        LibraryInstaller.queueInstall(['64'])
+        LibraryInstaller.nextBatch()
+
+        self.assertFalse(LibraryInstaller.queueInstall(['19']))
+        self.assertEqual(LibraryInstaller.nextBatch(), {None: ['19']})
+
+    def test_empty_queue_stops_the_installer(self):
+        LibraryInstaller.queueInstall(['64'])
+        LibraryInstaller.nextBatch()
+
+        self.assertEqual(LibraryInstaller.nextBatch(), {})
+        self.assertEqual(LibraryInstaller.installing, [])
+        self.assertTrue(LibraryInstaller.queueInstall(['19']))
+
+    def test_reset_after_failure(self):
+        LibraryInstaller.queueInstall(['64'])
+        LibraryInstaller.nextBatch()
+        LibraryInstaller.queueInstall(['19'])
+
+        # the installer failed in the middle of a batch
+        LibraryInstaller.resetQueue()
+
+        self.assertEqual(LibraryInstaller.install_queue, [])
+        self.assertEqual(LibraryInstaller.installing, [])
+        self.assertTrue(LibraryInstaller.queueInstall(['32']))
+
+
+class FailingInstaller(object):
+    '''
+    Installer that fails in the first batch
+    '''
+    installQueued = Libraries.installQueued
+
+    def installBatch(self, specs, storage=None):
+        raise ValueError('invalid output')
+
+
+class InstallQueuedTest(unittest.TestCase):
+
+    def tearDown(self):
+        LibraryInstaller.resetQueue()
+
+    def test_error_stops_the_installer(self):
+        LibraryInstaller.queueInstall(['64'])
+        LibraryInstaller.queueInstall(['19'])
+
+        with self.assertRaises(ValueError):
+            FailingInstaller().installQueued()
+
+        self.assertEqual(LibraryInstaller.install_queue, [])
+        self.assertEqual(LibraryInstaller.installing, [])
+        self.assertTrue(LibraryInstaller.queueInstall(['32']))
+
+
+class Uninstaller(object):
+    '''
+    Builds the uninstall commands of Libraries without PlatformIO
+    '''
+    uninstallCommand = Libraries.uninstallCommand
+
+    def __init__(self, pio_version):
+        self.pio_version = pio_version
+
+
+class UninstallCommandTest(unittest.TestCase):
+
+    def arguments(self, command):
+        # the command line is joined as Commands.createOptions does
+        return shlex.split(' '.join(command))
+
+    def test_name_with_spaces(self):
+        command = Uninstaller(3).uninstallCommand('Adafruit GFX Library')
+        self.assertEqual(self.arguments(command),
+                         ['lib', '--global', 'uninstall',
+                          'Adafruit GFX Library'])
+
+    def test_old_platformio(self):
+        command = Uninstaller(2).uninstallCommand('13')
+        self.assertEqual(self.arguments(command), ['lib', 'uninstall', '13'])
+
+
+class SpecTest(unittest.TestCase):
+
+    def test_parse_spec(self):
+        self.assertEqual(LibraryInstaller.parseSpec('ArduinoJson@5.13'),
+                         ('ArduinoJson', '5.13'))
+        self.assertEqual(LibraryInstaller.parseSpec('"DHT sensor library"'),
+                         ('DHT sensor library', ''))
+        url = 'https://github.com/user/lib.git'
+        self.assertEqual(LibraryInstaller.parseSpec(url), (url, ''))
+
+    def test_quote_spec(self):
+        self.assertEqual(LibraryInstaller.quoteSpec('DHT sensor library'),
+                         '"DHT sensor library"')
+        self.assertEqual(LibraryInstaller.quoteSpec('"ArduinoJson@5" '),
+                         '"ArduinoJson@5"')
+
+    def test_split_specs(self):
+        value = ['ArduinoJson@5', 'DHT sensor library\n  64', '']
+        self.assertEqual(LibraryInstaller.splitSpecs(value),
+                         ['ArduinoJson@5', 'DHT sensor library', '64'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from tests import ROOT
+from libs.LibraryRegistry import LibraryRegistry
+from libs.LibraryRegistry import tokenize
+
+FIXTURE = os.path.join(ROOT, 'tests', 'fixtures', 'registry.json')
+
+
+class TokenizeTest(unittest.TestCase):
+
+    def test_camel_case(self):
+        self.assertEqual(tokenize('ESP8266WiFi_Sensor'),
+                         ['esp8266wifi', 'esp', '8266', 'wi', 'fi',
+                          'sensor'])
+
+    def test_words(self):
+        self.assertEqual(tokenize('DHT sensor, library!'),
+                         ['dht', 'sensor', 'library'])
+        self.assertEqual(tokenize('ArduinoJson'),
+                         ['arduinojson', 'arduino', 'json'])
+
+
+class RegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix='deviot-registry-')
+        self.path = os.path.join(self.folder, 'registry.json')
+        self.registry = LibraryRegistry(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, True)
+
+    def names(self, query, **filters):
+        return [library['name']
+                for library in self.registry.search(query, **filters)]
+
+
+class ImportTest(RegistryTest):
+
+    def test_import_dump(self):
+        self.assertTrue(self.registry.isEmpty())
+        self.assertEqual(self.registry.importDump(FIXTURE), 4)
+
+        self.assertTrue(self.registry.isComplete())
+        self.assertFalse(self.registry.isOutdated())
+
+        library = self.registry.data['libraries']['19']
+        self.assertEqual(library['frameworks'], ['arduino'])
+        self.assertEqual(library['platforms'], ['atmelavr', 'espressif8266'])
+        self.assertEqual(library['authors'], ['Adafruit Industries'])
+
+    def test_import_is_saved(self):
+        self.registry.importDump(FIXTURE)
+
+        registry = LibraryRegistry(self.path)
+        self.assertEqual(len(registry.data['libraries']), 4)
+        self.assertTrue(registry.isComplete())
+        self.assertEqual(registry.search('json')[0]['id'], 64)
+
+    def test_search_results_are_not_complete(self):
+        self.registry.addLibraries([{'id': 19, 'name': 'DHT sensor library'}])
+
+        self.assertFalse(self.registry.isEmpty())
+        self.assertFalse(self.registry.isComplete())
+
+
+class SearchTest(RegistryTest):
+
+    def setUp(self):
+        super(SearchTest, self).setUp()
+        self.registry.importDump(FIXTURE)
+
+    def test_prefix(self):
+        self.assertEqual(self.names('hum'),
+                         ['DHT sensor library', 'WifiEspSensor'])
+        self.assertEqual(self.names('graph'), ['Adafruit GFX Library'])
+
+    def test_camel_case_parts(self):
+        self.assertEqual(self.names('json'), ['ArduinoJson'])
+        self.assertEqual(self.names('wi fi'), ['WifiEspSensor'])
+
+    def test_all_words(self):
+        self.assertEqual(self.names('adafruit display'),
+                         ['Adafruit GFX Library'])
+        self.assertEqual(self.names('adafruit json'), [])
+
+    def test_ranking(self):
+        # the name weights more than the description, the exact name
+        # goes first
+        self.assertEqual(self.names('sensor'),
+                         ['WifiEspSensor', 'DHT sensor library'])
+        self.assertEqual(self.names('dht sensor library')[0],
+                         'DHT sensor library')
+        self.assertEqual(self.names('library'),
+                         ['Adafruit GFX Library', 'DHT sensor library',
+                          'ArduinoJson'])
+
+    def test_filters(self):
+        self.assertEqual(self.names('sensor platform:atmelavr'),
+                         ['DHT sensor library'])
+        self.assertEqual(self.names('framework:mbed'), ['ArduinoJson'])
+        self.assertEqual(self.names('sensor', platform='espressif8266'),
+                         ['WifiEspSensor', 'DHT sensor library'])
+        self.assertEqual(self.names('json framework:espidf'), [])
+
+    def test_limit(self):
+        self.assertEqual(len(self.registry.search('', limit=2)), 2)
+        self.assertEqual(len(self.registry.search('')), 4)
+
+
+class FakeSearch(object):
+    '''
+    Replaces the online search in the refresh
+    '''
+    result = None
+
+    def __init__(self, keyword, url=None):
+        self.keyword = keyword
+
+    def run(self):
+        return self.result
+
+
+class RefreshTest(RegistryTest):
+
+    def refresh(self, result):
+        FakeSearch.result = result
+        with mock.patch('libs.LibrarySearch.LibrarySearch', FakeSearch):
+            return self.registry.refresh()
+
+    def test_refresh_completes(self):
+        items = [{'id': 64, 'name': 'ArduinoJson'},
+                 {'id': 19, 'name': 'DHT sensor library'}]
+
+        self.assertEqual(self.refresh({'items': items}), 2)
+        self.assertTrue(self.registry.isComplete())
+        self.assertEqual(self.names('dht'), ['DHT sensor library'])
+
+    def test_cancelled_refresh(self):
+        self.registry.addLibraries([{'id': 19, 'name': 'DHT sensor library'}])
+
+        self.assertEqual(self.refresh(None), 1)
+        self.assertFalse(self.registry.isComplete())
+        self.assertTrue(self.registry.isOutdated())
+
+
+if __name__ == '__main__':
+    unittest.main()
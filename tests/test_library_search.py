@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import os
+import json
+import time
+import socket
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from http.server import HTTPServer
+from http.server import BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from urllib.parse import urlsplit
+from urllib.parse import parse_qs
+
+from tests import ROOT  # noqa: F401 (sets the import path)
+from libs.LibrarySearch import ConnectionPool
+from libs.LibrarySearch import HTTPError
+from libs.LibrarySearch import LibrarySearch
+from libs.LibrarySearch import ResponseCache
+
+TOTAL = 9
+PERPAGE = 2
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    '''
+    Search API with TOTAL libraries in pages of PERPAGE, every page has
+    an ETag. The requests received are recorded to check them in the tests
+    '''
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), StubHandler)
+        self.lock = threading.Lock()
+        self.requests = []
+        # request line path and Proxy-Authorization of each request
+        self.paths = []
+        self.connections = 0
+        self.active = 0
+        self.max_active = 0
+        # seconds to wait before answer each page
+        self.delays = {}
+        # the connection is closed after the response without telling it
+        # to the client, as a server that drops the idle connections
+        self.drop_connections = False
+
+    def getUrl(self):
+        return 'http://127.0.0.1:%s/lib/search' % self.server_address[1]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        page = int(query.get('page', ['1'])[0])
+        etag = '"page-%s"' % page
+
+        with server.lock:
+            server.requests.append((page, self.headers.get('If-None-Match')))
+            server.paths.append((self.path,
+                                 self.headers.get('Proxy-Authorization')))
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+
+        time.sleep(server.delays.get(page, 0))
+
+        with server.lock:
+            server.active -= 1
+
+        if(parts.path != '/lib/search'):
+            self.sendBody(404, b'')
+        elif(self.headers.get('If-None-Match') == etag):
+            self.sendBody(304, None)
+        else:
+            first = (page - 1) * PERPAGE
+            items = [{'id': index, 'name': 'Library %s' % index}
+                     for index in range(first, min(first + PERPAGE, TOTAL))]
+            body = json.dumps({'total': TOTAL,
+                               'perpage': PERPAGE,
+                               'page': page,
+                               'items': items})
+            self.sendBody(200, body.encode('utf-8'), etag)
+
+        if(server.drop_connections):
+            self.close_connection = True
+
+    def sendBody(self, status, body, etag=None):
+        self.send_response(status)
+        if(etag):
+            self.send_header('ETag', etag)
+        if(body is not None):
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if(body):
+            self.wfile.write(body)
+
+
+class StubServerTest(unittest.TestCase):
+
+    def setUp(self):
+        # the tests run without the proxies of the environment
+        environ = dict((name, value) for name, value in os.environ.items()
+                       if not name.lower().endswith('_proxy'))
+        patcher = mock.patch.dict(os.environ, environ, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.server = StubServer()
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       args=(0.05,))
+        self.thread.daemon = True
+        self.thread.start()
+
+        self.cache_path = tempfile.mkdtemp(prefix='deviot-cache-')
+        self.cache = ResponseCache(self.cache_path)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        shutil.rmtree(self.cache_path, True)
+
+    def search(self, keyword='sensor', on_page=None):
+        search = LibrarySearch(keyword, url=self.server.getUrl(),
+                               max_connections=4, cache=self.cache)
+        return search.run(on_page)
+
+
+class LibrarySearchTest(StubServerTest):
+
+    def test_pages_in_order(self):
+        # the first pages are the slowest, they arrive last
+        self.server.delays = {2: 0.3, 3: 0.2, 4: 0.1}
+
+        results = []
+        received = []
+
+        def onPage(result):
+            results.append(result)
+            received.append([item['id'] for item in result['items']])
+
+        result = self.search(on_page=onPage)
+
+        names = [item['name'] for item in result['items']]
+        self.assertEqual(names, ['Library %s' % i for i in range(TOTAL)])
+        self.assertTrue(result['complete'])
+        self.assertEqual(result['pages'], 5)
+
+        # a partial result after each page, the last one is complete
+        self.assertEqual(len(results), 5)
+        self.assertEqual([r['complete'] for r in results],
+                         [False] * 4 + [True])
+        self.assertEqual([r['pages_received'] for r in results],
+                         [1, 2, 3, 4, 5])
+        # the items of a page are shown when the previous pages arrive
+        self.assertEqual(received, [[0, 1], [0, 1], [0, 1], [0, 1],
+                                    list(range(TOTAL))])
+
+    def test_pages_downloaded_at_the_same_time(self):
+        self.server.delays = dict((page, 0.2) for page in range(2, 6))
+
+        self.search()
+
+        self.assertGreater(self.server.max_active, 1)
+        # the first page is requested alone, then up to 4 connections
+        self.assertLessEqual(self.server.max_active, 4)
+        self.assertLessEqual(self.server.connections, 5)
+
+    def test_not_modified_uses_the_cache(self):
+        first = self.search()
+        del self.server.requests[:]
+
+        second = self.search()
+
+        self.assertEqual(second['items'], first['items'])
+        self.assertEqual(sorted(self.server.requests),
+                         [(page, '"page-%s"' % page) for page in range(1, 6)])
+
+    def test_other_query_is_not_cached(self):
+        self.search('sensor')
+        del self.server.requests[:]
+
+        self.search('display')
+
+        self.assertTrue(all(etag is None
+                            for page, etag in self.server.requests))
+
+
+class ConnectionPoolTest(StubServerTest):
+
+    def setUp(self):
+        super(ConnectionPoolTest, self).setUp()
+        self.pool = ConnectionPool(max_connections=1)
+
+    def tearDown(self):
+        self.pool.close()
+        super(ConnectionPoolTest, self).tearDown()
+
+    def test_connection_reused(self):
+        for page in range(1, 4):
+            url = '%s?page=%s' % (self.server.getUrl(), page)
+            status, headers, body = self.pool.request(url)
+            self.assertEqual(status, 200)
+
+        self.assertEqual(self.server.connections, 1)
+
+    def test_retry_on_stale_connection(self):
+        self.server.drop_connections = True
+
+        url = self.server.getUrl()
+        self.assertEqual(self.pool.request(url)[0], 200)
+        # the idle connection was closed by the server, the request
+        # fails on it and it's sent again in a new connection
+        status, headers, body = self.pool.request(url + '?page=2')
+
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body.decode('utf-8'))['page'], 2)
+        self.assertEqual(self.server.connections, 2)
+        self.assertEqual([page for page, etag in self.server.requests],
+                         [1, 2])
+
+    def test_new_connection_is_not_retried(self):
+        # nothing listens in a port just released
+        probe = socket.socket()
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+        probe.close()
+
+        with self.assertRaises(OSError):
+            self.pool.request('http://127.0.0.1:%s/lib/search' % port)
+
+    def test_unexpected_status(self):
+        url = self.server.getUrl().replace('/lib/search', '/other')
+
+        with self.assertRaises(HTTPError) as context:
+            self.cache.get(url, self.pool)
+        self.assertEqual(context.exception.status, 404)
+
+
+class ProxyTest(StubServerTest):
+
+    def setUp(self):
+        super(ProxyTest, self).setUp()
+        self.pool = ConnectionPool(max_connections=1)
+        self.proxy = '127.0.0.1:%s' % self.server.server_address[1]
+
+    def tearDown(self):
+        self.pool.close()
+        super(ProxyTest, self).tearDown()
+
+    def test_http_proxy(self):
+        # the stub server answers as the proxy
+        os.environ['http_proxy'] = 'http://deviot:s3cret@%s' % self.proxy
+
+        url = 'http://libs.example.invalid/lib/search?page=2'
+        status, headers, body = self.pool.request(url)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body.decode('utf-8'))['page'], 2)
+        self.assertEqual(self.server.paths,
+                         [(url, 'Basic ZGV2aW90OnMzY3JldA==')])
+
+    def test_no_proxy(self):
+        os.environ['http_proxy'] = 'http://%s' % self.proxy
+        os.environ['no_proxy'] = 'example.invalid'
+
+        self.assertIsNone(self.pool.getProxy('http', 'libs.example.invalid'))
+        self.assertEqual(self.pool.getProxy('http', 'api.platformio.org'),
+                         {'netloc': self.proxy, 'auth': None})
+
+    def test_https_tunnel(self):
+        os.environ['https_proxy'] = self.proxy
+
+        key = ('https', 'libs.example.invalid')
+        proxy = self.pool.getProxy(*key)
+        connection, reused = self.pool.acquire(key, proxy)
+
+        self.assertEqual((connection.host, connection.port),
+                         ('127.0.0.1', self.server.server_address[1]))
+        self.assertEqual(connection._tunnel_host, 'libs.example.invalid')
+
+
+if __name__ == '__main__':
+    unittest.main()